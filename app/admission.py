@@ -0,0 +1,202 @@
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List
+
+from metrics import count_error
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from twitter_exception import (
+    TwitterException,
+    TwitterOverloadedException,
+    TwitterRateLimitException,
+)
+
+RATE_LIMIT_RATE = float(os.getenv("RATE_LIMIT_RATE", 20))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", 100))
+RATE_LIMIT_MAX_KEYS = 100_000
+
+READS = "reads"
+WRITES = "writes"
+UPLOADS = "uploads"
+BULK = "bulk"
+UPLOADS_PATH = "/api/medias"
+BULK_SUFFIXES = ("/export", "/import")
+
+
+class RateLimiter:
+    """
+    Token bucket rate limiter keyed by api key.
+    Buckets of least recently seen keys are evicted above max_keys.
+    """
+
+    def __init__(
+        self,
+        rate: float = RATE_LIMIT_RATE,
+        burst: float = RATE_LIMIT_BURST,
+        max_keys: int = RATE_LIMIT_MAX_KEYS,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, List[float]] = OrderedDict()
+
+    def take(self, key: str, now: float | None = None) -> float:
+        """
+        Takes a token from the bucket of given key.
+        :param key: Api key.
+        :type key: str
+        :param now: Current monotonic time.
+        :type now: float | None
+        :return: 0 if request is admitted, else seconds until next token.
+        :rtype: float
+        """
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.pop(key, None)
+        if bucket is None:
+            bucket = [self.burst, now]
+            if len(self._buckets) >= self.max_keys:
+                self._buckets.popitem(last=False)
+        self._buckets[key] = bucket
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            return (1 - tokens) / self.rate
+        bucket[0] = tokens - 1
+        return 0.0
+
+
+class AdaptiveLimit:
+    """
+    Concurrency limit adjusted by observed latency.
+    The limit grows additively while requests finish within target latency
+    and shrinks multiplicatively when they do not.
+    """
+
+    backoff = 0.9
+
+    def __init__(self, max_limit: int, target_latency: float, min_limit: int = 1):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.target_latency = target_latency
+        self.limit = float(max_limit)
+        self.in_flight = 0
+
+    def acquire(self) -> bool:
+        """
+        Admits request if limit allows it.
+        :return: True if request is admitted.
+        :rtype: bool
+        """
+        if self.in_flight >= int(self.limit):
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self, latency: float) -> None:
+        """
+        Finishes admitted request and adjusts the limit.
+        :param latency: Request latency in seconds.
+        :type latency: float
+        """
+        self.in_flight -= 1
+        if latency > self.target_latency:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+
+def default_limits() -> Dict[str, AdaptiveLimit]:
+    """
+    Returns concurrency limits for reads, writes, uploads and bulk
+    imports and exports.
+    :return: Limits by route class.
+    :rtype: Dict[str, AdaptiveLimit]
+    """
+    return {
+        READS: AdaptiveLimit(int(os.getenv("ADMISSION_READS_LIMIT", 64)), 0.25),
+        WRITES: AdaptiveLimit(int(os.getenv("ADMISSION_WRITES_LIMIT", 32)), 0.5),
+        UPLOADS: AdaptiveLimit(int(os.getenv("ADMISSION_UPLOADS_LIMIT", 4)), 2.0),
+        BULK: AdaptiveLimit(int(os.getenv("ADMISSION_BULK_LIMIT", 2)), 60.0),
+    }
+
+
+def route_class(method: str, path: str) -> str:
+    """
+    Returns route class of request.
+    :param method: Http method.
+    :type method: str
+    :param path: Request path.
+    :type path: str
+    :return: Route class.
+    :rtype: str
+    """
+    if path.endswith(BULK_SUFFIXES):
+        return BULK
+    if method in ("GET", "HEAD"):
+        return READS
+    if path.startswith(UPLOADS_PATH):
+        return UPLOADS
+    return WRITES
+
+
+class AdmissionMiddleware:
+    """
+    Rejects api requests over rate or concurrency limits before they
+    reach the database.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        rate_limiter: RateLimiter | None = None,
+        limits: Dict[str, AdaptiveLimit] | None = None,
+    ):
+        self.app = app
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.limits = limits or default_limits()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+        api_key = dict(scope["headers"]).get(b"api-key", b"").decode("latin-1")
+        wait = self.rate_limiter.take(api_key)
+        if wait:
+            response = self.reject(TwitterRateLimitException(), wait)
+            await response(scope, receive, send)
+            return
+        limit = self.limits[route_class(scope["method"], scope["path"])]
+        if not limit.acquire():
+            response = self.reject(TwitterOverloadedException(), 1)
+            await response(scope, receive, send)
+            return
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limit.release(time.perf_counter() - start)
+
+    @staticmethod
+    def reject(exception: TwitterException, retry_after: float) -> JSONResponse:
+        """
+        Builds fail response for rejected request.
+        :param exception: Rejection reason.
+        :type exception: TwitterException
+        :param retry_after: Seconds client should wait.
+        :type retry_after: float
+        :return: Response
+        :rtype: JSONResponse
+        """
+        count_error(exception)
+        return JSONResponse(
+            status_code=exception.status_code,
+            content={
+                "result": exception.result,
+                "error_type": exception.error_type,
+                "error_message": exception.error_message,
+            },
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
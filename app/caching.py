@@ -0,0 +1,41 @@
+import os
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CACHE_BYPASS_COOKIE = "api_nocache"
+# Must not be shorter than proxy_cache_valid in nginx/nginx.conf.
+CACHE_BYPASS_SECONDS = int(os.getenv("CACHE_BYPASS_SECONDS", 5))
+WRITE_METHODS = frozenset(("POST", "PUT", "PATCH", "DELETE"))
+
+
+class CacheBypassMiddleware:
+    """
+    Marks clients that just changed data, so nginx serves their next reads
+    from the app instead of the micro-cache.
+    """
+
+    def __init__(self, app: ASGIApp, seconds: int = CACHE_BYPASS_SECONDS):
+        self.app = app
+        self.cookie = (
+            f"{CACHE_BYPASS_COOKIE}=1; Max-Age={seconds}; Path=/api/; "
+            "HttpOnly; SameSite=Strict"
+        ).encode()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in WRITE_METHODS
+            or not scope["path"].startswith("/api/")
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"set-cookie", self.cookie),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
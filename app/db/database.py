@@ -1,6 +1,9 @@
+import asyncio
 import os
 from typing import AsyncGenerator
 
+from metrics import instrument_engine
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base
 
@@ -9,7 +12,13 @@ DB_USER = os.getenv("POSTGRES_USER")
 DB_PASS = os.getenv("POSTGRES_PASSWORD")
 DB_NAME = os.getenv("POSTGRES_DB")
 DB_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}/{DB_NAME}"
-engine = create_async_engine(DB_URL)
+POOL_SIZE = int(os.getenv("POOL_SIZE", 5))
+POOL_MAX_OVERFLOW = int(os.getenv("POOL_MAX_OVERFLOW", 10))
+POOL_WARMUP = int(os.getenv("POOL_WARMUP", POOL_SIZE))
+engine = create_async_engine(
+    DB_URL, pool_size=POOL_SIZE, max_overflow=POOL_MAX_OVERFLOW
+)
+instrument_engine(engine)
 Base = declarative_base()
 async_session = async_sessionmaker(bind=engine, expire_on_commit=False)
 session = async_session()
@@ -23,3 +32,31 @@ async def get_session() -> AsyncGenerator:
     """
     async with async_session() as session:
         yield session
+
+
+def get_session_maker() -> async_sessionmaker:
+    """
+    Returns session factory for work outliving the request session,
+    like streaming responses.
+    :return: Session factory.
+    :rtype: async_sessionmaker
+    """
+    return async_session
+
+
+async def ping() -> None:
+    """
+    Checks that database answers.
+    """
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def warm_up_pool(connections: int = POOL_WARMUP) -> None:
+    """
+    Opens given number of pool connections at once, so first requests
+    do not pay for connecting.
+    :param connections: Number of connections.
+    :type connections: int
+    """
+    await asyncio.gather(*(ping() for _ in range(min(connections, POOL_SIZE))))
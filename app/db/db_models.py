@@ -1,12 +1,139 @@
-from typing import Any, Dict
+import os
+import time
+from datetime import timedelta
+from typing import (
+    AbstractSet,
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    Sequence,
+    Set,
+    Tuple,
+)
 
-from sqlalchemy import Column, ForeignKey, Integer, String
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    Computed,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    Select,
+    String,
+    and_,
+    cast,
+    column,
+    delete,
+    event,
+    func,
+    literal,
+    literal_column,
+    text,
+    true,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import JSONB, REGCONFIG, TSVECTOR, insert
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.ext.asyncio import AsyncAttrs, AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import relationship, selectinload
+from sqlalchemy.orm import (
+    aliased,
+    column_property,
+    deferred,
+    noload,
+    relationship,
+    selectinload,
+)
 
 from .database import Base
+from .ids import TIMESTAMP_SHIFT, id_at, ids
+
+SEARCH_CONFIG = "english"
+HEADLINE_OPTIONS = "StartSel=<b>, StopSel=</b>, MaxFragments=2"
+LIKES_PREVIEW = int(os.getenv("LIKES_PREVIEW", 3))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+# Tweets and likes are range partitioned by tweet id. Ids start with their
+# timestamp, so every partition holds PARTITION_DAYS of history.
+PARTITION_DAYS = int(os.getenv("PARTITION_DAYS", 7))
+PARTITION_SIZE = PARTITION_DAYS * 86_400_000 << TIMESTAMP_SHIFT
+PARTITIONS_AHEAD = int(os.getenv("PARTITIONS_AHEAD", 2))
+PARTITIONED_TABLES = ("tweets", "likes")
+USER_FIELDS = frozenset(("id", "name", "followers", "following"))
+TWEET_FIELDS = frozenset(
+    (
+        "id",
+        "content",
+        "attachments",
+        "author",
+        "likes",
+        "like_count",
+        "liked_by_me",
+        "views",
+        "viewers",
+        "parent_id",
+        "retweet_of_id",
+        "reply_count",
+        "retweet_count",
+    )
+)
+# Counters of Tweets kept by the outbox when replies and retweets change.
+TWEET_COUNTERS = frozenset(("reply_count", "retweet_count"))
+# Replies followed below a tweet, replies kept per tweet and per request.
+THREAD_DEPTH = int(os.getenv("THREAD_DEPTH", 4))
+THREAD_WIDTH = int(os.getenv("THREAD_WIDTH", 10))
+THREAD_MAX_TWEETS = int(os.getenv("THREAD_MAX_TWEETS", 500))
+THREAD_ANCESTORS = int(os.getenv("THREAD_ANCESTORS", 20))
+
+
+def partition_bounds(index: int) -> Tuple[int, int]:
+    """
+    Returns tweet id range of partition with given index.
+    :param index: Partition index.
+    :type index: int
+    :return: First id and the id after the last one.
+    :rtype: Tuple[int, int]
+    """
+    return index * PARTITION_SIZE, (index + 1) * PARTITION_SIZE
+
+
+def partition_index(tweet_id: int) -> int:
+    """
+    Returns index of partition holding given tweet id.
+    """
+    return tweet_id // PARTITION_SIZE
+
+
+def partition_ddl(table: str, index: int) -> str:
+    """
+    Returns statement creating partition of table, if it does not exist.
+    :param table: Partitioned table name.
+    :type table: str
+    :param index: Partition index.
+    :type index: int
+    :return: SQL statement.
+    :rtype: str
+    """
+    start, end = partition_bounds(index)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {table}_p{index} PARTITION OF {table} "
+        f"FOR VALUES FROM ({start}) TO ({end})"
+    )
+
+
+def create_partitions(table: Any, connection: Any, **kwargs: Any) -> None:
+    """
+    Creates current partitions together with partitioned table, later ones
+    are added by app/partitions.py.
+    """
+    current = partition_index(id_at(time.time()))
+    for index in range(current, current + PARTITIONS_AHEAD + 1):
+        connection.execute(text(partition_ddl(table.name, index)))
 
 
 class Likes(Base):
@@ -16,8 +143,159 @@ class Likes(Base):
 
     __tablename__ = "likes"
 
-    users = Column(Integer, ForeignKey("users.id"), primary_key=True)
-    tweets = Column(Integer, ForeignKey("tweets.id"), primary_key=True)
+    users = Column(BigInteger, ForeignKey("users.id"), primary_key=True)
+    tweets = Column(BigInteger, ForeignKey("tweets.id"), primary_key=True)
+
+    __table_args__ = (
+        Index("ix_likes_tweets_users", tweets, users),
+        {"postgresql_partition_by": "RANGE (tweets)"},
+    )
+
+    @classmethod
+    async def add_like(cls, session: AsyncSession, user_id: int, tweet_id: int) -> bool:
+        """
+        Adds like and increments like counter of the tweet.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param user_id: User id.
+        :type user_id: int
+        :param tweet_id: Tweet id.
+        :type tweet_id: int
+        :return: False if tweet is already liked by user.
+        :rtype: bool
+        """
+        res = await session.execute(
+            insert(cls)
+            .values(users=user_id, tweets=tweet_id)
+            .on_conflict_do_nothing()
+            .returning(cls.tweets)
+        )
+        if res.scalar_one_or_none() is None:
+            return False
+        await session.execute(
+            update(Tweets)
+            .filter(Tweets.id == tweet_id)
+            .values(like_count=Tweets.like_count + 1)
+        )
+        return True
+
+    @classmethod
+    async def remove_like(
+        cls, session: AsyncSession, user_id: int, tweet_id: int
+    ) -> bool:
+        """
+        Removes like and decrements like counter of the tweet.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param user_id: User id.
+        :type user_id: int
+        :param tweet_id: Tweet id.
+        :type tweet_id: int
+        :return: False if tweet is not liked by user.
+        :rtype: bool
+        """
+        res = await session.execute(
+            delete(cls)
+            .filter(cls.users == user_id, cls.tweets == tweet_id)
+            .returning(cls.tweets)
+        )
+        if res.scalar_one_or_none() is None:
+            return False
+        await session.execute(
+            update(Tweets)
+            .filter(Tweets.id == tweet_id)
+            .values(like_count=Tweets.like_count - 1)
+        )
+        return True
+
+    @classmethod
+    async def get_liked(
+        cls, session: AsyncSession, user_id: int, tweet_ids: List[int]
+    ) -> Set[int]:
+        """
+        Returns ids of given tweets liked by user.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param user_id: User id.
+        :type user_id: int
+        :param tweet_ids: Tweet ids.
+        :type tweet_ids: List[int]
+        :return: Liked tweet ids.
+        :rtype: Set[int]
+        """
+        res = await session.execute(
+            select(cls.tweets).filter(cls.users == user_id, cls.tweets.in_(tweet_ids))
+        )
+        return set(res.scalars().all())
+
+    @classmethod
+    async def get_previews(
+        cls, session: AsyncSession, tweet_ids: List[int], limit: int
+    ) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        Returns first likers of every given tweet.
+        Each tweet reads at most limit rows of the likes index.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param tweet_ids: Tweet ids.
+        :type tweet_ids: List[int]
+        :param limit: Likers per tweet.
+        :type limit: int
+        :return: Likers by tweet id.
+        :rtype: Dict[int, List[Dict[str, Any]]]
+        """
+        previews: Dict[int, List[Dict[str, Any]]] = {id: [] for id in tweet_ids}
+        if not tweet_ids or not limit:
+            return previews
+        likers = (
+            select(cls.users)
+            .filter(cls.tweets == Tweets.id)
+            .order_by(cls.users)
+            .limit(limit)
+            .lateral()
+        )
+        res = await session.execute(
+            select(Tweets.id, Users.id, Users.name)
+            .select_from(Tweets)
+            .join(likers, true())
+            .join(Users, Users.id == likers.c.users)
+            .filter(Tweets.id.in_(tweet_ids))
+            .order_by(Tweets.id, Users.id)
+        )
+        for tweet_id, user_id, name in res.all():
+            previews[tweet_id].append({"id": user_id, "name": name})
+        return previews
+
+    @classmethod
+    async def get_likers(
+        cls,
+        session: AsyncSession,
+        tweet_id: int,
+        limit: int,
+        cursor: int | None = None,
+    ) -> Sequence[Any]:
+        """
+        Returns page of users who liked the tweet, ordered by user id.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param tweet_id: Tweet id.
+        :type tweet_id: int
+        :param limit: Page size.
+        :type limit: int
+        :param cursor: Id of the last user from previous page.
+        :type cursor: int | None
+        :return: Rows of user id and name.
+        :rtype: Sequence
+        """
+        query = (
+            select(Users.id, Users.name)
+            .join(cls, cls.users == Users.id)
+            .filter(cls.tweets == tweet_id)
+        )
+        if cursor is not None:
+            query = query.filter(cls.users > cursor)
+        res = await session.execute(query.order_by(cls.users).limit(limit))
+        return res.all()
 
 
 class Follows(Base):
@@ -27,8 +305,8 @@ class Follows(Base):
 
     __tablename__ = "follows"
 
-    followers_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
-    following_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    followers_id = Column(BigInteger, ForeignKey("users.id"), primary_key=True)
+    following_id = Column(BigInteger, ForeignKey("users.id"), primary_key=True)
 
 
 class Users(Base, AsyncAttrs):
@@ -38,7 +316,7 @@ class Users(Base, AsyncAttrs):
 
     __tablename__ = "users"
 
-    id = Column(Integer, primary_key=True, nullable=False)
+    id = Column(BigInteger, primary_key=True, autoincrement=False, default=ids.next_id)
     name = Column(String, nullable=False)
     api_key = Column(String, nullable=False, unique=True)
     followers = relationship(
@@ -57,7 +335,29 @@ class Users(Base, AsyncAttrs):
         back_populates="followers",
         lazy="selectin",
     )
-    tweets = relationship("Tweets", back_populates="author", lazy="selectin")
+    tweets = relationship("Tweets", back_populates="author", lazy="select")
+    handle = column_property(
+        func.lower(func.replace(name, literal_column("' '"), literal_column("''"))),
+        deferred=True,
+    )
+
+    __table_args__ = (
+        Index("ix_users_handle", handle.expression),  # type: ignore[arg-type]
+    )
+
+    @classmethod
+    def load_options(cls, fields: AbstractSet[str]) -> List[Any]:
+        """
+        Returns loader options querying only requested relationships.
+        :param fields: Requested fields.
+        :type fields: AbstractSet[str]
+        :return: Loader options.
+        :rtype: List
+        """
+        return [
+            selectinload(rel) if rel.key in fields else noload(rel)
+            for rel in (cls.followers, cls.following)
+        ]
 
     @classmethod
     async def get_id_by_api_key(cls, session: AsyncSession, api_key: str) -> Any | None:
@@ -73,9 +373,26 @@ class Users(Base, AsyncAttrs):
         res = await session.execute(select(cls.id).filter(cls.api_key == api_key))
         return res.scalar_one_or_none()
 
+    @classmethod
+    async def user_exists(cls, session: AsyncSession, id: int) -> bool:
+        """
+        Checks if user with given id exists without loading relationships.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param id: User id.
+        :type id: int
+        :return: True if user exists.
+        :rtype: bool
+        """
+        res = await session.execute(select(cls.id).filter(cls.id == id))
+        return res.scalar_one_or_none() is not None
+
     @classmethod
     async def get_user_by_api_key(
-        cls, session: AsyncSession, api_key: str
+        cls,
+        session: AsyncSession,
+        api_key: str,
+        fields: AbstractSet[str] = USER_FIELDS,
     ) -> Any | None:
         """
         Returns user with given api key.
@@ -83,34 +400,121 @@ class Users(Base, AsyncAttrs):
         :type session: AsyncSession
         :param api_key: Api authorisation key.
         :type api_key: str
+        :param fields: Fields to load.
+        :type fields: AbstractSet[str]
         :return: User data
         :rtype: Result
         """
         res = await session.execute(
             select(cls)
             .filter(cls.api_key == api_key)
-            .options(selectinload(cls.followers), selectinload(cls.following))
+            .options(*cls.load_options(fields))
         )
         return res.unique().scalar_one_or_none()
 
     @classmethod
-    async def get_user_by_id(cls, session: AsyncSession, id: int) -> Any | None:
+    async def get_user_by_id(
+        cls,
+        session: AsyncSession,
+        id: int,
+        fields: AbstractSet[str] = USER_FIELDS,
+    ) -> Any | None:
         """
         Returns user with given id.
         :param session: Database session.
         :type session: AsyncSession
         :param id: User id.
         :type id: int
+        :param fields: Fields to load.
+        :type fields: AbstractSet[str]
         :return: User data
         :rtype: Result
         """
         res = await session.execute(
-            select(cls)
-            .filter(cls.id == id)
-            .options(selectinload(cls.followers), selectinload(cls.following))
+            select(cls).filter(cls.id == id).options(*cls.load_options(fields))
         )
         return res.unique().scalar_one_or_none()
 
+    @classmethod
+    async def export(
+        cls,
+        session: AsyncSession,
+        user_id: int,
+        batch_size: int = EXPORT_BATCH_SIZE,
+        kinds: AbstractSet[str] | None = None,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Yields all data of user as typed records in batches. Every table is
+        read through a server-side cursor, so memory use does not depend on
+        the size of the account.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param user_id: User id.
+        :type user_id: int
+        :param batch_size: Rows fetched per round trip.
+        :type batch_size: int
+        :param kinds: Record types to export, all by default.
+        :type kinds: AbstractSet[str] | None
+        :return: Batches of records.
+        :rtype: AsyncIterator[List[Dict[str, Any]]]
+        """
+        queries: Tuple[Tuple[str, Select], ...] = (
+            ("user", select(cls.id, cls.name).filter(cls.id == user_id)),
+            (
+                "tweet",
+                select(
+                    Tweets.id,
+                    Tweets.content,
+                    Tweets.like_count,
+                    Tweets.parent_id,
+                    Tweets.retweet_of_id,
+                )
+                .filter(Tweets.author_id == user_id, Tweets.live())
+                .order_by(Tweets.id),
+            ),
+            (
+                "media",
+                select(Media.id, Media.filename, Media.tweet_id)
+                .join(Tweets, Tweets.id == Media.tweet_id)
+                .filter(Tweets.author_id == user_id, Tweets.live())
+                .order_by(Media.id),
+            ),
+            (
+                "like",
+                select(Likes.tweets.label("tweet_id"))
+                .filter(Likes.users == user_id)
+                .order_by(Likes.tweets),
+            ),
+            (
+                "following",
+                select(Follows.following_id.label("user_id"))
+                .filter(Follows.followers_id == user_id)
+                .order_by(Follows.following_id),
+            ),
+            (
+                "follower",
+                select(Follows.followers_id.label("user_id"))
+                .filter(Follows.following_id == user_id)
+                .order_by(Follows.followers_id),
+            ),
+        )
+        for kind, query in queries:
+            if kinds is not None and kind not in kinds:
+                continue
+            result = await session.stream(query.execution_options(yield_per=batch_size))
+            async for rows in result.partitions():
+                yield [{"type": kind, **row._asdict()} for row in rows]
+
+    def to_dict(self, fields: AbstractSet[str] = USER_FIELDS) -> Dict[str, Any]:
+        """
+        Converts user to response dict with requested fields only.
+        :param fields: Requested fields.
+        :type fields: AbstractSet[str]
+        :return: Dict with user data.
+        :rtype: Dict
+        """
+        return {field: getattr(self, field) for field in USER_FIELDS & fields}
+
     def to_json(self) -> Dict[str, Any]:
         """
         Converts user data to json dict.
@@ -120,26 +524,370 @@ class Users(Base, AsyncAttrs):
         return {c.name: getattr(self, c.name) for c in self.__table__.columns}
 
 
-class Tweets(Base):
+class Tweets(Base, AsyncAttrs):
     """
     Tweets table.
     """
 
     __tablename__ = "tweets"
 
-    id = Column(Integer, primary_key=True, nullable=False)
+    id = Column(BigInteger, primary_key=True, autoincrement=False, default=ids.next_id)
     content = Column(String, nullable=False)
     # media_ids = Column(ARRAY(Integer))
     media = relationship("Media", cascade="all, delete", lazy="selectin")
     attachments = association_proxy("media", "filename")
-    author_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    author_id = Column(BigInteger, ForeignKey("users.id"), nullable=False)
     author = relationship("Users", back_populates="tweets", lazy="selectin")
-    likes = relationship("Users", secondary=Likes.__table__, lazy="selectin")
+    likes = relationship("Users", secondary=Likes.__table__, lazy="select")
+    like_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Replied and retweeted tweets. They may live on other shards, so
+    # there are no foreign keys.
+    parent_id = Column(BigInteger)
+    retweet_of_id = Column(BigInteger)
+    reply_count = Column(Integer, nullable=False, default=0, server_default="0")
+    retweet_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Tombstone, set on delete. Rows are removed later by app/purger.py.
+    deleted_at = Column(DateTime(timezone=True))
+    search_vector = deferred(
+        Column(
+            TSVECTOR,
+            Computed(f"to_tsvector('{SEARCH_CONFIG}', content)", persisted=True),
+        )
+    )
+
+    __table_args__ = (
+        # Read indexes cover live tweets only, so tombstones cost nothing
+        # until they are purged.
+        Index(
+            "ix_tweets_live_id",
+            id.desc(),
+            postgresql_where=deleted_at.is_(None),
+        ),
+        Index(
+            "ix_tweets_author_id_id",
+            author_id,
+            id.desc(),
+            postgresql_where=deleted_at.is_(None),
+        ),
+        Index(
+            "ix_tweets_search_vector",
+            search_vector,
+            postgresql_using="gin",
+            postgresql_where=deleted_at.is_(None),
+        ),
+        # Replies are newer than their parent, so thread walks also
+        # filter on id and skip older partitions.
+        Index(
+            "ix_tweets_parent_id_id",
+            parent_id,
+            id,
+            postgresql_where=and_(parent_id.is_not(None), deleted_at.is_(None)),
+        ),
+        Index(
+            "ix_tweets_retweet_of_id_author_id",
+            retweet_of_id,
+            author_id,
+            postgresql_where=and_(retweet_of_id.is_not(None), deleted_at.is_(None)),
+        ),
+        Index(
+            "ix_tweets_deleted_at",
+            deleted_at,
+            postgresql_where=deleted_at.is_not(None),
+        ),
+        {"postgresql_partition_by": "RANGE (id)"},
+    )
+
+    @classmethod
+    def load_options(cls, fields: AbstractSet[str]) -> List[Any]:
+        """
+        Returns loader options querying only relationships behind requested
+        fields.
+        :param fields: Requested fields.
+        :type fields: AbstractSet[str]
+        :return: Loader options.
+        :rtype: List
+        """
+        return [
+            selectinload(cls.media) if "attachments" in fields else noload(cls.media),
+            selectinload(cls.author) if "author" in fields else noload(cls.author),
+        ]
+
+    @classmethod
+    def live(cls) -> Any:
+        """
+        Returns filter for tweets which are not deleted. Matches the
+        predicate of the partial read indexes.
+        :return: Filter clause.
+        :rtype: ColumnElement
+        """
+        return cls.deleted_at.is_(None)
+
+    @classmethod
+    async def get_author_id(cls, session: AsyncSession, id: int) -> int | None:
+        """
+        Returns author id of tweet with given id, unless it is deleted.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param id: Tweet id.
+        :type id: int
+        :return: Author id.
+        :rtype: int | None
+        """
+        res = await session.execute(
+            select(cls.author_id).filter(cls.id == id, cls.live())
+        )
+        return res.scalar_one_or_none()
+
+    @classmethod
+    async def soft_delete(
+        cls, session: AsyncSession, id: int
+    ) -> Tuple[int | None, int | None]:
+        """
+        Marks tweet as deleted. It disappears from reads at once, its
+        likes, media and tags are removed later by the purger.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param id: Tweet id.
+        :type id: int
+        :return: Replied and retweeted tweet ids of the deleted tweet.
+        :rtype: Tuple[int | None, int | None]
+        """
+        res = await session.execute(
+            update(cls)
+            .filter(cls.id == id, cls.live())
+            .values(deleted_at=func.now())
+            .returning(cls.parent_id, cls.retweet_of_id)
+            .execution_options(synchronize_session=False)
+        )
+        row = res.first()
+        return (row[0], row[1]) if row else (None, None)
+
+    @classmethod
+    async def add_to_counter(
+        cls, session: AsyncSession, id: int, counter: str, delta: int
+    ) -> bool:
+        """
+        Changes reply or retweet counter of tweet.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param id: Tweet id.
+        :type id: int
+        :param counter: reply_count or retweet_count.
+        :type counter: str
+        :param delta: Change of the counter.
+        :type delta: int
+        :return: False if the tweet is not in this database.
+        :rtype: bool
+        """
+        if counter not in TWEET_COUNTERS:
+            raise ValueError(f"Unknown tweet counter {counter}.")
+        column = getattr(cls, counter)
+        res = await session.execute(
+            update(cls)
+            .filter(cls.id == id)
+            .values({column: func.greatest(column + delta, 0)})
+            .execution_options(synchronize_session=False)
+        )
+        return bool(res.rowcount)  # type: ignore[attr-defined]
+
+    @classmethod
+    async def get_original_id(cls, session: AsyncSession, id: int) -> int | None:
+        """
+        Returns id of the tweet retweeted by tweet with given id, or id
+        itself if it is not a retweet.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param id: Tweet id.
+        :type id: int
+        :return: Original tweet id, None if tweet is deleted.
+        :rtype: int | None
+        """
+        res = await session.execute(
+            select(func.coalesce(cls.retweet_of_id, cls.id)).filter(
+                cls.id == id, cls.live()
+            )
+        )
+        return res.scalar_one_or_none()
+
+    @classmethod
+    async def add_retweet(
+        cls, session: AsyncSession, user_id: int, tweet_id: int
+    ) -> int | None:
+        """
+        Retweets tweet unless user already did. Retweets of a user are
+        serialized with a transaction advisory lock, as a unique index
+        of the partitioned table would have to include the tweet id.
+        :param session: Session of the shard of user.
+        :type session: AsyncSession
+        :param user_id: Id of user who retweets.
+        :type user_id: int
+        :param tweet_id: Retweeted tweet id.
+        :type tweet_id: int
+        :return: Id of the new retweet, None if it existed.
+        :rtype: int | None
+        """
+        await session.execute(select(func.pg_advisory_xact_lock(user_id)))
+        res = await session.execute(
+            select(cls.id).filter(
+                cls.retweet_of_id == tweet_id, cls.author_id == user_id, cls.live()
+            )
+        )
+        if res.first() is not None:
+            return None
+        retweet = cls(content="", author_id=user_id, retweet_of_id=tweet_id)
+        session.add(retweet)
+        await session.flush()
+        return int(retweet.id)
+
+    @classmethod
+    async def remove_retweet(
+        cls, session: AsyncSession, user_id: int, tweet_id: int
+    ) -> bool:
+        """
+        Marks retweet of tweet by user as deleted.
+        :param session: Session of the shard of user.
+        :type session: AsyncSession
+        :param user_id: Id of user who retweeted.
+        :type user_id: int
+        :param tweet_id: Retweeted tweet id.
+        :type tweet_id: int
+        :return: False if user did not retweet the tweet.
+        :rtype: bool
+        """
+        res = await session.execute(
+            update(cls)
+            .filter(cls.retweet_of_id == tweet_id, cls.author_id == user_id, cls.live())
+            .values(deleted_at=func.now())
+            .returning(cls.id)
+            .execution_options(synchronize_session=False)
+        )
+        return res.first() is not None
+
+    @classmethod
+    async def get_replies(
+        cls,
+        session: AsyncSession,
+        parent_ids: Sequence[int],
+        depth: int = THREAD_DEPTH,
+        width: int = THREAD_WIDTH,
+        cursor: int | None = None,
+        limit: int | None = None,
+        max_tweets: int = THREAD_MAX_TWEETS,
+    ) -> Sequence[Any]:
+        """
+        Returns replies below given tweets with one recursive query.
+        Every tweet contributes its oldest width replies, down to depth
+        levels. Rows are numbered breadth first and the recursion stops once
+        max_tweets rows were found, so at most max_tweets rows are returned.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param parent_ids: Ids of tweets whose replies are read.
+        :type parent_ids: Sequence[int]
+        :param depth: Number of reply levels.
+        :type depth: int
+        :param width: Replies per tweet.
+        :type width: int
+        :param cursor: Id of the last direct reply from previous page,
+            pages direct replies of a single parent with limit.
+        :type cursor: int | None
+        :param limit: Page size of direct replies, width if not given.
+        :type limit: int | None
+        :param max_tweets: Maximum number of rows.
+        :type max_tweets: int
+        :return: Rows of tweet and level, 1 for direct replies.
+        :rtype: Sequence
+        """
+        first: Select = select(cls.id, literal_column("1").label("level")).filter(
+            cls.parent_id.in_(parent_ids), cls.live()
+        )
+        if limit is not None:
+            if cursor is not None:
+                first = first.filter(cls.id > cursor)
+            first = first.order_by(cls.id).limit(limit)
+        else:
+            rank = func.row_number().over(partition_by=cls.parent_id, order_by=cls.id)
+            ranked = first.add_columns(rank.label("rank")).subquery()
+            first = select(ranked.c.id, ranked.c.level).filter(ranked.c.rank <= width)
+        first_rows = first.subquery()
+        # Total counts rows up to the level of a row.
+        thread = select(
+            first_rows.c.id,
+            first_rows.c.level,
+            func.row_number().over(order_by=first_rows.c.id).label("ordinal"),
+            func.count().over().label("total"),
+        ).cte("thread", recursive=True)
+        reply = aliased(cls)
+        replies = (
+            select(reply.id)
+            .filter(
+                reply.parent_id == thread.c.id,
+                reply.id > thread.c.id,
+                reply.deleted_at.is_(None),
+            )
+            .order_by(reply.id)
+            .limit(width)
+            .lateral("replies")
+        )
+        thread = thread.union_all(
+            select(
+                replies.c.id,
+                thread.c.level + 1,
+                thread.c.total + func.row_number().over(order_by=replies.c.id),
+                thread.c.total + func.count().over(),
+            )
+            .select_from(thread.join(replies, true()))
+            .filter(thread.c.level < depth, thread.c.total < max_tweets)
+        )
+        res = await session.execute(
+            select(cls, thread.c.level)
+            .join(thread, thread.c.id == cls.id)
+            .filter(thread.c.ordinal <= max_tweets)
+            .options(selectinload(cls.media), selectinload(cls.author))
+            .order_by(thread.c.level, cls.id)
+        )
+        return res.all()
+
+    @classmethod
+    async def get_ancestors(
+        cls, session: AsyncSession, id: int, depth: int = THREAD_DEPTH
+    ) -> Sequence[Any]:
+        """
+        Returns tweet with given id and the tweets it replies to, with one
+        recursive query. Deleted tweets are returned too, so the caller
+        can tell where the chain stops.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param id: Tweet id.
+        :type id: int
+        :param depth: Number of ancestors.
+        :type depth: int
+        :return: Rows of tweet and level, 0 for the tweet itself, nearest
+            ancestor first.
+        :rtype: Sequence
+        """
+        chain = (
+            select(cls.id, cls.parent_id, literal_column("0").label("level"))
+            .filter(cls.id == id)
+            .cte("chain", recursive=True)
+        )
+        parent = aliased(cls)
+        chain = chain.union_all(
+            select(parent.id, parent.parent_id, chain.c.level + 1)
+            .join(chain, parent.id == chain.c.parent_id)
+            .filter(chain.c.level < depth)
+        )
+        res = await session.execute(
+            select(cls, chain.c.level)
+            .join(chain, chain.c.id == cls.id)
+            .options(selectinload(cls.media), selectinload(cls.author))
+            .order_by(chain.c.level)
+        )
+        return res.all()
 
     @classmethod
     async def get_tweet_by_id(cls, session: AsyncSession, id: int) -> Any | None:
         """
-        Returns tweet with given id.
+        Returns tweet with given id, unless it is deleted.
         :param session: Database session.
         :type session: AsyncSession
         :param id: Tweet id.
@@ -147,24 +895,189 @@ class Tweets(Base):
         :return: Tweet data
         :rtype: Result
         """
-        res = await session.execute(select(cls).filter(cls.id == id))
+        res = await session.execute(select(cls).filter(cls.id == id, cls.live()))
         return res.unique().scalar_one_or_none()
 
     @classmethod
-    async def get_new_id(cls, session: AsyncSession) -> int:
+    async def get_tweets_by_author(
+        cls,
+        session: AsyncSession,
+        author_id: int,
+        limit: int,
+        cursor: int | None = None,
+        since: int = 0,
+    ) -> Sequence[Any]:
         """
-        Returns id going after last existing.
+        Returns page of user tweets, newest first.
+        Walks the (author_id, id DESC) index, so the cost depends on
+        page size only.
         :param session: Database session.
         :type session: AsyncSession
-        :return: New id.
-        :rtype: int
+        :param author_id: Author id.
+        :type author_id: int
+        :param limit: Page size.
+        :type limit: int
+        :param cursor: Id of the last tweet from previous page.
+        :type cursor: int | None
+        :param since: First tweet id to read, older partitions are skipped.
+        :type since: int
+        :return: Tweets
+        :rtype: Sequence
+        """
+        query = select(cls).filter(
+            cls.author_id == author_id, cls.id >= since, cls.live()
+        )
+        if cursor is not None:
+            query = query.filter(cls.id < cursor)
+        res = await session.execute(
+            query.options(
+                selectinload(cls.media),
+                selectinload(cls.author),
+            )
+            .order_by(cls.id.desc())
+            .limit(limit)
+        )
+        return res.scalars().all()
+
+    @classmethod
+    async def search(
+        cls,
+        session: AsyncSession,
+        text: str,
+        limit: int,
+        offset: int = 0,
+        since: int = 0,
+    ) -> Sequence[Any]:
+        """
+        Returns page of tweets matching search text, best ranked first.
+        Matching goes through the GIN index, headlines are built for
+        the requested page only.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param text: Search text in web search syntax.
+        :type text: str
+        :param limit: Page size.
+        :type limit: int
+        :param offset: Number of results to skip.
+        :type offset: int
+        :param since: First tweet id to read, older partitions are skipped.
+        :type since: int
+        :return: Rows of tweet, rank and headline.
+        :rtype: Sequence
         """
-        res = await session.execute(select(cls).order_by(cls.id.desc()))
-        last = res.scalars().first()
-        print(last)
-        if not last:
-            return 1
-        return int(last.id + 1)
+        config = cast(SEARCH_CONFIG, REGCONFIG)
+        query = func.websearch_to_tsquery(config, text)
+        rank = func.ts_rank_cd(cls.search_vector, query)
+        page = (
+            select(cls.id, rank.label("rank"))
+            .filter(cls.search_vector.bool_op("@@")(query), cls.id >= since, cls.live())
+            .order_by(rank.desc(), cls.id.desc())
+            .limit(limit)
+            .offset(offset)
+            .subquery()
+        )
+        res = await session.execute(
+            select(
+                cls,
+                page.c.rank,
+                func.ts_headline(config, cls.content, query, HEADLINE_OPTIONS).label(
+                    "headline"
+                ),
+            )
+            .join(page, page.c.id == cls.id)
+            .options(
+                selectinload(cls.media),
+                selectinload(cls.author),
+            )
+            .order_by(page.c.rank.desc(), cls.id.desc())
+        )
+        return res.all()
+
+    @classmethod
+    async def feed_items(
+        cls,
+        session: AsyncSession,
+        tweets: Sequence[Any],
+        user_id: int,
+        preview: int = LIKES_PREVIEW,
+        fields: AbstractSet[str] = TWEET_FIELDS,
+    ) -> List[Dict[str, Any]]:
+        """
+        Converts tweets to feed items with like counter, liked_by_me flag,
+        impression counters and at most preview likers, so item size does
+        not grow with popularity.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param tweets: Tweets with loaded media and author.
+        :type tweets: Sequence
+        :param user_id: Id of current user.
+        :type user_id: int
+        :param preview: Number of likers per tweet.
+        :type preview: int
+        :param fields: Requested fields, likes and impressions are only
+            queried if requested.
+        :type fields: AbstractSet[str]
+        :return: Feed items.
+        :rtype: List[Dict[str, Any]]
+        """
+        ids = [int(tweet.id) for tweet in tweets]
+        if "likes" not in fields:
+            preview = 0
+        previews = await Likes.get_previews(session, ids, preview)
+        liked: Set[int] = set()
+        if ids and "liked_by_me" in fields:
+            liked = await Likes.get_liked(session, user_id, ids)
+        stats: Dict[int, Tuple[int, int]] = {}
+        if ids and fields & {"views", "viewers"}:
+            stats = await TweetStats.get_counts(session, ids)
+        items = [
+            {
+                "id": tweet.id,
+                "content": tweet.content,
+                "attachments": tweet.attachments,
+                "author": tweet.author,
+                "likes": previews[tweet.id],
+                "like_count": tweet.like_count,
+                "liked_by_me": tweet.id in liked,
+                "views": stats.get(tweet.id, (0, 0))[0],
+                "viewers": stats.get(tweet.id, (0, 0))[1],
+                "parent_id": tweet.parent_id,
+                "retweet_of_id": tweet.retweet_of_id,
+                "reply_count": tweet.reply_count,
+                "retweet_count": tweet.retweet_count,
+            }
+            for tweet in tweets
+        ]
+        if fields >= TWEET_FIELDS:
+            return items
+        return [
+            {key: value for key, value in item.items() if key in fields}
+            for item in items
+        ]
+
+    @classmethod
+    async def add_many(
+        cls, session: AsyncSession, author_id: int, contents: Sequence[str]
+    ) -> List[int]:
+        """
+        Inserts tweets of one author with multi-row inserts. Ids are
+        generated in the app, so nothing is read back.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param author_id: Author id.
+        :type author_id: int
+        :param contents: Tweet texts.
+        :type contents: Sequence[str]
+        :return: Ids of new tweets in the order of contents.
+        :rtype: List[int]
+        """
+        tweet_ids = [ids.next_id() for _ in contents]
+        rows = [
+            {"id": id, "content": content, "author_id": author_id}
+            for id, content in zip(tweet_ids, contents)
+        ]
+        await session.execute(insert(cls), rows)
+        return tweet_ids
 
 
 class Media(Base):
@@ -174,9 +1087,9 @@ class Media(Base):
 
     __tablename__ = "media"
 
-    id = Column(Integer, primary_key=True, nullable=False)
+    id = Column(BigInteger, primary_key=True, autoincrement=False, default=ids.next_id)
     filename = Column(String, nullable=False)
-    tweet_id = Column(Integer, ForeignKey("tweets.id", ondelete="CASCADE"))
+    tweet_id = Column(BigInteger, ForeignKey("tweets.id", ondelete="CASCADE"))
 
     @classmethod
     async def get_media_by_id(cls, session: AsyncSession, id: int) -> Any | None:
@@ -191,3 +1104,539 @@ class Media(Base):
         """
         res = await session.execute(select(cls).filter(cls.id == id))
         return res.unique().scalar_one_or_none()
+
+    @classmethod
+    async def get_tweet_ids(
+        cls, session: AsyncSession, ids: Iterable[int]
+    ) -> Dict[int, int | None]:
+        """
+        Returns tweets that existing media of given ids are attached to and
+        locks the media until the transaction ends.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param ids: Media ids.
+        :type ids: Iterable[int]
+        :return: Tweet id or None of every existing media id.
+        :rtype: Dict[int, int | None]
+        """
+        ids = list(ids)
+        if not ids:
+            return {}
+        res = await session.execute(
+            select(cls.id, cls.tweet_id).filter(cls.id.in_(ids)).with_for_update()
+        )
+        return {id: tweet_id for id, tweet_id in res.tuples()}
+
+    @classmethod
+    async def attach_many(
+        cls, session: AsyncSession, pairs: Iterable[Tuple[int, int]]
+    ) -> None:
+        """
+        Attaches media to tweets, media attached to another tweet is kept.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param pairs: Media id and tweet id pairs.
+        :type pairs: Iterable[Tuple[int, int]]
+        """
+        rows = [{"id": media_id, "tweet_id": tweet_id} for media_id, tweet_id in pairs]
+        if rows:
+            await session.execute(
+                update(cls)
+                .filter(cls.tweet_id.is_(None))
+                .execution_options(synchronize_session=None),
+                rows,
+            )
+
+
+class Hashtags(Base):
+    """
+    Hashtags association table.
+    """
+
+    __tablename__ = "hashtags"
+
+    tag = Column(String, primary_key=True)
+    tweet_id = Column(
+        BigInteger, ForeignKey("tweets.id", ondelete="CASCADE"), primary_key=True
+    )
+
+    __table_args__ = (Index("ix_hashtags_tweet_id", tweet_id),)
+
+    @classmethod
+    async def add_tags(
+        cls, session: AsyncSession, tweet_id: int, tags: Iterable[str]
+    ) -> None:
+        """
+        Links tweet with given hashtags.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param tweet_id: Tweet id.
+        :type tweet_id: int
+        :param tags: Normalized hashtags.
+        :type tags: Iterable[str]
+        """
+        rows = [{"tag": tag, "tweet_id": tweet_id} for tag in tags]
+        if rows:
+            await session.execute(insert(cls).on_conflict_do_nothing(), rows)
+
+    @classmethod
+    async def add_many(
+        cls, session: AsyncSession, pairs: Iterable[Tuple[str, int]]
+    ) -> None:
+        """
+        Links many tweets with their hashtags in one statement.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param pairs: Normalized hashtag and tweet id pairs.
+        :type pairs: Iterable[Tuple[str, int]]
+        """
+        rows = [{"tag": tag, "tweet_id": tweet_id} for tag, tweet_id in pairs]
+        if rows:
+            await session.execute(insert(cls).on_conflict_do_nothing(), rows)
+
+    @classmethod
+    async def get_tweets_by_tag(
+        cls,
+        session: AsyncSession,
+        tag: str,
+        limit: int,
+        cursor: int | None = None,
+        since: int = 0,
+    ) -> Sequence[Any]:
+        """
+        Returns page of tweets with given hashtag, newest first.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param tag: Normalized hashtag.
+        :type tag: str
+        :param limit: Page size.
+        :type limit: int
+        :param cursor: Id of the last tweet from previous page.
+        :type cursor: int | None
+        :param since: First tweet id to read, older partitions are skipped.
+        :type since: int
+        :return: Tweets
+        :rtype: Sequence
+        """
+        query = (
+            select(Tweets)
+            .join(cls, cls.tweet_id == Tweets.id)
+            .filter(
+                cls.tag == tag,
+                cls.tweet_id >= since,
+                Tweets.id >= since,
+                Tweets.live(),
+            )
+        )
+        if cursor is not None:
+            query = query.filter(cls.tweet_id < cursor)
+        res = await session.execute(
+            query.options(
+                selectinload(Tweets.media),
+                selectinload(Tweets.author),
+            )
+            .order_by(cls.tweet_id.desc())
+            .limit(limit)
+        )
+        return res.scalars().all()
+
+
+class Mentions(Base):
+    """
+    Mentions association table.
+    """
+
+    __tablename__ = "mentions"
+
+    user_id = Column(BigInteger, ForeignKey("users.id"), primary_key=True)
+    tweet_id = Column(
+        BigInteger, ForeignKey("tweets.id", ondelete="CASCADE"), primary_key=True
+    )
+
+    __table_args__ = (Index("ix_mentions_tweet_id", tweet_id),)
+
+    @classmethod
+    async def add_mentions(
+        cls, session: AsyncSession, tweet_id: int, handles: Iterable[str]
+    ) -> List[int]:
+        """
+        Links tweet with users mentioned by handle.
+        Handles are resolved in the same statement, unknown ones are skipped.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param tweet_id: Tweet id.
+        :type tweet_id: int
+        :param handles: Normalized user handles.
+        :type handles: Iterable[str]
+        :return: Ids of users mentioned for the first time.
+        :rtype: List[int]
+        """
+        handles = list(handles)
+        if not handles:
+            return []
+        res = await session.execute(
+            insert(cls)
+            .from_select(
+                ["user_id", "tweet_id"],
+                select(Users.id, literal(tweet_id)).filter(Users.handle.in_(handles)),
+            )
+            .on_conflict_do_nothing()
+            .returning(cls.user_id)
+        )
+        return list(res.scalars())
+
+    @classmethod
+    async def add_many(
+        cls, session: AsyncSession, pairs: Iterable[Tuple[str, int]]
+    ) -> None:
+        """
+        Links many tweets with users mentioned by handle in one statement.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param pairs: Normalized handle and tweet id pairs.
+        :type pairs: Iterable[Tuple[str, int]]
+        """
+        pairs = list(pairs)
+        if not pairs:
+            return
+        mentioned = values(
+            column("handle", String), column("tweet_id", BigInteger), name="mentioned"
+        ).data(pairs)
+        await session.execute(
+            insert(cls)
+            .from_select(
+                ["user_id", "tweet_id"],
+                select(Users.id, mentioned.c.tweet_id).join(
+                    mentioned, Users.handle == mentioned.c.handle
+                ),
+            )
+            .on_conflict_do_nothing()
+        )
+
+
+class TrendBuckets(Base):
+    """
+    Checkpointed hashtag counts per time bucket.
+    """
+
+    __tablename__ = "trend_buckets"
+
+    bucket = Column(Integer, primary_key=True)
+    tag = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False)
+
+
+class TweetStats(Base):
+    """
+    Impression counters per tweet, flushed by app/impressions.py.
+    """
+
+    __tablename__ = "tweet_stats"
+
+    tweet_id = Column(
+        BigInteger, ForeignKey("tweets.id", ondelete="CASCADE"), primary_key=True
+    )
+    views = Column(BigInteger, nullable=False, default=0, server_default="0")
+    # Estimated unique viewers and the HyperLogLog registers behind it.
+    viewers = Column(Integer, nullable=False, default=0, server_default="0")
+    sketch = Column(LargeBinary)
+
+    @classmethod
+    async def get_counts(
+        cls, session: AsyncSession, tweet_ids: Iterable[int]
+    ) -> Dict[int, Tuple[int, int]]:
+        """
+        Returns views and unique viewers of given tweets.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param tweet_ids: Tweet ids.
+        :type tweet_ids: Iterable[int]
+        :return: Views and viewers by tweet id, unseen tweets are missing.
+        :rtype: Dict[int, Tuple[int, int]]
+        """
+        res = await session.execute(
+            select(cls.tweet_id, cls.views, cls.viewers).filter(
+                cls.tweet_id.in_(tweet_ids)
+            )
+        )
+        return {tweet_id: (views, viewers) for tweet_id, views, viewers in res}
+
+
+class Outbox(Base):
+    """
+    Jobs written in the transaction of the change that needs them and
+    run after commit by app/jobs.py.
+    """
+
+    __tablename__ = "outbox"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=False, default=ids.next_id)
+    kind = Column(String, nullable=False)
+    payload = Column(JSONB, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    # Next attempt, NULL once the job ran out of attempts.
+    run_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_error = Column(String)
+
+    __table_args__ = (
+        Index(
+            "ix_outbox_run_at",
+            run_at,
+            id,
+            postgresql_where=run_at.is_not(None),
+        ),
+    )
+
+    @classmethod
+    def add(cls, session: AsyncSession, kind: str, payload: Dict[str, Any]) -> None:
+        """
+        Adds job to the current transaction of session.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param kind: Job kind, name of its handler.
+        :type kind: str
+        :param payload: Job arguments.
+        :type payload: Dict[str, Any]
+        """
+        session.add(cls(kind=kind, payload=payload))
+
+
+class AppliedJobs(Base):
+    """
+    Outbox jobs whose changes were committed on a shard other than the
+    shard of the job. A retried job finds itself here and is not applied
+    again.
+    """
+
+    __tablename__ = "applied_jobs"
+
+    job_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    applied_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+
+    __table_args__ = (Index("ix_applied_jobs_applied_at", applied_at),)
+
+    @classmethod
+    async def apply(cls, session: AsyncSession, job_id: int) -> bool:
+        """
+        Records job in the current transaction of session.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param job_id: Outbox job id.
+        :type job_id: int
+        :return: False if the job was applied before.
+        :rtype: bool
+        """
+        res = await session.execute(
+            insert(cls)
+            .values(job_id=job_id)
+            .on_conflict_do_nothing()
+            .returning(cls.job_id)
+        )
+        return res.first() is not None
+
+    @classmethod
+    async def prune(cls, session: AsyncSession, ttl: int) -> None:
+        """
+        Forgets jobs applied more than ttl seconds ago.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param ttl: Seconds a job is remembered, longer than its retries.
+        :type ttl: int
+        """
+        await session.execute(
+            delete(cls).filter(cls.applied_at < func.now() - timedelta(seconds=ttl))
+        )
+        await session.commit()
+
+
+class NotificationCounters(Base):
+    """
+    Unread notifications per user, kept by Notifications so the count
+    never needs a scan.
+    """
+
+    __tablename__ = "notification_counters"
+
+    user_id = Column(BigInteger, ForeignKey("users.id"), primary_key=True)
+    unread = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+class Notifications(Base):
+    """
+    Likes, follows and mentions addressed to a user. Events on the same
+    subject coalesce into one row while it is unread.
+    """
+
+    __tablename__ = "notifications"
+
+    # Renewed when an actor is coalesced in, so ids order by last activity.
+    id = Column(BigInteger, primary_key=True, autoincrement=False, default=ids.next_id)
+    user_id = Column(BigInteger, ForeignKey("users.id"), nullable=False)
+    kind = Column(String, nullable=False)
+    # 0 for follows. Tweets of other authors may live on other shards.
+    tweet_id = Column(BigInteger, nullable=False, default=0, server_default="0")
+    # Latest actor and number of actors coalesced so far.
+    actor_id = Column(BigInteger, ForeignKey("users.id"), nullable=False)
+    actor_count = Column(Integer, nullable=False, default=1, server_default="1")
+    read = Column(Boolean, nullable=False, default=False, server_default="false")
+
+    __table_args__ = (
+        Index("ix_notifications_user_id_id", user_id, id.desc()),
+        Index(
+            "ix_notifications_unread_subject",
+            user_id,
+            kind,
+            tweet_id,
+            unique=True,
+            postgresql_where=read.is_(False),
+        ),
+    )
+
+    @classmethod
+    async def notify(
+        cls,
+        session: AsyncSession,
+        user_id: int,
+        kind: str,
+        actor_id: int,
+        tweet_id: int = 0,
+    ) -> None:
+        """
+        Adds event to the unread notification of its subject, creating it
+        if needed. A repeated event of the latest actor is ignored.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param user_id: Recipient id.
+        :type user_id: int
+        :param kind: Event kind: like, follow, mention, reply or retweet.
+        :type kind: str
+        :param actor_id: Id of user who caused the event.
+        :type actor_id: int
+        :param tweet_id: Tweet the event is about, 0 for follows.
+        :type tweet_id: int
+        """
+        stmt = insert(cls).values(
+            id=ids.next_id(),
+            user_id=user_id,
+            kind=kind,
+            tweet_id=tweet_id,
+            actor_id=actor_id,
+        )
+        res = await session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[cls.user_id, cls.kind, cls.tweet_id],
+                index_where=cls.read.is_(False),
+                set_={
+                    "id": stmt.excluded.id,
+                    "actor_id": stmt.excluded.actor_id,
+                    "actor_count": cls.actor_count + 1,
+                },
+                where=cls.actor_id != stmt.excluded.actor_id,
+            ).returning(literal_column("xmax = 0", Boolean).label("inserted"))
+        )
+        if res.scalar():
+            counter = insert(NotificationCounters).values(user_id=user_id, unread=1)
+            await session.execute(
+                counter.on_conflict_do_update(
+                    index_elements=[NotificationCounters.user_id],
+                    set_={"unread": NotificationCounters.unread + 1},
+                )
+            )
+
+    @classmethod
+    async def get_page(
+        cls, session: AsyncSession, user_id: int, limit: int, cursor: int | None = None
+    ) -> Sequence[Any]:
+        """
+        Returns page of notifications of user, latest activity first.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param user_id: Recipient id.
+        :type user_id: int
+        :param limit: Page size.
+        :type limit: int
+        :param cursor: Id of the last notification from previous page.
+        :type cursor: int | None
+        :return: Rows of notification and actor name.
+        :rtype: Sequence
+        """
+        query = (
+            select(cls, Users.name)
+            .join(Users, Users.id == cls.actor_id)
+            .filter(cls.user_id == user_id)
+        )
+        if cursor is not None:
+            query = query.filter(cls.id < cursor)
+        res = await session.execute(query.order_by(cls.id.desc()).limit(limit))
+        return res.all()
+
+    @classmethod
+    async def get_unread(cls, session: AsyncSession, user_id: int) -> int:
+        """
+        Returns number of unread notifications of user.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param user_id: Recipient id.
+        :type user_id: int
+        :return: Unread count.
+        :rtype: int
+        """
+        res = await session.execute(
+            select(NotificationCounters.unread).filter(
+                NotificationCounters.user_id == user_id
+            )
+        )
+        return res.scalar() or 0
+
+    @classmethod
+    async def mark_read(
+        cls, session: AsyncSession, user_id: int, until: int | None = None
+    ) -> int:
+        """
+        Marks notifications of user as read.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param user_id: Recipient id.
+        :type user_id: int
+        :param until: Id of the newest notification to mark, all by default.
+        :type until: int | None
+        :return: Unread count left.
+        :rtype: int
+        """
+        query = update(cls).filter(cls.user_id == user_id, cls.read.is_(False))
+        if until is not None:
+            query = query.filter(cls.id <= until)
+        updated = await session.execute(
+            query.values(read=True).execution_options(synchronize_session=False)
+        )
+        marked = updated.rowcount  # type: ignore[attr-defined]
+        res = await session.execute(
+            update(NotificationCounters)
+            .filter(NotificationCounters.user_id == user_id)
+            .values(unread=func.greatest(NotificationCounters.unread - marked, 0))
+            .returning(NotificationCounters.unread)
+        )
+        return res.scalar() or 0
+
+    def to_dict(self, actor_name: str) -> Dict[str, Any]:
+        """
+        Converts notification to response dict.
+        :param actor_name: Name of the latest actor.
+        :type actor_name: str
+        :return: Dict with notification data.
+        :rtype: Dict
+        """
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "tweet_id": self.tweet_id or None,
+            "actor": {"id": self.actor_id, "name": actor_name},
+            "others": self.actor_count - 1,
+            "read": self.read,
+        }
+
+
+for partitioned in (Tweets.__table__, Likes.__table__):
+    event.listen(partitioned, "after_create", create_partitions)
@@ -0,0 +1,133 @@
+import logging
+import os
+import time
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+
+# Ids are kept within 53 bits, so JavaScript clients read them exactly:
+# milliseconds since EPOCH_MS, then worker id, then per-millisecond sequence.
+EPOCH_MS = 1_704_067_200_000  # 2024-01-01T00:00:00Z
+TIMESTAMP_BITS = 40
+WORKER_BITS = 5
+SEQUENCE_BITS = 8
+MAX_WORKERS = 1 << WORKER_BITS
+TIMESTAMP_SHIFT = WORKER_BITS + SEQUENCE_BITS
+SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+# Used until a worker id is claimed, and for scripts outside the app.
+WORKER_ID = int(os.getenv("WORKER_ID", 0))
+# Advisory lock namespace of worker ids.
+WORKER_LOCK = 46046
+
+logger = logging.getLogger(__name__)
+
+
+def id_at(timestamp: float) -> int:
+    """
+    Returns the smallest id generated at given time.
+    :param timestamp: Unix timestamp.
+    :type timestamp: float
+    :return: Id.
+    :rtype: int
+    """
+    return max(int(timestamp * 1000) - EPOCH_MS, 0) << TIMESTAMP_SHIFT
+
+
+def compose_id(timestamp_ms: int, worker_id: int, sequence: int) -> int:
+    """
+    Returns id made of given parts.
+    :param timestamp_ms: Unix time in milliseconds.
+    :type timestamp_ms: int
+    :param worker_id: Worker id, below MAX_WORKERS.
+    :type worker_id: int
+    :param sequence: Sequence number, only its low SEQUENCE_BITS are kept.
+    :type sequence: int
+    :return: Id.
+    :rtype: int
+    """
+    return (
+        (timestamp_ms - EPOCH_MS) << TIMESTAMP_SHIFT
+        | worker_id << SEQUENCE_BITS
+        | (sequence & SEQUENCE_MASK)
+    )
+
+
+def id_time(id: int) -> float:
+    """
+    Returns unix timestamp encoded in given id.
+    """
+    return ((id >> TIMESTAMP_SHIFT) + EPOCH_MS) / 1000
+
+
+class IdGenerator:
+    """
+    Snowflake style id generator. Ids of one worker are strictly increasing
+    and ids of different workers never collide, so they are assigned
+    without a database round trip.
+    """
+
+    def __init__(self, worker_id: int = WORKER_ID):
+        self.worker_id = worker_id
+        self._last = -1
+        self._sequence = 0
+        self._engine: AsyncEngine | None = None
+        self._connection: AsyncConnection | None = None
+
+    def next_id(self) -> int:
+        """
+        Returns new id.
+        :return: Id.
+        :rtype: int
+        """
+        now = int(time.time() * 1000) - EPOCH_MS
+        if now <= self._last:
+            # Same millisecond or clock moved back: continue the sequence,
+            # borrowing the next millisecond when it runs out.
+            now = self._last
+            self._sequence = (self._sequence + 1) & SEQUENCE_MASK
+            if not self._sequence:
+                now += 1
+        else:
+            self._sequence = 0
+        self._last = now
+        return now << TIMESTAMP_SHIFT | self.worker_id << SEQUENCE_BITS | self._sequence
+
+    async def claim(self, engine: AsyncEngine) -> None:
+        """
+        Takes the first free worker id with a session advisory lock. The
+        lock lives as long as its connection, which is kept until release.
+        The connection is opened outside the pool of engine, so the pool
+        keeps its full size.
+        :param engine: Database engine.
+        :type engine: AsyncEngine
+        """
+        lock_engine = create_async_engine(engine.url, poolclass=NullPool)
+        connection = await lock_engine.connect()
+        for worker_id in range(MAX_WORKERS):
+            res = await connection.execute(
+                select(func.pg_try_advisory_lock(WORKER_LOCK, worker_id))
+            )
+            if res.scalar():
+                await connection.commit()
+                self.worker_id = worker_id
+                self._engine, self._connection = lock_engine, connection
+                return
+        await connection.close()
+        await lock_engine.dispose()
+        logger.warning(
+            "No free worker id, using the configured one.",
+            extra={"worker_id": self.worker_id},
+        )
+
+    async def release(self) -> None:
+        """
+        Frees claimed worker id. Closing the connection drops its lock.
+        """
+        if self._connection is not None and self._engine is not None:
+            await self._connection.close()
+            await self._engine.dispose()
+            self._engine, self._connection = None, None
+
+
+ids = IdGenerator()
@@ -0,0 +1,253 @@
+import asyncio
+import heapq
+import itertools
+import os
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+from metrics import instrument_engine
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from .database import POOL_MAX_OVERFLOW, POOL_SIZE, async_session
+from .db_models import Tweets
+
+# Databases of the shards after the home one, comma separated.
+SHARD_URLS = [url for url in os.getenv("SHARD_URLS", "").split(",") if url]
+# Keeps users, follows and trends. Every shard has a copy of users.
+HOME_SHARD = 0
+
+T = TypeVar("T")
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """
+    Jump consistent hash. Going from n to n + 1 buckets moves only
+    1 / (n + 1) of the keys, all of them to the new bucket.
+    :param key: Key.
+    :type key: int
+    :param buckets: Number of buckets.
+    :type buckets: int
+    :return: Bucket of key.
+    :rtype: int
+    """
+    key &= 0xFFFFFFFFFFFFFFFF
+    bucket, jump = -1, 0
+    while jump < buckets:
+        bucket = jump
+        key = (key * 2862933555777941143 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+class ShardRouter:
+    """
+    Maps users to databases. Tweets of a user live on the shard of the
+    author together with their media, hashtags, mentions, likes and stats.
+    Users, follows and trends stay on the home shard.
+    """
+
+    def __init__(self, session_makers: Sequence[async_sessionmaker]):
+        self.session_makers = list(session_makers)
+
+    def __len__(self) -> int:
+        return len(self.session_makers)
+
+    def shard_of(self, user_id: int) -> int:
+        """
+        Returns shard holding tweets of given user.
+        """
+        return jump_hash(user_id, len(self.session_makers))
+
+    @asynccontextmanager
+    async def session(
+        self, session: AsyncSession, shard: int, session_shard: int = HOME_SHARD
+    ) -> AsyncIterator[AsyncSession]:
+        """
+        Yields session of given shard. The given session serves its own
+        shard, other shards get a new session closed on exit.
+        :param session: Request session, bound to the home shard.
+        :type session: AsyncSession
+        :param shard: Shard index.
+        :type shard: int
+        :param session_shard: Shard of session, if it is not a request one.
+        :type session_shard: int
+        :return: Shard session.
+        :rtype: AsyncIterator[AsyncSession]
+        """
+        if shard == session_shard:
+            yield session
+            return
+        async with self.session_makers[shard]() as shard_session:
+            yield shard_session
+
+    def user_session(
+        self, session: AsyncSession, user_id: int
+    ) -> AsyncContextManager[AsyncSession]:
+        """
+        Yields session of the shard holding tweets of given user.
+        """
+        return self.session(session, self.shard_of(user_id))
+
+    def session_maker(
+        self, session_maker: async_sessionmaker, shard: int
+    ) -> async_sessionmaker:
+        """
+        Returns session factory of given shard for work outliving the
+        request, session_maker serves the home shard.
+        """
+        return session_maker if shard == HOME_SHARD else self.session_makers[shard]
+
+    async def gather(
+        self,
+        session: AsyncSession,
+        read: Callable[[AsyncSession], Awaitable[T]],
+        shards: Sequence[int] | None = None,
+    ) -> List[T]:
+        """
+        Runs read on every shard concurrently.
+        :param session: Request session, bound to the home shard.
+        :type session: AsyncSession
+        :param read: Coroutine function taking shard session.
+        :type read: Callable[[AsyncSession], Awaitable[T]]
+        :param shards: Shard indexes, all by default.
+        :type shards: Sequence[int] | None
+        :return: Results in the order of shards.
+        :rtype: List[T]
+        """
+
+        async def run(shard: int) -> T:
+            async with self.session(session, shard) as shard_session:
+                return await read(shard_session)
+
+        if shards is None:
+            shards = range(len(self.session_makers))
+        return list(await asyncio.gather(*(run(shard) for shard in shards)))
+
+    async def locate_tweet(
+        self, session: AsyncSession, tweet_id: int
+    ) -> Tuple[int, int] | None:
+        """
+        Finds shard of tweet with given id, unless it is deleted.
+        :param session: Request session, bound to the home shard.
+        :type session: AsyncSession
+        :param tweet_id: Tweet id.
+        :type tweet_id: int
+        :return: Shard index and author id.
+        :rtype: Tuple[int, int] | None
+        """
+        authors = await self.gather(
+            session, lambda shard_session: Tweets.get_author_id(shard_session, tweet_id)
+        )
+        for shard, author_id in enumerate(authors):
+            if author_id is not None:
+                return shard, author_id
+        return None
+
+    @staticmethod
+    def merge(
+        pages: Sequence[Sequence[T]],
+        key: Callable[[T], Any],
+        offset: int,
+        limit: int,
+    ) -> List[Tuple[int, T]]:
+        """
+        Merges pages of shards sorted by key in descending order.
+        :param pages: Page of every shard.
+        :type pages: Sequence[Sequence[T]]
+        :param key: Sort key.
+        :type key: Callable[[T], Any]
+        :param offset: Number of merged rows to skip.
+        :type offset: int
+        :param limit: Page size.
+        :type limit: int
+        :return: Shard index and row of the merged page.
+        :rtype: List[Tuple[int, T]]
+        """
+        tagged = [
+            zip(itertools.repeat(shard), page) for shard, page in enumerate(pages)
+        ]
+        merged = heapq.merge(*tagged, key=lambda item: key(item[1]), reverse=True)
+        return list(itertools.islice(merged, offset, offset + limit))
+
+    async def feed_items(
+        self,
+        session: AsyncSession,
+        tweets: Sequence[Tuple[int, Any]],
+        user_id: int,
+        **kwargs: Any,
+    ) -> List[Dict[str, Any]]:
+        """
+        Builds feed items of tweets from several shards, each shard queries
+        likes of its own tweets.
+        :param session: Request session, bound to the home shard.
+        :type session: AsyncSession
+        :param tweets: Shard index and tweet, in feed order.
+        :type tweets: Sequence[Tuple[int, Any]]
+        :param user_id: Id of current user.
+        :type user_id: int
+        :return: Feed items in the order of tweets.
+        :rtype: List[Dict[str, Any]]
+        """
+        by_shard: Dict[int, List[Any]] = defaultdict(list)
+        for shard, tweet in tweets:
+            by_shard[shard].append(tweet)
+
+        async def build(shard: int, shard_tweets: List[Any]) -> List[Dict[str, Any]]:
+            async with self.session(session, shard) as shard_session:
+                return await Tweets.feed_items(
+                    shard_session, shard_tweets, user_id, **kwargs
+                )
+
+        results = await asyncio.gather(
+            *(build(shard, shard_tweets) for shard, shard_tweets in by_shard.items())
+        )
+        items = {item["id"]: item for result in results for item in result}
+        return [items[tweet.id] for _, tweet in tweets]
+
+
+def create_shard_engine(url: str) -> AsyncEngine:
+    """
+    Returns engine of a shard database with the pool settings of the home
+    one.
+    """
+    shard_engine = create_async_engine(
+        url, pool_size=POOL_SIZE, max_overflow=POOL_MAX_OVERFLOW
+    )
+    instrument_engine(shard_engine)
+    return shard_engine
+
+
+shard_engines = [create_shard_engine(url) for url in SHARD_URLS]
+shards = ShardRouter(
+    [async_session]
+    + [
+        async_sessionmaker(bind=shard_engine, expire_on_commit=False)
+        for shard_engine in shard_engines
+    ]
+)
+
+
+def get_shards() -> ShardRouter:
+    """
+    Returns shard router of the app.
+    :return: Shard router.
+    :rtype: ShardRouter
+    """
+    return shards
@@ -0,0 +1,71 @@
+import hashlib
+import math
+import os
+from typing import Iterable
+
+# 2 ** precision one byte registers, standard error 1.04 / sqrt(2 ** precision).
+HLL_PRECISION = int(os.getenv("HLL_PRECISION", 10))
+HASH_BITS = 64
+
+
+class HyperLogLog:
+    """
+    HyperLogLog sketch estimating number of distinct values in fixed
+    memory. Sketches of the same precision merge without loss, so each
+    worker can count on its own and the results are combined later.
+    """
+
+    def __init__(self, precision: int = HLL_PRECISION, registers: bytes | None = None):
+        self.precision = precision
+        self.size = 1 << precision
+        if registers is not None and len(registers) == self.size:
+            self.registers = bytearray(registers)
+        else:
+            self.registers = bytearray(self.size)
+
+    def add(self, value: int | str) -> None:
+        """
+        Adds value to the sketch.
+        :param value: Counted value.
+        :type value: int | str
+        """
+        digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+        hashed = int.from_bytes(digest, "big")
+        index = hashed >> (HASH_BITS - self.precision)
+        rest = hashed & ((1 << (HASH_BITS - self.precision)) - 1)
+        rank = HASH_BITS - self.precision - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values: Iterable[int | str]) -> None:
+        """
+        Adds values to the sketch.
+        :param values: Counted values.
+        :type values: Iterable[int | str]
+        """
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "HyperLogLog") -> None:
+        """
+        Adds values counted by other sketch of the same precision.
+        :param other: Other sketch.
+        :type other: HyperLogLog
+        """
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        """
+        Returns estimated number of distinct values.
+        :return: Estimate.
+        :rtype: int
+        """
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size**2 / sum(2.0**-r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            estimate = self.size * math.log(self.size / zeros)
+        return round(estimate)
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import os
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.future import select
+
+from app.db.db_models import Tweets, TweetStats
+from app.hll import HLL_PRECISION, HyperLogLog
+
+IMPRESSIONS_FLUSH_INTERVAL = int(os.getenv("IMPRESSIONS_FLUSH_INTERVAL", 10))
+
+logger = logging.getLogger(__name__)
+
+
+class ImpressionCounter:
+    """
+    Tweet view counter.
+    Views of this worker are aggregated in memory and periodically added
+    to the tweet_stats table, one batch per flush. Unique viewers are
+    merged into the HyperLogLog sketch stored with each tweet.
+    """
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self._views: Counter = Counter()
+        self._viewers: Dict[int, Set[int]] = defaultdict(set)
+
+    def add(self, tweet_ids: Iterable[int], user_id: int) -> None:
+        """
+        Counts a view of each tweet by user. Never touches the database.
+        :param tweet_ids: Shown tweet ids.
+        :type tweet_ids: Iterable[int]
+        :param user_id: Viewer id.
+        :type user_id: int
+        """
+        for tweet_id in tweet_ids:
+            self._views[tweet_id] += 1
+            self._viewers[tweet_id].add(user_id)
+
+    def _take(self) -> Tuple[Counter, Dict[int, Set[int]]]:
+        views, self._views = self._views, Counter()
+        viewers, self._viewers = self._viewers, defaultdict(set)
+        return views, viewers
+
+    def _restore(self, views: Counter, viewers: Dict[int, Set[int]]) -> None:
+        self._views.update(views)
+        for tweet_id, users in viewers.items():
+            self._viewers[tweet_id].update(users)
+
+    async def _write(
+        self, session: AsyncSession, views: Counter, viewers: Dict[int, Set[int]]
+    ) -> List[int]:
+        ids = sorted(views)
+        # Tweets purged since they were shown, or kept by another shard,
+        # are skipped.
+        await session.execute(
+            insert(TweetStats)
+            .from_select(
+                [TweetStats.tweet_id],
+                select(Tweets.id).filter(Tweets.id.in_(ids)),
+            )
+            .on_conflict_do_nothing()
+        )
+        res = await session.execute(
+            select(TweetStats.tweet_id, TweetStats.views, TweetStats.sketch)
+            .filter(TweetStats.tweet_id.in_(ids))
+            .order_by(TweetStats.tweet_id)
+            .with_for_update()
+        )
+        rows = []
+        for tweet_id, saved_views, sketch in res:
+            hll = HyperLogLog(self.precision, sketch)
+            hll.update(viewers[tweet_id])
+            rows.append(
+                {
+                    "tweet_id": tweet_id,
+                    "views": saved_views + views[tweet_id],
+                    "viewers": hll.count(),
+                    "sketch": hll.to_bytes(),
+                }
+            )
+        if rows:
+            await session.execute(update(TweetStats), rows)
+        await session.commit()
+        return [row["tweet_id"] for row in rows]
+
+    async def flush(self, session: AsyncSession) -> None:
+        """
+        Adds pending views to tweet_stats. Rows are locked in id order
+        while sketches are merged, so concurrent flushes of other workers
+        neither deadlock nor lose viewers.
+        :param session: Database session.
+        :type session: AsyncSession
+        """
+        views, viewers = self._take()
+        if not views:
+            return
+        try:
+            await self._write(session, views, viewers)
+        except BaseException:
+            self._restore(views, viewers)
+            raise
+
+    async def flush_shards(self, session_makers: Sequence[async_sessionmaker]) -> None:
+        """
+        Adds pending views to tweet_stats of every shard, each shard keeps
+        stats of its own tweets. Views not written yet are kept on failure
+        or cancellation.
+        :param session_makers: Session maker of every shard.
+        :type session_makers: Sequence[async_sessionmaker]
+        """
+        views, viewers = self._take()
+        try:
+            for session_maker in session_makers:
+                if not views:
+                    break
+                async with session_maker() as session:
+                    written = await self._write(session, views, viewers)
+                for tweet_id in written:
+                    del views[tweet_id]
+                    viewers.pop(tweet_id, None)
+        except BaseException:
+            self._restore(views, viewers)
+            raise
+
+    async def run(
+        self,
+        session_makers: Sequence[async_sessionmaker],
+        interval: int = IMPRESSIONS_FLUSH_INTERVAL,
+    ) -> None:
+        """
+        Flushes views until cancelled.
+        :param session_makers: Session maker of every shard.
+        :type session_makers: Sequence[async_sessionmaker]
+        :param interval: Seconds between flushes.
+        :type interval: int
+        """
+        while True:
+            try:
+                await self.flush_shards(session_makers)
+            except (SQLAlchemyError, OSError):
+                logger.exception("Impressions flush failed.")
+            await asyncio.sleep(interval)
+
+
+impressions = ImpressionCounter()
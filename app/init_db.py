@@ -1,7 +1,17 @@
-from db.db_models import Users
+import asyncio
+import sys
+
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
+# Run as a script from app/, modules are imported from the package, like
+# the routers do, so the app and the tests share one copy of each.
+sys.path.append("..")
+from app.db.database import async_session, engine  # noqa: E402
+from app.db.db_models import Base, Users  # noqa: E402
+from app.db.shards import HOME_SHARD, shard_engines, shards  # noqa: E402
+from app.reshard import mirror_users  # noqa: E402
+
 TEST_USERS = [
     {"name": "Stan Marsh", "api_key": "test"},
     {"name": "Kyle Broflovski", "api_key": "test2"},
@@ -16,8 +26,31 @@ async def init_db(session: AsyncSession) -> None:
     :param session: Asynchronous session
     :type session: AsyncSession
     """
-    res = await session.execute(select(Users))
+    res = await session.execute(select(Users.id).limit(1))
     if not res.first():
         new_users = [Users(**user) for user in TEST_USERS]
         session.add_all(new_users)
         await session.commit()
+
+
+async def main() -> None:
+    """
+    Creates tables on every shard and fills them with init data.
+    Run once per deployment before starting the app.
+    """
+    for shard_engine in [engine] + shard_engines:
+        async with shard_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    async with async_session() as session:
+        await init_db(session=session)
+        for shard in range(len(shards)):
+            if shard != HOME_SHARD:
+                async with shards.session_makers[shard]() as shard_session:
+                    await mirror_users(session, shard_session)
+    await engine.dispose()
+    for shard_engine in shard_engines:
+        await shard_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,315 @@
+import asyncio
+import logging
+import os
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, Sequence, Tuple
+
+import aiofiles.os
+from metrics import JOB_DURATION, JOBS_PROCESSED, JOBS_QUEUED
+from sqlalchemy import case, delete, func, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.future import select
+
+from app.db.db_models import (
+    AppliedJobs,
+    Hashtags,
+    Mentions,
+    Notifications,
+    Outbox,
+    Tweets,
+)
+from app.db.shards import HOME_SHARD, shards
+from app.twitter_funcs import extract_hashtags, extract_mentions
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 1))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 8))
+# Delay before the first retry, doubled on every next one.
+JOB_BACKOFF = float(os.getenv("JOB_BACKOFF", 2))
+JOB_DEPTH_INTERVAL = int(os.getenv("JOB_DEPTH_INTERVAL", 15))
+# Seconds applied jobs are remembered, far beyond the last retry.
+JOB_APPLIED_TTL = int(os.getenv("JOB_APPLIED_TTL", 86_400))
+JOB_ERROR_LENGTH = 1000
+# Failures of handlers that are recorded on the job and retried, other
+# exceptions are bugs and stop the worker.
+JOB_ERRORS = (SQLAlchemyError, OSError, LookupError, TypeError, ValueError)
+
+INDEX_TWEET = "index_tweet"
+REMOVE_FILES = "remove_files"
+NOTIFY = "notify"
+COUNT_TWEET = "count_tweet"
+
+# Handlers get the session and index of the shard of the job and its payload.
+Handler = Callable[[AsyncSession, int, Dict[str, Any]], Awaitable[None]]
+
+logger = logging.getLogger(__name__)
+
+# Id of the job run by the current handler.
+current_job: ContextVar[int] = ContextVar("current_job")
+
+
+class JobRunner:
+    """
+    Runs outbox jobs after the transactions that wrote them committed.
+    Workers claim jobs with FOR UPDATE SKIP LOCKED, so any number of them
+    share the queue. A handler runs in the transaction that deletes its
+    job: database changes of a job are applied once, other effects must
+    be idempotent as failed jobs are retried with exponential backoff.
+    Changes committed on another shard record current_job in applied_jobs.
+    """
+
+    def __init__(
+        self, max_attempts: int = JOB_MAX_ATTEMPTS, backoff: float = JOB_BACKOFF
+    ):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.handlers: Dict[str, Handler] = {}
+
+    def handler(self, kind: str) -> Callable[[Handler], Handler]:
+        """
+        Registers decorated coroutine function as handler of jobs of kind.
+        :param kind: Job kind.
+        :type kind: str
+        :return: Decorator.
+        :rtype: Callable[[Handler], Handler]
+        """
+
+        def register(func: Handler) -> Handler:
+            self.handlers[kind] = func
+            return func
+
+        return register
+
+    async def run_one(self, session: AsyncSession, shard: int = HOME_SHARD) -> bool:
+        """
+        Claims and runs the next due job.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param shard: Shard of session.
+        :type shard: int
+        :return: False if no job was due.
+        :rtype: bool
+        """
+        res = await session.execute(
+            select(Outbox.id, Outbox.kind, Outbox.payload, Outbox.attempts)
+            .filter(Outbox.run_at <= func.now())
+            .order_by(Outbox.run_at, Outbox.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        job = res.first()
+        if job is None:
+            # Unlike a rollback, ends the transaction without expiring
+            # objects loaded by session.
+            await session.commit()
+            return False
+        job_id, kind, payload, attempts = job
+        started = time.perf_counter()
+        token = current_job.set(job_id)
+        try:
+            async with session.begin_nested():
+                await self.handlers[kind](session, shard, payload)
+        except JOB_ERRORS as exc:
+            attempts += 1
+            values: Dict[str, Any] = {
+                "attempts": attempts,
+                "last_error": repr(exc)[:JOB_ERROR_LENGTH],
+            }
+            if attempts >= self.max_attempts:
+                values["run_at"] = None
+                result = "dead"
+                logger.exception("Job failed for good.", extra={"job_id": job_id})
+            else:
+                delay = self.backoff * 2 ** (attempts - 1)
+                values["run_at"] = func.now() + timedelta(seconds=delay)
+                result = "retry"
+                logger.warning(
+                    "Job failed, retrying.",
+                    extra={"job_id": job_id, "kind": kind, "error": repr(exc)},
+                )
+            await session.execute(
+                update(Outbox).filter(Outbox.id == job_id).values(**values)
+            )
+        else:
+            await session.execute(delete(Outbox).filter(Outbox.id == job_id))
+            result = "done"
+        finally:
+            current_job.reset(token)
+        await session.commit()
+        JOB_DURATION.labels(kind=kind).observe(time.perf_counter() - started)
+        JOBS_PROCESSED.labels(kind=kind, result=result).inc()
+        return True
+
+    async def drain(self, session: AsyncSession, shard: int = HOME_SHARD) -> int:
+        """
+        Runs due jobs until none is left.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param shard: Shard of session.
+        :type shard: int
+        :return: Number of jobs run.
+        :rtype: int
+        """
+        count = 0
+        while await self.run_one(session, shard):
+            count += 1
+        return count
+
+    async def measure(self, session: AsyncSession) -> Dict[Tuple[str, str], int]:
+        """
+        Counts outbox jobs by kind and state.
+        :param session: Database session.
+        :type session: AsyncSession
+        :return: Number of jobs by kind and state, pending or dead.
+        :rtype: Dict[Tuple[str, str], int]
+        """
+        state = case((Outbox.run_at.is_(None), "dead"), else_="pending")
+        res = await session.execute(
+            select(Outbox.kind, state, func.count()).group_by(Outbox.kind, state)
+        )
+        return {(kind, job_state): count for kind, job_state, count in res}
+
+    async def work(
+        self,
+        session_maker: async_sessionmaker,
+        shard: int = HOME_SHARD,
+        interval: float = JOB_POLL_INTERVAL,
+    ) -> None:
+        """
+        Runs jobs until cancelled, polling when the queue is empty.
+        :param session_maker: Asynchronous session maker.
+        :type session_maker: async_sessionmaker
+        :param shard: Shard of session_maker.
+        :type shard: int
+        :param interval: Seconds between polls.
+        :type interval: float
+        """
+        while True:
+            try:
+                async with session_maker() as session:
+                    await self.drain(session, shard)
+            except (SQLAlchemyError, OSError):
+                logger.exception("Job runner failed.")
+            await asyncio.sleep(interval)
+
+    async def watch(
+        self,
+        session_makers: Sequence[async_sessionmaker],
+        interval: int = JOB_DEPTH_INTERVAL,
+    ) -> None:
+        """
+        Updates queue depth gauges, summed over shards, and forgets old
+        applied jobs until cancelled.
+        :param session_makers: Session maker of every shard.
+        :type session_makers: Sequence[async_sessionmaker]
+        :param interval: Seconds between updates.
+        :type interval: int
+        """
+        while True:
+            try:
+                counts: Counter = Counter()
+                for session_maker in session_makers:
+                    async with session_maker() as session:
+                        counts.update(await self.measure(session))
+                        await AppliedJobs.prune(session, JOB_APPLIED_TTL)
+                for kind in set(self.handlers) | {key[0] for key in counts}:
+                    for state in ("pending", "dead"):
+                        JOBS_QUEUED.labels(kind=kind, state=state).set(
+                            counts[kind, state]
+                        )
+            except (SQLAlchemyError, OSError):
+                logger.exception("Job queue measure failed.")
+            await asyncio.sleep(interval)
+
+
+jobs = JobRunner()
+
+
+@jobs.handler(INDEX_TWEET)
+async def index_tweet(
+    session: AsyncSession, shard: int, payload: Dict[str, Any]
+) -> None:
+    """
+    Links new tweet with its hashtags and mentioned users, who are
+    notified.
+    """
+    tweet_id = payload["tweet_id"]
+    author_id = await Tweets.get_author_id(session, tweet_id)
+    if author_id is None:
+        return  # deleted before it was indexed
+    content = payload["content"]
+    await Hashtags.add_tags(session, tweet_id, extract_hashtags(content))
+    mentioned = await Mentions.add_mentions(
+        session, tweet_id, extract_mentions(content)
+    )
+    for user_id in mentioned:
+        if user_id != author_id:
+            Outbox.add(
+                session,
+                NOTIFY,
+                {
+                    "user_id": user_id,
+                    "kind": "mention",
+                    "actor_id": author_id,
+                    "tweet_id": tweet_id,
+                },
+            )
+
+
+@jobs.handler(NOTIFY)
+async def notify(session: AsyncSession, shard: int, payload: Dict[str, Any]) -> None:
+    """
+    Delivers notification to the shard of its recipient. Another shard
+    commits before the job is deleted, so it records the job to skip a
+    retry.
+    """
+    recipient_shard = shards.shard_of(payload["user_id"])
+    async with shards.session(session, recipient_shard, shard) as target:
+        if target is session:
+            await Notifications.notify(target, **payload)
+        elif await AppliedJobs.apply(target, current_job.get()):
+            await Notifications.notify(target, **payload)
+            await target.commit()
+
+
+@jobs.handler(COUNT_TWEET)
+async def count_tweet(
+    session: AsyncSession, shard: int, payload: Dict[str, Any]
+) -> None:
+    """
+    Changes reply or retweet counter of a tweet. Replies and retweets may
+    live on another shard than the tweet, so the shard of the job is
+    tried first, then the others. Another shard records the job, like
+    notify does.
+    """
+    args = payload["tweet_id"], payload["counter"], payload["delta"]
+    if await Tweets.add_to_counter(session, *args):
+        return
+    for target_shard in range(len(shards)):
+        if target_shard == shard:
+            continue
+        async with shards.session(session, target_shard, shard) as target:
+            if not await AppliedJobs.apply(target, current_job.get()):
+                return
+            if await Tweets.add_to_counter(target, *args):
+                await target.commit()
+                return
+
+
+@jobs.handler(REMOVE_FILES)
+async def remove_files(
+    session: AsyncSession, shard: int, payload: Dict[str, Any]
+) -> None:
+    """
+    Removes media files of purged tweets.
+    """
+    path = os.getenv("MEDIA_PATH", "./media/")
+    for filename in payload["filenames"]:
+        try:
+            await aiofiles.os.remove("".join((path, filename)))
+        except FileNotFoundError:
+            pass
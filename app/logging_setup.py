@@ -0,0 +1,85 @@
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Share of high-volume info records (access log, validation errors) kept.
+LOG_SAMPLE = float(os.getenv("LOG_SAMPLE", 0.1))
+# Requests slower than this are logged as warnings, so never sampled out.
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", 1))
+REQUEST_ID_HEADER = b"x-request-id"
+REQUEST_ID_MAX_LENGTH = 64
+
+request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has, anything else was passed in extra.
+RECORD_ATTRIBUTES = frozenset(
+    logging.LogRecord("", 0, "", 0, "", None, None).__dict__
+) | {"message", "asctime", "sample", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as JSON lines with extra fields and request id.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+            + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        current_request = request_id.get()
+        if current_request:
+            entry["request_id"] = current_request
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Drops records with a sample extra field with probability 1 - sample.
+    Warnings and errors are never dropped.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        sample = getattr(record, "sample", None)
+        if sample is None or record.levelno >= logging.WARNING:
+            return True
+        return random.random() < sample
+
+
+def setup_logging(stream: Any = None) -> QueueListener:
+    """
+    Routes app logs through a queue. Records are sampled and formatted in
+    the calling task, where request id is known, and written to the stream
+    by the listener thread, so logging never blocks the event loop.
+    :param stream: Output stream, stdout by default.
+    :type stream: TextIO
+    :return: Started listener, stop it on shutdown.
+    :rtype: QueueListener
+    """
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    output = logging.StreamHandler(stream or sys.stdout)
+    handler = QueueHandler(log_queue)
+    handler.setFormatter(JsonFormatter())
+    handler.addFilter(SamplingFilter())
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+    listener = QueueListener(log_queue, output)
+    listener.start()
+    return listener
@@ -1,25 +1,28 @@
+import logging
 from contextlib import asynccontextmanager
 
-from db import db_models
-from db.database import async_session, engine
+from admission import AdmissionMiddleware
+from caching import CacheBypassMiddleware
 from fastapi import FastAPI, status
 from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
-from init_db import init_db
-from routers import media, tweets, users
+from fastapi.responses import JSONResponse, Response
+from logging_setup import LOG_SAMPLE, setup_logging
+from metrics import MetricsMiddleware, count_error
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from routers import hashtags, health, media, notifications, tweets, users
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
+logger = logging.getLogger(__name__)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    async with engine.begin() as conn:
-        # await conn.run_sync(db_models.Base.metadata.drop_all)
-        await conn.run_sync(db_models.Base.metadata.create_all)
-    async with async_session() as session:
-        await init_db(session=session)
+    listener = setup_logging()
+    await health.startup()
     yield
-    await engine.dispose()
+    await health.shutdown()
+    listener.stop()
 
 
 app = FastAPI(
@@ -29,11 +32,23 @@ app = FastAPI(
     redoc_url="/api/redoc",
     openapi_url="/api/openapi.json",
 )
+app.add_middleware(CacheBypassMiddleware)
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request, exception):
-    print(exception.errors)
+    logger.info(
+        "Request validation failed.",
+        extra={
+            "errors": [
+                {key: error[key] for key in ("type", "loc", "msg")}
+                for error in exception.errors()
+            ],
+            "sample": LOG_SAMPLE,
+        },
+    )
     return JSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         content=jsonable_encoder(
@@ -49,6 +64,7 @@ async def validation_exception_handler(request, exception):
 @app.exception_handler(StarletteHTTPException)
 async def http_exception_handler(request, exception):
     if "result" in exception.__dict__:
+        count_error(exception)
         return JSONResponse(
             status_code=exception.status_code,
             content=jsonable_encoder(
@@ -71,6 +87,14 @@ async def http_exception_handler(request, exception):
     )
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 app.include_router(users.router)
 app.include_router(tweets.router)
 app.include_router(media.router)
+app.include_router(hashtags.router)
+app.include_router(notifications.router)
+app.include_router(health.router)
@@ -0,0 +1,201 @@
+import logging
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, List
+
+from logging_setup import (
+    LOG_SAMPLE,
+    REQUEST_ID_HEADER,
+    REQUEST_ID_MAX_LENGTH,
+    SLOW_REQUEST_SECONDS,
+    request_id,
+)
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import QueuePool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route.",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS = Counter(
+    "http_requests_total",
+    "Requests by route and status.",
+    ["method", "route", "status"],
+)
+IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requests being processed by method.", ["method"]
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database queries per request by route.",
+    ["method", "route"],
+    buckets=QUERY_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds",
+    "Database time per request by route.",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+ERRORS = Counter(
+    "twitter_errors_total", "Api errors by exception class.", ["exception"]
+)
+JOBS_QUEUED = Gauge(
+    "outbox_jobs", "Outbox jobs by kind and state, pending or dead.", ["kind", "state"]
+)
+JOBS_PROCESSED = Counter(
+    "outbox_jobs_processed_total",
+    "Job attempts by kind and result: done, retry or dead.",
+    ["kind", "result"],
+)
+JOB_DURATION = Histogram(
+    "outbox_job_duration_seconds",
+    "Job attempt duration by kind.",
+    ["kind"],
+    buckets=LATENCY_BUCKETS,
+)
+
+logger = logging.getLogger(__name__)
+
+POOLS: List[QueuePool] = []
+POOL_SIZE = Gauge("db_pool_size", "Configured pool size.")
+POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections in use.")
+POOL_CHECKED_IN = Gauge("db_pool_checked_in", "Idle connections in pool.")
+POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections over pool size.")
+POOL_SIZE.set_function(lambda: sum(pool.size() for pool in POOLS))
+POOL_CHECKED_OUT.set_function(lambda: sum(pool.checkedout() for pool in POOLS))
+POOL_CHECKED_IN.set_function(lambda: sum(pool.checkedin() for pool in POOLS))
+POOL_OVERFLOW.set_function(lambda: sum(max(pool.overflow(), 0) for pool in POOLS))
+
+
+class QueryStats:
+    """
+    Database queries made while handling one request.
+    """
+
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.seconds = 0.0
+
+
+query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, many):
+    context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, many):
+    stats = query_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.seconds += time.perf_counter() - context._query_start
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Counts queries and pool usage of given engine. Only queue pools
+    report their usage.
+    :param engine: Asynchronous engine.
+    :type engine: AsyncEngine
+    """
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    if isinstance(engine.sync_engine.pool, QueuePool):
+        POOLS.append(engine.sync_engine.pool)
+
+
+def count_error(exception: Any) -> None:
+    """
+    Counts api error.
+    :param exception: Raised exception.
+    :type exception: TwitterException
+    """
+    ERRORS.labels(type(exception).__name__).inc()
+
+
+def get_request_id(scope: Scope) -> str:
+    """
+    Returns request id sent by the proxy or a new one.
+    :param scope: ASGI scope.
+    :type scope: Scope
+    :return: Request id.
+    :rtype: str
+    """
+    for name, value in scope["headers"]:
+        if name == REQUEST_ID_HEADER and 0 < len(value) <= REQUEST_ID_MAX_LENGTH:
+            return value.decode("latin-1")
+    return uuid.uuid4().hex
+
+
+class MetricsMiddleware:
+    """
+    Records latency, status and database usage of every request, tags it
+    with a request id and writes the sampled access log.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status_code = 500
+        current_request = get_request_id(scope)
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (REQUEST_ID_HEADER, current_request.encode("latin-1")),
+                ]
+            await send(message)
+
+        method = scope["method"]
+        in_flight = IN_FLIGHT.labels(method)
+        stats = QueryStats()
+        token = query_stats.set(stats)
+        request_token = request_id.set(current_request)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            latency = time.perf_counter() - start
+            in_flight.dec()
+            query_stats.reset(token)
+            route = getattr(scope.get("endpoint"), "__name__", "unmatched")
+            REQUEST_LATENCY.labels(method, route).observe(latency)
+            REQUESTS.labels(method, route, status_code).inc()
+            REQUEST_DB_QUERIES.labels(method, route).observe(stats.queries)
+            REQUEST_DB_TIME.labels(method, route).observe(stats.seconds)
+            slow = latency >= SLOW_REQUEST_SECONDS or status_code >= 500
+            logger.log(
+                logging.WARNING if slow else logging.INFO,
+                "Request handled.",
+                extra={
+                    "method": method,
+                    "route": route,
+                    "path": scope["path"],
+                    "status": status_code,
+                    "latency": round(latency, 6),
+                    "db_queries": stats.queries,
+                    "db_time": round(stats.seconds, 6),
+                    "sample": LOG_SAMPLE,
+                },
+            )
+            request_id.reset(request_token)
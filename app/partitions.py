@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import os
+import time
+from typing import List
+
+from sqlalchemy import func, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.future import select
+
+from app.db.db_models import (
+    PARTITIONED_TABLES,
+    PARTITIONS_AHEAD,
+    partition_bounds,
+    partition_ddl,
+    partition_index,
+)
+from app.db.ids import id_at
+
+PARTITION_INTERVAL = int(os.getenv("PARTITION_INTERVAL", 300))
+# Feeds read the newest HOT_PARTITIONS unless history is requested.
+HOT_PARTITIONS = int(os.getenv("HOT_PARTITIONS", 4))
+# Partitions older than the newest ARCHIVE_AFTER_PARTITIONS are detached
+# into the archive schema, 0 keeps all history attached.
+ARCHIVE_AFTER_PARTITIONS = int(os.getenv("ARCHIVE_AFTER_PARTITIONS", 0))
+ARCHIVE_SCHEMA = "archive"
+# Tables referencing tweets, their rows go to the archive with the tweets.
+ARCHIVED_REFERENCES = ("hashtags", "mentions", "media", "tweet_stats")
+# Advisory lock taken by the worker maintaining partitions.
+PARTITION_LOCK = 45045
+
+logger = logging.getLogger(__name__)
+
+
+class PartitionManager:
+    """
+    Keeps tweets and likes partitions ahead of the current time and
+    archives cold ones. Also tracks the first id of the hot partitions,
+    which feed queries use to skip older partitions.
+    """
+
+    def __init__(
+        self,
+        hot: int = HOT_PARTITIONS,
+        archive_after: int = ARCHIVE_AFTER_PARTITIONS,
+    ):
+        self.hot = hot
+        self.archive_after = max(archive_after, hot) if archive_after else 0
+        self.since = 0
+
+    async def _attached(self, session: AsyncSession, table: str) -> List[int]:
+        res = await session.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE pg_inherits.inhparent = CAST(:table AS regclass)"
+            ),
+            {"table": table},
+        )
+        prefix = f"{table}_p"
+        suffixes = (
+            name.removeprefix(prefix)
+            for name in res.scalars()
+            if name.startswith(prefix)
+        )
+        return sorted(int(suffix) for suffix in suffixes if suffix.isdigit())
+
+    async def _detach(self, session: AsyncSession, table: str, index: int) -> None:
+        partition = f"{table}_p{index}"
+        await session.execute(text(f"ALTER TABLE {table} DETACH PARTITION {partition}"))
+        # Detached partitions keep foreign keys of the parent, which would
+        # pin the rows they reference.
+        res = await session.execute(
+            text(
+                "SELECT conname FROM pg_constraint "
+                "WHERE conrelid = CAST(:partition AS regclass) AND contype = 'f'"
+            ),
+            {"partition": partition},
+        )
+        for name in res.scalars().all():
+            await session.execute(
+                text(f'ALTER TABLE {partition} DROP CONSTRAINT "{name}"')
+            )
+        await session.execute(
+            text(f"ALTER TABLE {partition} SET SCHEMA {ARCHIVE_SCHEMA}")
+        )
+
+    async def archive(self, session: AsyncSession, index: int) -> None:
+        """
+        Moves tweets and likes partition with given index to the archive
+        schema, together with rows referencing its tweets.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param index: Partition index.
+        :type index: int
+        """
+        start, end = partition_bounds(index)
+        await session.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+        for table in ARCHIVED_REFERENCES:
+            await session.execute(
+                text(
+                    f"CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.{table} "
+                    f"(LIKE {table})"
+                )
+            )
+            await session.execute(
+                text(
+                    f"WITH moved AS (DELETE FROM {table} "
+                    "WHERE tweet_id >= :start AND tweet_id < :end RETURNING *) "
+                    f"INSERT INTO {ARCHIVE_SCHEMA}.{table} SELECT * FROM moved"
+                ),
+                {"start": start, "end": end},
+            )
+        await self._detach(session, "likes", index)
+        await self._detach(session, "tweets", index)
+
+    async def maintain(self, session: AsyncSession) -> None:
+        """
+        Creates missing partitions ahead of the current time, archives
+        cold ones and updates the first hot id. Only one worker at a time
+        changes partitions, the others just update the first hot id.
+        :param session: Database session.
+        :type session: AsyncSession
+        """
+        current = partition_index(id_at(time.time()))
+        self.since = partition_bounds(max(current - self.hot + 1, 0))[0]
+        res = await session.execute(
+            select(func.pg_try_advisory_xact_lock(PARTITION_LOCK))
+        )
+        if not res.scalar():
+            await session.rollback()
+            return
+        for table in PARTITIONED_TABLES:
+            for index in range(current, current + PARTITIONS_AHEAD + 1):
+                await session.execute(text(partition_ddl(table, index)))
+        if self.archive_after:
+            for index in await self._attached(session, "tweets"):
+                if index <= current - self.archive_after:
+                    await self.archive(session, index)
+                    logger.info("Partition archived.", extra={"partition": index})
+        await session.commit()
+
+    async def run(
+        self,
+        session_maker: async_sessionmaker,
+        interval: int = PARTITION_INTERVAL,
+    ) -> None:
+        """
+        Maintains partitions until cancelled.
+        :param session_maker: Asynchronous session maker.
+        :type session_maker: async_sessionmaker
+        :param interval: Seconds between rounds.
+        :type interval: int
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with session_maker() as session:
+                    await self.maintain(session)
+            except (SQLAlchemyError, OSError):
+                logger.exception("Partition maintenance failed.")
+
+
+partitions = PartitionManager()
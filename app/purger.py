@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import os
+from typing import List
+
+from sqlalchemy import delete, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.future import select
+
+from app.db.db_models import Hashtags, Likes, Media, Mentions, Outbox, Tweets
+from app.jobs import REMOVE_FILES
+
+PURGE_INTERVAL = int(os.getenv("PURGE_INTERVAL", 10))
+# Deleted tweets removed per round.
+PURGE_BATCH = int(os.getenv("PURGE_BATCH", 100))
+# Likes removed per statement, a popular tweet is purged in several.
+PURGE_CHUNK = int(os.getenv("PURGE_CHUNK", 1000))
+
+logger = logging.getLogger(__name__)
+
+
+class TweetPurger:
+    """
+    Removes deleted tweets with their likes, media, hashtags and mentions.
+    Works in short transactions, so a tweet with many likes never holds
+    locks for long, and queues removal of media files with the deletion
+    of their rows.
+    """
+
+    def __init__(self, batch: int = PURGE_BATCH, chunk: int = PURGE_CHUNK):
+        self.batch = batch
+        self.chunk = chunk
+
+    async def _delete_likes(self, session: AsyncSession, ids: List[int]) -> None:
+        while True:
+            page = (
+                select(Likes.users, Likes.tweets)
+                .filter(Likes.tweets.in_(ids))
+                .limit(self.chunk)
+            )
+            res = await session.execute(
+                delete(Likes)
+                .filter(tuple_(Likes.users, Likes.tweets).in_(page))
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+            if res.rowcount < self.chunk:  # type: ignore[attr-defined]
+                return
+
+    async def purge(self, session: AsyncSession) -> int:
+        """
+        Purges one batch of deleted tweets, oldest deletions first.
+        :param session: Database session.
+        :type session: AsyncSession
+        :return: Number of purged tweets.
+        :rtype: int
+        """
+        res = await session.execute(
+            select(Tweets.id)
+            .filter(Tweets.deleted_at.is_not(None))
+            .order_by(Tweets.deleted_at)
+            .limit(self.batch)
+        )
+        ids = list(res.scalars().all())
+        if not ids:
+            await session.rollback()
+            return 0
+        await self._delete_likes(session, ids)
+        for tweet_id in (Hashtags.tweet_id, Mentions.tweet_id):
+            await session.execute(
+                delete(tweet_id.table)
+                .filter(tweet_id.in_(ids))
+                .execution_options(synchronize_session=False)
+            )
+        res = await session.execute(
+            delete(Media)
+            .filter(Media.tweet_id.in_(ids))
+            .returning(Media.filename)
+            .execution_options(synchronize_session=False)
+        )
+        filenames = list(res.scalars().all())
+        await session.execute(
+            delete(Tweets)
+            .filter(Tweets.id.in_(ids))
+            .execution_options(synchronize_session=False)
+        )
+        if filenames:
+            # Files go once the rows are surely gone.
+            Outbox.add(session, REMOVE_FILES, {"filenames": filenames})
+        await session.commit()
+        return len(ids)
+
+    async def run(
+        self,
+        session_maker: async_sessionmaker,
+        interval: int = PURGE_INTERVAL,
+    ) -> None:
+        """
+        Purges deleted tweets until cancelled. Full batches are followed
+        by the next one at once, so a backlog drains without waiting.
+        :param session_maker: Asynchronous session maker.
+        :type session_maker: async_sessionmaker
+        :param interval: Seconds between rounds when nothing is left.
+        :type interval: int
+        """
+        while True:
+            purged = 0
+            try:
+                async with session_maker() as session:
+                    purged = await self.purge(session)
+            except (SQLAlchemyError, OSError):
+                logger.exception("Tweet purge failed.")
+            if purged:
+                logger.info("Deleted tweets purged.", extra={"tweets": purged})
+            if purged < self.batch:
+                await asyncio.sleep(interval)
+
+
+purger = TweetPurger()
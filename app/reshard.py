@@ -0,0 +1,235 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from typing import List, Sequence
+
+from sqlalchemy import Table, delete, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+sys.path.append("..")
+from app.db.database import engine  # noqa: E402
+from app.db.db_models import (  # noqa: E402
+    PARTITIONED_TABLES,
+    Hashtags,
+    Likes,
+    Media,
+    Mentions,
+    NotificationCounters,
+    Notifications,
+    Tweets,
+    TweetStats,
+    Users,
+    partition_ddl,
+    partition_index,
+)
+from app.db.shards import (  # noqa: E402
+    HOME_SHARD,
+    ShardRouter,
+    jump_hash,
+    shard_engines,
+    shards,
+)
+
+RESHARD_BATCH = int(os.getenv("RESHARD_BATCH", 500))
+# Bind parameters asyncpg sends with one statement.
+MAX_PARAMETERS = 32767
+# Rows referencing tweets, moved with them, and their tweet column.
+TWEET_REFERENCES = (
+    (Media.__table__, "tweet_id"),
+    (Hashtags.__table__, "tweet_id"),
+    (Mentions.__table__, "tweet_id"),
+    (Likes.__table__, "tweets"),
+    (TweetStats.__table__, "tweet_id"),
+)
+# Rows kept on the shard of the user they belong to.
+USER_REFERENCES = (
+    (Notifications.__table__, "user_id"),
+    (NotificationCounters.__table__, "user_id"),
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def copy_rows(
+    source: AsyncSession,
+    target: AsyncSession,
+    table: Table,
+    column: str,
+    ids: List[int],
+) -> None:
+    """
+    Copies rows of table with column in ids, rows already on target are kept.
+    Rows are streamed from source and inserted in chunks that stay within
+    MAX_PARAMETERS, so a tweet with many likes is copied too.
+    :param source: Session of the source shard.
+    :type source: AsyncSession
+    :param target: Session of the target shard.
+    :type target: AsyncSession
+    :param table: Copied table.
+    :type table: Table
+    :param column: Filtered column.
+    :type column: str
+    :param ids: Values of column.
+    :type ids: List[int]
+    """
+    # Computed columns are rebuilt by the target.
+    columns = [c for c in table.c if c.computed is None]
+    size = MAX_PARAMETERS // len(columns)
+    res = await source.stream(
+        select(*columns)
+        .filter(table.c[column].in_(ids))
+        .execution_options(yield_per=size)
+    )
+    async for rows in res.partitions():
+        await target.execute(
+            insert(table)
+            .values([row._asdict() for row in rows])
+            .on_conflict_do_nothing()
+        )
+
+
+async def mirror_users(source: AsyncSession, target: AsyncSession) -> None:
+    """
+    Copies users of the home shard missing on target, so foreign keys of
+    tweets, likes and mentions hold on every shard.
+    :param source: Session of the home shard.
+    :type source: AsyncSession
+    :param target: Session of another shard.
+    :type target: AsyncSession
+    """
+    table = Users.__table__
+    last = -1
+    while True:
+        res = await source.execute(
+            select(table.c.id)
+            .filter(table.c.id > last)
+            .order_by(table.c.id)
+            .limit(RESHARD_BATCH)
+        )
+        user_ids = list(res.scalars())
+        if not user_ids:
+            return
+        await copy_rows(source, target, table, "id", user_ids)
+        await target.commit()
+        last = user_ids[-1]
+
+
+async def move_tweets(source: AsyncSession, target: AsyncSession, user_id: int) -> int:
+    """
+    Moves tweets of user with the rows referencing them, one batch per
+    transaction. A batch is committed on target before it is deleted from
+    source, so an interrupted run is repeated without loss.
+    :param source: Session of the old shard of user.
+    :type source: AsyncSession
+    :param target: Session of the new shard of user.
+    :type target: AsyncSession
+    :param user_id: User id.
+    :type user_id: int
+    :return: Number of moved tweets.
+    :rtype: int
+    """
+    moved = 0
+    while True:
+        res = await source.execute(
+            select(Tweets.id)
+            .filter(Tweets.author_id == user_id)
+            .order_by(Tweets.id)
+            .limit(RESHARD_BATCH)
+        )
+        tweet_ids = list(res.scalars())
+        if not tweet_ids:
+            return moved
+        # Old tweets may fall before the partitions of the target.
+        for index in sorted({partition_index(tweet_id) for tweet_id in tweet_ids}):
+            for name in PARTITIONED_TABLES:
+                await target.execute(text(partition_ddl(name, index)))
+        await copy_rows(source, target, Tweets.__table__, "id", tweet_ids)
+        for table, column in TWEET_REFERENCES:
+            await copy_rows(source, target, table, column, tweet_ids)
+        await target.commit()
+        for table, column in TWEET_REFERENCES:
+            await source.execute(delete(table).filter(table.c[column].in_(tweet_ids)))
+        await source.execute(delete(Tweets).filter(Tweets.id.in_(tweet_ids)))
+        await source.commit()
+        moved += len(tweet_ids)
+
+
+async def move_user_rows(
+    source: AsyncSession, target: AsyncSession, user_id: int
+) -> None:
+    """
+    Moves notifications and their counter of user.
+    :param source: Session of the old shard of user.
+    :type source: AsyncSession
+    :param target: Session of the new shard of user.
+    :type target: AsyncSession
+    :param user_id: User id.
+    :type user_id: int
+    """
+    for table, column in USER_REFERENCES:
+        await copy_rows(source, target, table, column, [user_id])
+    await target.commit()
+    for table, column in USER_REFERENCES:
+        await source.execute(delete(table).filter(table.c[column] == user_id))
+    await source.commit()
+
+
+async def reshard(old_count: int, router: ShardRouter = shards) -> None:
+    """
+    Rebalances tweets and notifications after shards were added to
+    SHARD_URLS. Jump hash moves users only to the new shards, so only
+    their rows are copied.
+    Writes must be paused while it runs. Media not attached to a tweet
+    stays where it was uploaded.
+    :param old_count: Number of shards before the change.
+    :type old_count: int
+    :param router: Shard router with the new shards.
+    :type router: ShardRouter
+    """
+    async with router.session_makers[HOME_SHARD]() as home:
+        for shard in range(1, len(router)):
+            async with router.session_makers[shard]() as target:
+                await mirror_users(home, target)
+        res = await home.execute(select(Users.id).order_by(Users.id))
+        user_ids: Sequence[int] = res.scalars().all()
+    for user_id in user_ids:
+        old, new = jump_hash(user_id, old_count), jump_hash(user_id, len(router))
+        if old == new:
+            continue
+        async with router.session_makers[old]() as source:
+            async with router.session_makers[new]() as target:
+                moved = await move_tweets(source, target, user_id)
+                await move_user_rows(source, target, user_id)
+        logger.info(
+            "User moved.",
+            extra={"user_id": user_id, "from": old, "to": new, "tweets": moved},
+        )
+
+
+async def main() -> None:
+    """
+    Parses arguments and rebalances shards.
+    """
+    parser = argparse.ArgumentParser(description="Rebalance tweets over shards.")
+    parser.add_argument(
+        "--from-shards",
+        type=int,
+        required=True,
+        help="number of shards before the new ones were added",
+    )
+    args = parser.parse_args()
+    try:
+        await reshard(args.from_shards)
+    finally:
+        await engine.dispose()
+        for shard_engine in shard_engines:
+            await shard_engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,109 @@
+from typing import Annotated, Any, Dict, List
+
+from fastapi import APIRouter, Depends, Header, Path, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import schemas
+from app.db import db_models
+from app.db.database import get_session
+from app.db.shards import ShardRouter, get_shards
+from app.impressions import impressions
+from app.partitions import partitions
+from app.trending import trending
+from app.twitter_funcs import check_api_key, normalize_feed
+
+router = APIRouter(
+    prefix="/api/hashtags", tags=["hashtags"], dependencies=[Depends(get_session)]
+)
+
+
+@router.get(
+    "/trending",
+    response_model=schemas.TrendingResponse,
+    status_code=status.HTTP_200_OK,
+    responses={
+        401: {"model": schemas.FailResponse},
+        422: {"model": schemas.FailResponse},
+    },
+)
+async def trending_hashtags(
+    api_key: Annotated[str, Header()],
+    limit: Annotated[int, Query(ge=1, le=50)] = 10,
+    session: AsyncSession = Depends(get_session),
+) -> Dict[str, bool | List[Dict[str, str | int]]]:
+    """
+    Endpoint to get most used hashtags of the trending window.
+    :param api_key: Api key header.
+    :type api_key: str
+    :param limit: Number of hashtags.
+    :type limit: int
+    :param session: Asynchronous session.
+    :type session: AsyncSession
+    :return: Response
+    :rtype: Dict[str, bool | List[Dict[str, str | int]]]
+    """
+    await check_api_key(api_key, db_models.Users.get_id_by_api_key, session)
+    hashtags: List[Dict[str, str | int]] = [
+        {"tag": tag, "count": count} for tag, count in trending.top(limit)
+    ]
+    return {"result": True, "hashtags": hashtags}
+
+
+@router.get(
+    "/{tag}/tweets",
+    response_model=(schemas.NormalizedTweetsPageResponse | schemas.TweetsPageResponse),
+    status_code=status.HTTP_200_OK,
+    responses={
+        401: {"model": schemas.FailResponse},
+        422: {"model": schemas.FailResponse},
+    },
+)
+async def hashtag_tweets(
+    api_key: Annotated[str, Header()],
+    tag: Annotated[str, Path(min_length=1, max_length=100)],
+    cursor: Annotated[int | None, Query()] = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    normalized: Annotated[bool, Query()] = False,
+    history: Annotated[bool, Query()] = False,
+    session: AsyncSession = Depends(get_session),
+    shards: ShardRouter = Depends(get_shards),
+) -> Dict[str, Any]:
+    """
+    Endpoint to get tweets with given hashtag, newest first.
+    :param api_key: Api key header.
+    :type api_key: str
+    :param tag: Hashtag with or without leading '#'.
+    :type tag: str
+    :param cursor: Id of the last tweet from previous page.
+    :type cursor: int | None
+    :param limit: Page size.
+    :type limit: int
+    :param normalized: Reference users by id and return them once in users.
+    :type normalized: bool
+    :param history: Read all partitions, not only the recent ones.
+    :type history: bool
+    :param session: Asynchronous session.
+    :type session: AsyncSession
+    :param shards: Shard router.
+    :type shards: ShardRouter
+    :return: Response
+    :rtype: Dict[str, Any]
+    """
+    user_id = await check_api_key(api_key, db_models.Users.get_id_by_api_key, session)
+    pages = await shards.gather(
+        session,
+        lambda shard_session: db_models.Hashtags.get_tweets_by_tag(
+            session=shard_session,
+            tag=tag.lstrip("#").lower(),
+            limit=limit,
+            cursor=cursor,
+            since=0 if history else partitions.since,
+        ),
+    )
+    tweets = shards.merge(pages, lambda tweet: tweet.id, 0, limit)
+    next_cursor = tweets[-1][1].id if len(tweets) == limit else None
+    items = await shards.feed_items(session, tweets, user_id)
+    impressions.add((tweet.id for _, tweet in tweets), user_id)
+    if normalized:
+        return {"result": True, **normalize_feed(items), "next_cursor": next_cursor}
+    return {"result": True, "tweets": items, "next_cursor": next_cursor}
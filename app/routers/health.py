@@ -0,0 +1,113 @@
+import asyncio
+import logging
+from typing import Dict, List
+
+from fastapi import APIRouter, status
+from sqlalchemy.exc import SQLAlchemyError
+
+import app.schemas as schemas
+from app.db.database import async_session, engine, ping, warm_up_pool
+from app.db.ids import ids
+from app.db.shards import shard_engines, shards
+from app.impressions import impressions
+from app.jobs import JOB_WORKERS, jobs
+from app.partitions import partitions
+from app.purger import purger
+from app.trending import trending
+from app.twitter_exception import TwitterNotReadyException
+
+READY_TIMEOUT = 1
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["health"])
+
+
+class State:
+    """
+    Worker lifecycle state.
+    """
+
+    ready = False
+    tasks: List[asyncio.Task] = []
+
+
+async def startup() -> None:
+    """
+    Warms pool and caches, then starts background tasks.
+    Does not touch the schema, tables are created by init_db.py.
+    """
+    await warm_up_pool()
+    await ids.claim(engine)
+    async with async_session() as session:
+        await trending.checkpoint(session)
+    for session_maker in shards.session_makers:
+        async with session_maker() as session:
+            await partitions.maintain(session)
+    State.tasks.append(asyncio.create_task(trending.run(async_session)))
+    State.tasks.append(asyncio.create_task(impressions.run(shards.session_makers)))
+    State.tasks.append(asyncio.create_task(jobs.watch(shards.session_makers)))
+    # Every shard purges and partitions its own tweets and runs its outbox.
+    for shard, session_maker in enumerate(shards.session_makers):
+        for _ in range(JOB_WORKERS):
+            State.tasks.append(asyncio.create_task(jobs.work(session_maker, shard)))
+        State.tasks.append(asyncio.create_task(purger.run(session_maker)))
+        State.tasks.append(asyncio.create_task(partitions.run(session_maker)))
+    State.ready = True
+
+
+async def shutdown() -> None:
+    """
+    Stops background tasks, saves buffered views and closes pool
+    connections.
+    """
+    State.ready = False
+    for task in State.tasks:
+        task.cancel()
+    # A flush interrupted by the cancel puts its views back once it exits.
+    await asyncio.gather(*State.tasks, return_exceptions=True)
+    State.tasks.clear()
+    try:
+        await impressions.flush_shards(shards.session_makers)
+    except (SQLAlchemyError, OSError):
+        logger.exception("Impressions flush failed on shutdown.")
+    await ids.release()
+    await engine.dispose()
+    for shard_engine in shard_engines:
+        await shard_engine.dispose()
+
+
+@router.get(
+    "/healthz",
+    response_model=schemas.ResultResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def healthz() -> Dict[str, bool]:
+    """
+    Liveness endpoint.
+    :return: Response
+    :rtype: Dict[str, bool]
+    """
+    return {"result": True}
+
+
+@router.get(
+    "/readyz",
+    response_model=schemas.ResultResponse,
+    status_code=status.HTTP_200_OK,
+    responses={503: {"model": schemas.FailResponse}},
+)
+async def readyz() -> Dict[str, bool]:
+    """
+    Readiness endpoint. Worker is ready when the pool is warmed and the
+    database answers.
+    :return: Response
+    :rtype: Dict[str, bool]
+    """
+    if not State.ready:
+        raise TwitterNotReadyException
+    try:
+        await asyncio.wait_for(ping(), READY_TIMEOUT)
+    except (SQLAlchemyError, OSError, asyncio.TimeoutError):
+        raise TwitterNotReadyException from None
+    return {"result": True}
@@ -8,6 +8,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 import app.db.db_models as db_models
 import app.schemas as schemas
 from app.db.database import get_session
+from app.db.ids import ids
+from app.db.shards import ShardRouter, get_shards
 from app.twitter_exception import TwitterNoFileException
 from app.twitter_funcs import check_api_key
 
@@ -30,6 +32,7 @@ async def upload_media(
     api_key: Annotated[str, Header()],
     file: UploadFile,
     session: AsyncSession = Depends(get_session),
+    shards: ShardRouter = Depends(get_shards),
 ) -> Dict[str, bool | int]:
     """
 
@@ -39,20 +42,24 @@ async def upload_media(
     :type file: UploadFile
     :param session: Asynchronous session.
     :type session: AsyncSession
+    :param shards: Shard router.
+    :type shards: ShardRouter
     :return: Response
     :rtype: Dict[str, bool | int]
     """
     if not file:
         raise TwitterNoFileException
-    await check_api_key(api_key, db_models.Users.get_user_by_api_key, session)
-    new_id = await db_models.Tweets.get_new_id(session)
+    user_id = await check_api_key(api_key, db_models.Users.get_id_by_api_key, session)
+    new_id = ids.next_id()
     name = f"{str(new_id)}__{file.filename}"
     path = os.getenv("MEDIA_PATH")
     async with aiofiles.open(
-            "".join((path, name)),  # type: ignore[arg-type, call-overload]
-            "wb") as new_file:
+        "".join((path, name)), "wb"  # type: ignore[arg-type, call-overload]
+    ) as new_file:
         await new_file.write(file.file.read())
-    new_media = db_models.Media(**{"filename": name})
-    session.add(new_media)
-    await session.commit()
+    new_media = db_models.Media(**{"id": new_id, "filename": name})
+    # Attached later to a tweet of the user, so kept on the user's shard.
+    async with shards.user_session(session, user_id) as shard_session:
+        shard_session.add(new_media)
+        await shard_session.commit()
     return {"result": True, "media_id": int(new_media.id)}
@@ -0,0 +1,131 @@
+from typing import Annotated, Any, Dict
+
+from fastapi import APIRouter, Depends, Header, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import schemas
+from app.db import db_models
+from app.db.database import get_session
+from app.db.shards import ShardRouter, get_shards
+from app.twitter_funcs import check_api_key
+
+router = APIRouter(
+    prefix="/api/notifications",
+    tags=["notifications"],
+    dependencies=[Depends(get_session)],
+)
+
+
+@router.get(
+    "",
+    response_model=schemas.NotificationsResponse,
+    status_code=status.HTTP_200_OK,
+    responses={
+        401: {"model": schemas.FailResponse},
+        422: {"model": schemas.FailResponse},
+    },
+)
+async def get_notifications(
+    api_key: Annotated[str, Header()],
+    cursor: Annotated[int | None, Query()] = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    session: AsyncSession = Depends(get_session),
+    shards: ShardRouter = Depends(get_shards),
+) -> Dict[str, Any]:
+    """
+    Endpoint to get notifications of current user, latest activity first.
+    :param api_key: Api key header.
+    :type api_key: str
+    :param cursor: Id of the last notification from previous page.
+    :type cursor: int | None
+    :param limit: Page size.
+    :type limit: int
+    :param session: Asynchronous session.
+    :type session: AsyncSession
+    :param shards: Shard router.
+    :type shards: ShardRouter
+    :return: Response
+    :rtype: Dict[str, Any]
+    """
+    user_id = await check_api_key(api_key, db_models.Users.get_id_by_api_key, session)
+    async with shards.user_session(session, user_id) as shard_session:
+        rows = await db_models.Notifications.get_page(
+            shard_session, user_id, limit=limit, cursor=cursor
+        )
+        unread = await db_models.Notifications.get_unread(shard_session, user_id)
+    notifications = [notification.to_dict(name) for notification, name in rows]
+    next_cursor = rows[-1][0].id if len(rows) == limit else None
+    return {
+        "result": True,
+        "notifications": notifications,
+        "unread": unread,
+        "next_cursor": next_cursor,
+    }
+
+
+@router.get(
+    "/unread",
+    response_model=schemas.UnreadResponse,
+    status_code=status.HTTP_200_OK,
+    responses={
+        401: {"model": schemas.FailResponse},
+        422: {"model": schemas.FailResponse},
+    },
+)
+async def get_unread(
+    api_key: Annotated[str, Header()],
+    session: AsyncSession = Depends(get_session),
+    shards: ShardRouter = Depends(get_shards),
+) -> Dict[str, bool | int]:
+    """
+    Endpoint to get number of unread notifications of current user.
+    :param api_key: Api key header.
+    :type api_key: str
+    :param session: Asynchronous session.
+    :type session: AsyncSession
+    :param shards: Shard router.
+    :type shards: ShardRouter
+    :return: Response
+    :rtype: Dict[str, bool | int]
+    """
+    user_id = await check_api_key(api_key, db_models.Users.get_id_by_api_key, session)
+    async with shards.user_session(session, user_id) as shard_session:
+        unread = await db_models.Notifications.get_unread(shard_session, user_id)
+    return {"result": True, "unread": unread}
+
+
+@router.post(
+    "/read",
+    response_model=schemas.UnreadResponse,
+    status_code=status.HTTP_200_OK,
+    responses={
+        401: {"model": schemas.FailResponse},
+        422: {"model": schemas.FailResponse},
+    },
+)
+async def read_notifications(
+    api_key: Annotated[str, Header()],
+    until: Annotated[int | None, Query()] = None,
+    session: AsyncSession = Depends(get_session),
+    shards: ShardRouter = Depends(get_shards),
+) -> Dict[str, bool | int]:
+    """
+    Endpoint to mark notifications of current user as read.
+    :param api_key: Api key header.
+    :type api_key: str
+    :param until: Id of the newest notification seen, all by default.
+    :type until: int | None
+    :param session: Asynchronous session.
+    :type session: AsyncSession
+    :param shards: Shard router.
+    :type shards: ShardRouter
+    :return: Response
+    :rtype: Dict[str, bool | int]
+    """
+    user_id = await check_api_key(api_key, db_models.Users.get_id_by_api_key, session)
+    async with shards.user_session(session, user_id) as shard_session:
+        unread = await db_models.Notifications.mark_read(
+            shard_session, user_id, until=until
+        )
+        await shard_session.commit()
+    return {"result": True, "unread": unread}
@@ -1,25 +1,52 @@
 import os
-from typing import Annotated, Dict, List, Optional, Sequence
+from typing import (
+    Annotated,
+    Any,
+    AsyncIterable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
-from fastapi import APIRouter, Body, Depends, Header, Path, status
+from fastapi import APIRouter, Body, Depends, Header, Path, Query, Request, status
+from pydantic import ValidationError
 from sqlalchemy import desc
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
 
 import app.db.db_models as db_models
 import app.schemas as schemas
 from app.db.database import get_session
+from app.db.shards import ShardRouter, get_shards
+from app.impressions import impressions
+from app.jobs import COUNT_TWEET, INDEX_TWEET, NOTIFY
+from app.partitions import partitions
+from app.threads import load_ancestors, load_replies
+from app.trending import trending
 from app.twitter_exception import (
     TwitterAlreadyLikedException,
+    TwitterAlreadyRetweetedException,
     TwitterDidNotLikeException,
+    TwitterDidNotRetweetException,
     TwitterNoMediaException,
     TwitterNoTweetException,
     TwitterOwnerException,
 )
-from app.twitter_funcs import check_api_key
+from app.twitter_funcs import (
+    check_api_key,
+    extract_hashtags,
+    extract_mentions,
+    normalize_feed,
+    parse_fields,
+    read_lines,
+)
 
-PATH = "./media/"
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))
+IMPORT_MAX_LINE = 64 * 1024
+IMPORT_MAX_ERRORS = 1000
 
 router = APIRouter(
     prefix="/api/tweets", tags=["tweets"], dependencies=[Depends(get_session)]
@@ -40,10 +67,12 @@ async def add_tweet(
     api_key: Annotated[str, Header()],
     tweet_data: Annotated[str, Body()],
     tweet_media_ids: Annotated[Optional[List[int]], Body()] = None,
+    parent_id: Annotated[Optional[int], Body()] = None,
     session: AsyncSession = Depends(get_session),
+    shards: ShardRouter = Depends(get_shards),
 ) -> Dict[str, bool | int]:
     """
-    Endpoint to add new tweet.
+    Endpoint to add new tweet, or a reply to tweet with parent_id.
     :param api_key: Api key header.
     :type api_key: str
     :param session: Asynchronous session.
@@ -52,29 +81,208 @@ async def add_tweet(
     :type tweet_data: str
     :param tweet_media_ids: Id of uploaded media.
     :type tweet_media_ids: Optional[List[int]]
+    :param parent_id: Id of replied tweet.
+    :type parent_id: Optional[int]
+    :param shards: Shard router.
+    :type shards: ShardRouter
     :return: Response
     :rtype: Dict[str, bool | int]
     """
     user = await check_api_key(api_key, db_models.Users.get_user_by_api_key, session)
+    parent = None
+    if parent_id is not None:
+        parent = await shards.locate_tweet(session, parent_id)
+        if parent is None:
+            raise TwitterNoTweetException
     new_tweet = db_models.Tweets(
         **{
             "content": tweet_data,
             "author_id": int(user.id),  # type: ignore[attr-defined]
+            "parent_id": parent_id,
         }
     )
-    if tweet_media_ids:
-        attachments = []
-        for media_id in tweet_media_ids:
-            media = await db_models.Media.get_media_by_id(session=session, id=media_id)
-            if not media:
-                raise TwitterNoMediaException
-            attachments.append(media)
-        new_tweet.media = attachments
-    session.add(new_tweet)
-    await session.commit()
+    tags = extract_hashtags(tweet_data)
+    async with shards.user_session(session, user.id) as shard_session:
+        if tweet_media_ids:
+            attachments = []
+            for media_id in tweet_media_ids:
+                media = await db_models.Media.get_media_by_id(
+                    session=shard_session, id=media_id
+                )
+                if not media:
+                    raise TwitterNoMediaException
+                attachments.append(media)
+            new_tweet.media = attachments
+        shard_session.add(new_tweet)
+        await shard_session.flush()
+        # Hashtags and mentions are linked by the job runner after commit.
+        db_models.Outbox.add(
+            shard_session,
+            INDEX_TWEET,
+            {"tweet_id": int(new_tweet.id), "content": tweet_data},
+        )
+        if parent is not None:
+            db_models.Outbox.add(
+                shard_session,
+                COUNT_TWEET,
+                {"tweet_id": parent_id, "counter": "reply_count", "delta": 1},
+            )
+            if parent[1] != new_tweet.author_id:
+                db_models.Outbox.add(
+                    shard_session,
+                    NOTIFY,
+                    {
+                        "user_id": parent[1],
+                        "kind": "reply",
+                        "actor_id": new_tweet.author_id,
+                        "tweet_id": int(new_tweet.id),
+                    },
+                )
+        await shard_session.commit()
+    trending.add(tags)
     return {"result": True, "tweet_id": int(new_tweet.id)}
 
 
+async def import_batch(
+    session: AsyncSession,
+    author_id: int,
+    batch: List[Tuple[int, schemas.ImportTweet]],
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Writes batch of imported tweets in one transaction.
+    Lines referencing unknown media or media attached to another tweet,
+    also by an earlier line, are skipped.
+    :return: Number of imported tweets and errors of skipped lines.
+    :rtype: Tuple[int, List[Dict[str, Any]]]
+    """
+    errors: List[Dict[str, Any]] = []
+    media_ids = {media_id for _, tweet in batch for media_id in tweet.tweet_media_ids}
+    attached = await db_models.Media.get_tweet_ids(session, media_ids)
+    claimed: Set[int] = set()
+    valid = []
+    for number, tweet in batch:
+        line_ids = set(tweet.tweet_media_ids)
+        if not line_ids <= attached.keys():
+            errors.append({"line": number, "error": "Media not found."})
+        elif line_ids & claimed or any(attached[id] for id in line_ids):
+            errors.append({"line": number, "error": "Media already attached."})
+        else:
+            claimed |= line_ids
+            valid.append(tweet)
+    if not valid:
+        return 0, errors
+    ids = await db_models.Tweets.add_many(
+        session, author_id, [tweet.tweet_data for tweet in valid]
+    )
+    tweets = list(zip(ids, valid))
+    await db_models.Hashtags.add_many(
+        session,
+        [
+            (tag, id)
+            for id, tweet in tweets
+            for tag in extract_hashtags(tweet.tweet_data)
+        ],
+    )
+    await db_models.Mentions.add_many(
+        session,
+        [
+            (handle, id)
+            for id, tweet in tweets
+            for handle in extract_mentions(tweet.tweet_data)
+        ],
+    )
+    await db_models.Media.attach_many(
+        session,
+        [(media_id, id) for id, tweet in tweets for media_id in tweet.tweet_media_ids],
+    )
+    await session.commit()
+    return len(ids), errors
+
+
+@router.post(
+    "/import",
+    response_model=schemas.ImportTweetsResponse,
+    status_code=status.HTTP_200_OK,
+    responses={
+        401: {"model": schemas.FailResponse},
+        422: {"model": schemas.FailResponse},
+    },
+)
+async def import_tweets(
+    request: Request,
+    api_key: Annotated[str, Header()],
+    session: AsyncSession = Depends(get_session),
+    shards: ShardRouter = Depends(get_shards),
+) -> Dict[str, Any]:
+    """
+    Endpoint to import tweets of current user from NDJSON body, one
+    {"tweet_data": ..., "tweet_media_ids": [...]} object per line.
+    Lines are validated as they arrive and written in batches, each batch
+    in its own transaction. Lines longer than IMPORT_MAX_LINE are reported
+    as failed. Imported tweets do not count as trending.
+    :param request: Request with streamed body.
+    :type request: Request
+    :param api_key: Api key header.
+    :type api_key: str
+    :param session: Asynchronous session.
+    :type session: AsyncSession
+    :param shards: Shard router.
+    :type shards: ShardRouter
+    :return: Response
+    :rtype: Dict[str, Any]
+    """
+    user_id = await check_api_key(api_key, db_models.Users.get_id_by_api_key, session)
+    async with shards.user_session(session, user_id) as shard_session:
+        return await import_lines(shard_session, user_id, request.stream())
+
+
+async def import_lines(
+    session: AsyncSession, user_id: int, chunks: AsyncIterable[bytes]
+) -> Dict[str, Any]:
+    """
+    Imports NDJSON tweets of user in batches, see import_tweets.
+    :param session: Session of the shard of user.
+    :type session: AsyncSession
+    :param user_id: Author id.
+    :type user_id: int
+    :param chunks: Request body.
+    :type chunks: AsyncIterable[bytes]
+    :return: Response
+    :rtype: Dict[str, Any]
+    """
+    imported = failed = 0
+    errors: List[Dict[str, Any]] = []
+
+    def report(line_errors: List[Dict[str, Any]]) -> None:
+        nonlocal failed
+        failed += len(line_errors)
+        errors.extend(line_errors[: IMPORT_MAX_ERRORS - len(errors)])
+
+    async def flush(batch: List[Tuple[int, schemas.ImportTweet]]) -> None:
+        nonlocal imported
+        count, batch_errors = await import_batch(session, user_id, batch)
+        imported += count
+        report(batch_errors)
+
+    batch: List[Tuple[int, schemas.ImportTweet]] = []
+    async for number, line in read_lines(chunks, IMPORT_MAX_LINE):
+        if line is None:
+            report([{"line": number, "error": "Line too long."}])
+            continue
+        if not line.strip():
+            continue
+        try:
+            batch.append((number, schemas.ImportTweet.model_validate_json(line)))
+        except ValidationError as error:
+            report([{"line": number, "error": error.errors()[0]["msg"]}])
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+    return {"result": True, "imported": imported, "failed": failed, "errors": errors}
+
+
 @router.delete(
     "/{id}",
     response_model=schemas.ResultResponse,
@@ -90,28 +298,44 @@ async def delete_tweet(
     api_key: Annotated[str, Header()],
     id: Annotated[int, Path()],
     session: AsyncSession = Depends(get_session),
+    shards: ShardRouter = Depends(get_shards),
 ) -> Dict[str, bool]:
     """
     Endpoint to delete tweet with given id.
+    The tweet is hidden at once, its likes and media are purged in the
+    background. Counters of replied and retweeted tweets are updated by
+    the job runner.
     :param api_key: Api key header.
     :type api_key: str
     :param id: Tweet id
     :type id: int
     :param session: Asynchronous session.
     :type session: AsyncSession
+    :param shards: Shard router.
+    :type shards: ShardRouter
     :return: Response
     :rtype: Dict[str, bool]
     """
-    user = await check_api_key(api_key, db_models.Users.get_user_by_api_key, session)
-    tweet = await db_models.Tweets.get_tweet_by_id(session=session, id=id)
-    if not tweet:
+    user_id = await check_api_key(api_key, db_models.Users.get_id_by_api_key, session)
+    found = await shards.locate_tweet(session, id)
+    if found is None:
         raise TwitterNoTweetException
-    if tweet.author_id != user.id:  # type: ignore[attr-defined]
+    shard, author_id = found
+    if author_id != user_id:
         raise TwitterOwnerException
-    for media in tweet.attachments:
-        os.remove("".join((PATH, media)))
-    await session.delete(tweet)
-    await session.commit()
+    async with shards.session(session, shard) as shard_session:
+        parent_id, retweet_of_id = await db_models.Tweets.soft_delete(shard_session, id)
+        for counter, tweet_id in (
+            ("reply_count", parent_id),
+            ("retweet_count", retweet_of_id),
+        ):
+            if tweet_id is not None:
+                db_models.Outbox.add(
+                    shard_session,
+                    COUNT_TWEET,
+                    {"tweet_id": tweet_id, "counter": counter, "delta": -1},
+                )
+        await shard_session.commit()
     return {"result": True}
 
 
@@ -130,6 +354,7 @@ async def like_the_tweet(
     api_key: Annotated[str, Header()],
     id: Annotated[int, Path()],
     session: AsyncSession = Depends(get_session),
+    shards: ShardRouter = Depends(get_shards),
 ) -> Dict[str, bool]:
     """
     Endpoint to like tweet with given id.
@@ -139,17 +364,33 @@ async def like_the_tweet(
     :type id: int
     :param session: Asynchronous session.
     :type session: AsyncSession
+    :param shards: Shard router.
+    :type shards: ShardRouter
     :return: Response
     :rtype: Dict[str, bool]
     """
-    user = await check_api_key(api_key, db_models.Users.get_user_by_api_key, session)
-    tweet = await db_models.Tweets.get_tweet_by_id(session=session, id=id)
-    if not tweet:
+    user_id = await check_api_key(api_key, db_models.Users.get_id_by_api_key, session)
+    found = await shards.locate_tweet(session, id)
+    if found is None:
         raise TwitterNoTweetException
-    if user in tweet.likes:
-        raise TwitterAlreadyLikedException
-    tweet.likes.append(user)
-    await session.commit()
+    shard, author_id = found
+    async with shards.session(session, shard) as shard_session:
+        if not await db_models.Likes.add_like(
+            session=shard_session, user_id=user_id, tweet_id=id
+        ):
+            raise TwitterAlreadyLikedException
+        if author_id != user_id:
+            db_models.Outbox.add(
+                shard_session,
+                NOTIFY,
+                {
+                    "user_id": author_id,
+                    "kind": "like",
+                    "actor_id": user_id,
+                    "tweet_id": id,
+                },
+            )
+        await shard_session.commit()
     return {"result": True}
 
 
@@ -168,6 +409,7 @@ async def unlike_the_tweet(
     api_key: Annotated[str, Header()],
     id: Annotated[int, Path()],
     session: AsyncSession = Depends(get_session),
+    shards: ShardRouter = Depends(get_shards),
 ) -> Dict[str, bool]:
     """
     Endpoint to unlike tweet with given id.
@@ -177,45 +419,410 @@ async def unlike_the_tweet(
     :type id: int
     :param session: Asynchronous session.
     :type session: AsyncSession
+    :param shards: Shard router.
+    :type shards: ShardRouter
     :return: Response
     :rtype: Dict[str, bool]
     """
-    user = await check_api_key(api_key, db_models.Users.get_user_by_api_key, session)
-    tweet = await db_models.Tweets.get_tweet_by_id(session=session, id=id)
-    if not tweet:
+    user_id = await check_api_key(api_key, db_models.Users.get_id_by_api_key, session)
+    found = await shards.locate_tweet(session, id)
+    if found is None:
         raise TwitterNoTweetException
-    if user not in tweet.likes:
-        raise TwitterDidNotLikeException
-    tweet.likes.remove(user)
-    await session.commit()
+    async with shards.session(session, found[0]) as shard_session:
+        if not await db_models.Likes.remove_like(
+            session=shard_session, user_id=user_id, tweet_id=id
+        ):
+            raise TwitterDidNotLikeException
+        await shard_session.commit()
+    return {"result": True}
+
+
+async def locate_original(
+    session: AsyncSession, shards: ShardRouter, id: int
+) -> Tuple[int, Tuple[int, int] | None]:
+    """
+    Resolves retweet with given id to the tweet it retweets.
+    :param session: Asynchronous session.
+    :type session: AsyncSession
+    :param shards: Shard router.
+    :type shards: ShardRouter
+    :param id: Tweet id.
+    :type id: int
+    :return: Original tweet id, id itself unless it is a live retweet, and
+        shard and author id of the original, None if it is deleted.
+    :rtype: Tuple[int, Tuple[int, int] | None]
+    """
+    found = await shards.locate_tweet(session, id)
+    if found is None:
+        return id, None
+    async with shards.session(session, found[0]) as shard_session:
+        original_id = await db_models.Tweets.get_original_id(shard_session, id)
+    if original_id is None:
+        return id, None
+    if original_id != id:
+        found = await shards.locate_tweet(session, original_id)
+    return original_id, found
+
+
+@router.post(
+    "/{id}/retweets",
+    response_model=schemas.AddTweetResponse,
+    status_code=status.HTTP_201_CREATED,
+    responses={
+        401: {"model": schemas.FailResponse},
+        404: {"model": schemas.FailResponse},
+        405: {"model": schemas.FailResponse},
+        422: {"model": schemas.FailResponse},
+    },
+)
+async def retweet(
+    api_key: Annotated[str, Header()],
+    id: Annotated[int, Path()],
+    session: AsyncSession = Depends(get_session),
+    shards: ShardRouter = Depends(get_shards),
+) -> Dict[str, bool | int]:
+    """
+    Endpoint to retweet tweet with given id. Retweeting a retweet
+    retweets its original.
+    :param api_key: Api key header.
+    :type api_key: str
+    :param id: Tweet id
+    :type id: int
+    :param session: Asynchronous session.
+    :type session: AsyncSession
+    :param shards: Shard router.
+    :type shards: ShardRouter
+    :return: Response
+    :rtype: Dict[str, bool | int]
+    """
+    user_id = await check_api_key(api_key, db_models.Users.get_id_by_api_key, session)
+    original_id, found = await locate_original(session, shards, id)
+    if found is None:
+        raise TwitterNoTweetException
+    author_id = found[1]
+    async with shards.user_session(session, user_id) as shard_session:
+        retweet_id = await db_models.Tweets.add_retweet(
+            shard_session, user_id, original_id
+        )
+        if retweet_id is None:
+            raise TwitterAlreadyRetweetedException
+        db_models.Outbox.add(
+            shard_session,
+            COUNT_TWEET,
+            {"tweet_id": original_id, "counter": "retweet_count", "delta": 1},
+        )
+        if author_id != user_id:
+            db_models.Outbox.add(
+                shard_session,
+                NOTIFY,
+                {
+                    "user_id": author_id,
+                    "kind": "retweet",
+                    "actor_id": user_id,
+                    "tweet_id": original_id,
+                },
+            )
+        await shard_session.commit()
+    return {"result": True, "tweet_id": retweet_id}
+
+
+@router.delete(
+    "/{id}/retweets",
+    response_model=schemas.ResultResponse,
+    status_code=status.HTTP_200_OK,
+    responses={
+        401: {"model": schemas.FailResponse},
+        405: {"model": schemas.FailResponse},
+        422: {"model": schemas.FailResponse},
+    },
+)
+async def undo_retweet(
+    api_key: Annotated[str, Header()],
+    id: Annotated[int, Path()],
+    session: AsyncSession = Depends(get_session),
+    shards: ShardRouter = Depends(get_shards),
+) -> Dict[str, bool]:
+    """
+    Endpoint to undo retweet of tweet with given id. Given a retweet,
+    undoes the retweet of its original.
+    :param api_key: Api key header.
+    :type api_key: str
+    :param id: Retweeted tweet id
+    :type id: int
+    :param session: Asynchronous session.
+    :type session: AsyncSession
+    :param shards: Shard router.
+    :type shards: ShardRouter
+    :return: Response
+    :rtype: Dict[str, bool]
+    """
+    user_id = await check_api_key(api_key, db_models.Users.get_id_by_api_key, session)
+    # A deleted original can still be unretweeted by its own id.
+    original_id, _ = await locate_original(session, shards, id)
+    async with shards.user_session(session, user_id) as shard_session:
+        if not await db_models.Tweets.remove_retweet(
+            shard_session, user_id, original_id
+        ):
+            raise TwitterDidNotRetweetException
+        db_models.Outbox.add(
+            shard_session,
+            COUNT_TWEET,
+            {"tweet_id": original_id, "counter": "retweet_count", "delta": -1},
+        )
+        await shard_session.commit()
     return {"result": True}
 
 
+@router.get(
+    "/{id}/thread",
+    response_model=schemas.ThreadResponse,
+    status_code=status.HTTP_200_OK,
+    responses={
+        401: {"model": schemas.FailResponse},
+        404: {"model": schemas.FailResponse},
+        422: {"model": schemas.FailResponse},
+    },
+)
+async def get_thread(
+    api_key: Annotated[str, Header()],
+    id: Annotated[int, Path()],
+    cursor: Annotated[Optional[int], Query()] = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    depth: Annotated[
+        int, Query(ge=1, le=db_models.THREAD_DEPTH)
+    ] = db_models.THREAD_DEPTH,
+    width: Annotated[
+        int, Query(ge=1, le=db_models.THREAD_WIDTH)
+    ] = db_models.THREAD_WIDTH,
+    session: AsyncSession = Depends(get_session),
+    shards: ShardRouter = Depends(get_shards),
+) -> Dict[str, Any]:
+    """
+    Endpoint to get conversation around tweet with given id: the tweets
+    it replies to and a page of its replies, each with replies of its own
+    down to depth levels. Both directions are read with one recursive
+    query per shard.
+    :param api_key: Api key header.
+    :type api_key: str
+    :param id: Tweet id
+    :type id: int
+    :param cursor: Id of the last direct reply from previous page.
+    :type cursor: int | None
+    :param limit: Page size of direct replies.
+    :type limit: int
+    :param depth: Reply levels below the tweet.
+    :type depth: int
+    :param width: Replies shown below every reply.
+    :type width: int
+    :param session: Asynchronous session.
+    :type session: AsyncSession
+    :param shards: Shard router.
+    :type shards: ShardRouter
+    :return: Response
+    :rtype: Dict[str, Any]
+    """
+    user_id = await check_api_key(api_key, db_models.Users.get_id_by_api_key, session)
+    chain = await load_ancestors(session, shards, id)
+    if not chain or chain[0][1].id != id or chain[0][1].deleted_at is not None:
+        raise TwitterNoTweetException
+    # Deleted tweets still link the chain but are not shown.
+    ancestors = [row for row in reversed(chain[1:]) if row[1].deleted_at is None]
+    replies = await load_replies(
+        session, shards, id, depth=depth, width=width, cursor=cursor, limit=limit
+    )
+    tweets = [chain[0], *ancestors, *((shard, tweet) for shard, tweet, _ in replies)]
+    items = await shards.feed_items(session, tweets, user_id)
+    impressions.add((tweet.id for _, tweet in tweets), user_id)
+    shown = len(ancestors) + 1
+    reply_items = items[shown:]
+    for item, (_, _, level) in zip(reply_items, replies):
+        item["level"] = level
+    top = [tweet.id for _, tweet, level in replies if level == 1]
+    return {
+        "result": True,
+        "tweet": items[0],
+        "ancestors": items[1:shown],
+        "replies": reply_items,
+        "next_cursor": top[-1] if len(top) == limit else None,
+    }
+
+
 @router.get(
     "",
-    response_model=schemas.TweetsResponse,
+    response_model=schemas.NormalizedTweetsResponse | schemas.TweetsResponse,
+    response_model_exclude_unset=True,
     status_code=status.HTTP_200_OK,
-    responses={401: {"model": schemas.FailResponse}},
+    responses={
+        401: {"model": schemas.FailResponse},
+        422: {"model": schemas.FailResponse},
+    },
 )
 async def get_tweets(
-    api_key: Annotated[str, Header()], session: AsyncSession = Depends(get_session)
-) -> Dict[str, bool | Sequence[db_models.Tweets]]:
+    api_key: Annotated[str, Header()],
+    offset: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int, Query(ge=1, le=100)] = 100,
+    normalized: Annotated[bool, Query()] = False,
+    fields: Annotated[Optional[str], Query()] = None,
+    history: Annotated[bool, Query()] = False,
+    session: AsyncSession = Depends(get_session),
+    shards: ShardRouter = Depends(get_shards),
+) -> Dict[str, Any]:
+    """
+    Endpoint to get feed of tweets.
+    :param api_key: Api key header.
+    :type api_key: str
+    :param offset: Number of tweets to skip.
+    :type offset: int
+    :param limit: Page size.
+    :type limit: int
+    :param normalized: Reference users by id and return them once in users.
+    :type normalized: bool
+    :param fields: Comma separated fields to return, all by default.
+    :type fields: str | None
+    :param history: Read all partitions, not only the recent ones.
+    :type history: bool
+    :param session: Asynchronous session.
+    :type session: AsyncSession
+    :param shards: Shard router.
+    :type shards: ShardRouter
+    :return: Response
+    :rtype: Dict[str, Any]
     """
-    Endpoint to get all tweets.
+    requested = parse_fields(fields, db_models.TWEET_FIELDS)
+    user_id = await check_api_key(api_key, db_models.Users.get_id_by_api_key, session)
+    # With several shards each one returns its first offset + limit tweets
+    # and the offset is applied to the merged feed.
+    skip = offset if len(shards) == 1 else 0
+
+    async def read(shard_session: AsyncSession) -> Sequence[Any]:
+        res = await shard_session.execute(
+            select(db_models.Tweets)
+            .filter(
+                db_models.Tweets.id >= (0 if history else partitions.since),
+                db_models.Tweets.live(),
+            )
+            .options(*db_models.Tweets.load_options(requested))
+            .order_by(desc(db_models.Tweets.id))
+            .offset(skip)
+            .limit(offset - skip + limit)
+        )
+        return res.scalars().all()
+
+    tweets = shards.merge(
+        await shards.gather(session, read), lambda tweet: tweet.id, offset - skip, limit
+    )
+    items = await shards.feed_items(session, tweets, user_id, fields=requested)
+    impressions.add((tweet.id for _, tweet in tweets), user_id)
+    if normalized:
+        return {"result": True, **normalize_feed(items)}
+    return {"result": True, "tweets": items}
+
+
+@router.get(
+    "/search",
+    response_model=schemas.SearchTweetsResponse,
+    status_code=status.HTTP_200_OK,
+    responses={
+        401: {"model": schemas.FailResponse},
+        422: {"model": schemas.FailResponse},
+    },
+)
+async def search_tweets(
+    api_key: Annotated[str, Header()],
+    q: Annotated[str, Query(min_length=1, max_length=256)],
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    history: Annotated[bool, Query()] = False,
+    session: AsyncSession = Depends(get_session),
+    shards: ShardRouter = Depends(get_shards),
+) -> Dict[str, bool | List[Dict[str, Any]]]:
+    """
+    Endpoint to search tweets by content.
     :param api_key: Api key header.
     :type api_key: str
+    :param q: Search text.
+    :type q: str
+    :param limit: Page size.
+    :type limit: int
+    :param offset: Number of results to skip.
+    :type offset: int
+    :param history: Read all partitions, not only the recent ones.
+    :type history: bool
     :param session: Asynchronous session.
     :type session: AsyncSession
+    :param shards: Shard router.
+    :type shards: ShardRouter
     :return: Response
-    :rtype: Dict[str, bool | Result]
-    """
-    await check_api_key(api_key, db_models.Users.get_user_by_api_key, session)
-    res = await session.execute(
-        select(db_models.Tweets).options(
-            selectinload(db_models.Tweets.media),
-            selectinload(db_models.Tweets.author),
-            selectinload(db_models.Tweets.likes),
-        ).order_by(desc(db_models.Tweets.id))
+    :rtype: Dict[str, bool | List[Dict[str, Any]]]
+    """
+    user_id = await check_api_key(api_key, db_models.Users.get_id_by_api_key, session)
+    # Ranks do not depend on other documents, so pages of shards merge
+    # like the feed.
+    skip = offset if len(shards) == 1 else 0
+    pages = await shards.gather(
+        session,
+        lambda shard_session: db_models.Tweets.search(
+            session=shard_session,
+            text=q,
+            limit=offset - skip + limit,
+            offset=skip,
+            since=0 if history else partitions.since,
+        ),
+    )
+    rows = shards.merge(pages, lambda row: (row[1], row[0].id), offset - skip, limit)
+    items = await shards.feed_items(
+        session, [(shard, tweet) for shard, (tweet, _, _) in rows], user_id
     )
-    tweets = res.scalars().all()
-    return {"result": True, "tweets": tweets}
+    impressions.add((tweet.id for _, (tweet, _, _) in rows), user_id)
+    for item, (_, (_, rank, headline)) in zip(items, rows):
+        item["rank"] = rank
+        item["headline"] = headline
+    return {"result": True, "tweets": items}
+
+
+@router.get(
+    "/{id}/likes",
+    response_model=schemas.LikersResponse,
+    status_code=status.HTTP_200_OK,
+    responses={
+        401: {"model": schemas.FailResponse},
+        404: {"model": schemas.FailResponse},
+        422: {"model": schemas.FailResponse},
+    },
+)
+async def get_likers(
+    api_key: Annotated[str, Header()],
+    id: Annotated[int, Path()],
+    cursor: Annotated[Optional[int], Query()] = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    session: AsyncSession = Depends(get_session),
+    shards: ShardRouter = Depends(get_shards),
+) -> Dict[str, bool | int | None | List[Dict[str, Any]]]:
+    """
+    Endpoint to get users who liked tweet with given id, ordered by user id.
+    :param api_key: Api key header.
+    :type api_key: str
+    :param id: Tweet id
+    :type id: int
+    :param cursor: Id of the last user from previous page.
+    :type cursor: int | None
+    :param limit: Page size.
+    :type limit: int
+    :param session: Asynchronous session.
+    :type session: AsyncSession
+    :param shards: Shard router.
+    :type shards: ShardRouter
+    :return: Response
+    :rtype: Dict[str, bool | int | None | List[Dict[str, Any]]]
+    """
+    await check_api_key(api_key, db_models.Users.get_id_by_api_key, session)
+    found = await shards.locate_tweet(session, id)
+    if found is None:
+        raise TwitterNoTweetException
+    async with shards.session(session, found[0]) as shard_session:
+        rows = await db_models.Likes.get_likers(
+            session=shard_session, tweet_id=id, limit=limit, cursor=cursor
+        )
+    users = [{"id": user_id, "name": name} for user_id, name in rows]
+    next_cursor = rows[-1][0] if len(rows) == limit else None
+    return {"result": True, "users": users, "next_cursor": next_cursor}
@@ -1,17 +1,24 @@
-from typing import Annotated, Any, Dict
+import json
+from functools import partial
+from typing import Annotated, Any, AsyncIterator, Dict, Optional
 
-from fastapi import APIRouter, Depends, Header, Path, status
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Depends, Header, Path, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from app import schemas
 from app.db import db_models
-from app.db.database import get_session
+from app.db.database import get_session, get_session_maker
+from app.db.shards import HOME_SHARD, ShardRouter, get_shards
+from app.impressions import impressions
+from app.jobs import NOTIFY
+from app.partitions import partitions
 from app.twitter_exception import (
     TwitterAlreadyFollowingException,
     TwitterDoNotFollowingException,
     TwitterNoUserException,
 )
-from app.twitter_funcs import check_api_key
+from app.twitter_funcs import check_api_key, normalize_feed, parse_fields
 
 router = APIRouter(
     prefix="/api/users", tags=["users"], dependencies=[Depends(get_session)]
@@ -21,28 +28,101 @@ router = APIRouter(
 @router.get(
     "/me",
     response_model=schemas.UserResponse,
+    response_model_exclude_unset=True,
     status_code=status.HTTP_200_OK,
-    responses={401: {"model": schemas.FailResponse}},
+    responses={
+        401: {"model": schemas.FailResponse},
+        422: {"model": schemas.FailResponse},
+    },
 )
 async def me(
-    api_key: Annotated[str, Header()], session: AsyncSession = Depends(get_session)
-) -> Dict[str, bool | str | tuple[str, Any]]:
+    api_key: Annotated[str, Header()],
+    fields: Annotated[Optional[str], Query()] = None,
+    session: AsyncSession = Depends(get_session),
+) -> Dict[str, bool | Dict[str, Any]]:
     """
     Endpoint to get current user.
     :param api_key: Api key header.
     :type api_key: str
+    :param fields: Comma separated fields to return, all by default.
+    :type fields: str | None
     :param session: Asynchronous session.
     :type session: AsyncSession
     :return: Response
-    :rtype: Dict[str, bool | str | db_models.Users]
+    :rtype: Dict[str, bool | Dict[str, Any]]
     """
-    user = await check_api_key(api_key, db_models.Users.get_user_by_api_key, session)
-    return {"result": True, "user": user}
+    requested = parse_fields(fields, db_models.USER_FIELDS)
+    user = await check_api_key(
+        api_key,
+        partial(db_models.Users.get_user_by_api_key, fields=requested),
+        session,
+    )
+    return {"result": True, "user": user.to_dict(requested)}
+
+
+@router.get(
+    "/me/export",
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+    responses={
+        200: {"content": {"application/x-ndjson": {}}},
+        401: {"model": schemas.FailResponse},
+        422: {"model": schemas.FailResponse},
+    },
+)
+async def export_me(
+    api_key: Annotated[str, Header()],
+    session: AsyncSession = Depends(get_session),
+    session_maker: async_sessionmaker = Depends(get_session_maker),
+    shards: ShardRouter = Depends(get_shards),
+) -> StreamingResponse:
+    """
+    Endpoint to export all data of current user as NDJSON, one record per
+    line with its type: user, tweet, media, like, following, follower.
+    :param api_key: Api key header.
+    :type api_key: str
+    :param session: Asynchronous session.
+    :type session: AsyncSession
+    :param session_maker: Session factory for the streaming session.
+    :type session_maker: async_sessionmaker
+    :param shards: Shard router.
+    :type shards: ShardRouter
+    :return: Response
+    :rtype: StreamingResponse
+    """
+    user_id = await check_api_key(api_key, db_models.Users.get_id_by_api_key, session)
+    # Tweets and media live on the shard of the user, likes on the shards
+    # of the liked tweets.
+    steps = [
+        (HOME_SHARD, {"user"}),
+        (shards.shard_of(user_id), {"tweet", "media"}),
+        *((shard, {"like"}) for shard in range(len(shards))),
+        (HOME_SHARD, {"following", "follower"}),
+    ]
+
+    async def lines() -> AsyncIterator[str]:
+        # The request session is closed before the body is sent.
+        for shard, kinds in steps:
+            async with shards.session_maker(session_maker, shard)() as export_session:
+                async for records in db_models.Users.export(
+                    export_session, user_id, kinds=kinds
+                ):
+                    yield "".join(json.dumps(record) + "\n" for record in records)
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={
+            "Content-Disposition": 'attachment; filename="export.ndjson"',
+            "X-Accel-Buffering": "no",
+        },
+    )
 
 
 @router.get(
     "/{id}",
     response_model=schemas.UserResponse,
+    response_model_exclude_unset=True,
     status_code=status.HTTP_200_OK,
     responses={
         401: {"model": schemas.FailResponse},
@@ -53,24 +133,90 @@ async def me(
 async def user_by_id(
     api_key: Annotated[str, Header()],
     id: Annotated[int, Path()],
+    fields: Annotated[Optional[str], Query()] = None,
     session: AsyncSession = Depends(get_session),
-) -> Dict[str, bool | str | db_models.Users]:
+) -> Dict[str, bool | Dict[str, Any]]:
     """
     Endpoint to get user with given id.
     :param api_key: Api key header.
     :type api_key: str
     :param id: User id
     :type id: int
+    :param fields: Comma separated fields to return, all by default.
+    :type fields: str | None
     :param session: Asynchronous session.
     :type session: AsyncSession
     :return: Response
-    :rtype: Dict[str, bool | str | db_models.Users]
+    :rtype: Dict[str, bool | Dict[str, Any]]
     """
-    await check_api_key(api_key, db_models.Users.get_user_by_api_key, session)
-    user = await db_models.Users.get_user_by_id(session=session, id=id)
+    requested = parse_fields(fields, db_models.USER_FIELDS)
+    await check_api_key(api_key, db_models.Users.get_id_by_api_key, session)
+    user = await db_models.Users.get_user_by_id(
+        session=session, id=id, fields=requested
+    )
     if not user:
         raise TwitterNoUserException
-    return {"result": True, "user": user}
+    return {"result": True, "user": user.to_dict(requested)}
+
+
+@router.get(
+    "/{id}/tweets",
+    response_model=(schemas.NormalizedTweetsPageResponse | schemas.TweetsPageResponse),
+    status_code=status.HTTP_200_OK,
+    responses={
+        401: {"model": schemas.FailResponse},
+        404: {"model": schemas.FailResponse},
+        422: {"model": schemas.FailResponse},
+    },
+)
+async def user_tweets(
+    api_key: Annotated[str, Header()],
+    id: Annotated[int, Path()],
+    cursor: Annotated[int | None, Query()] = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    normalized: Annotated[bool, Query()] = False,
+    history: Annotated[bool, Query()] = False,
+    session: AsyncSession = Depends(get_session),
+    shards: ShardRouter = Depends(get_shards),
+) -> Dict[str, Any]:
+    """
+    Endpoint to get tweets of user with given id, newest first.
+    :param api_key: Api key header.
+    :type api_key: str
+    :param id: User id
+    :type id: int
+    :param cursor: Id of the last tweet from previous page.
+    :type cursor: int | None
+    :param limit: Page size.
+    :type limit: int
+    :param normalized: Reference users by id and return them once in users.
+    :type normalized: bool
+    :param history: Read all partitions, not only the recent ones.
+    :type history: bool
+    :param session: Asynchronous session.
+    :type session: AsyncSession
+    :param shards: Shard router.
+    :type shards: ShardRouter
+    :return: Response
+    :rtype: Dict[str, Any]
+    """
+    user_id = await check_api_key(api_key, db_models.Users.get_id_by_api_key, session)
+    if not await db_models.Users.user_exists(session=session, id=id):
+        raise TwitterNoUserException
+    async with shards.user_session(session, id) as shard_session:
+        tweets = await db_models.Tweets.get_tweets_by_author(
+            session=shard_session,
+            author_id=id,
+            limit=limit,
+            cursor=cursor,
+            since=0 if history else partitions.since,
+        )
+        next_cursor = tweets[-1].id if len(tweets) == limit else None
+        items = await db_models.Tweets.feed_items(shard_session, tweets, user_id)
+    impressions.add((tweet.id for tweet in tweets), user_id)
+    if normalized:
+        return {"result": True, **normalize_feed(items), "next_cursor": next_cursor}
+    return {"result": True, "tweets": items, "next_cursor": next_cursor}
 
 
 @router.post(
@@ -109,6 +255,10 @@ async def follow_user(
     if follower in user.followers:
         raise TwitterAlreadyFollowingException
     user.followers.append(follower)
+    if id != follower.id:
+        db_models.Outbox.add(
+            session, NOTIFY, {"user_id": id, "kind": "follow", "actor_id": follower.id}
+        )
     await session.commit()
     return {"result": True}
 
@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, ConfigDict, Field
 
@@ -8,11 +8,13 @@ class BaseUser(BaseModel):
     name: str
 
 
-class User(BaseUser):
+class User(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
-    followers: List[BaseUser]
-    following: List[BaseUser]
+    id: int
+    name: Optional[str] = None
+    followers: Optional[List[BaseUser]] = None
+    following: Optional[List[BaseUser]] = None
 
 
 class LikesUser(BaseModel):
@@ -35,6 +37,22 @@ class AddTweetResponse(ResultResponse):
     tweet_id: int
 
 
+class ImportTweet(BaseModel):
+    tweet_data: str
+    tweet_media_ids: List[int] = []
+
+
+class ImportLineError(BaseModel):
+    line: int
+    error: str
+
+
+class ImportTweetsResponse(ResultResponse):
+    imported: int
+    failed: int
+    errors: List[ImportLineError]
+
+
 class AddMediaResponse(ResultResponse):
     media_id: int
 
@@ -48,10 +66,18 @@ class Media(BaseModel):
 
 class Tweet(BaseModel):
     id: int
-    content: str
-    attachments: List[str]
-    author: BaseUser
-    likes: List[LikesUser]
+    content: Optional[str] = None
+    attachments: Optional[List[str]] = None
+    author: Optional[BaseUser] = None
+    likes: Optional[List[LikesUser]] = None
+    like_count: Optional[int] = None
+    liked_by_me: Optional[bool] = None
+    views: Optional[int] = None
+    viewers: Optional[int] = None
+    parent_id: Optional[int] = None
+    retweet_of_id: Optional[int] = None
+    reply_count: Optional[int] = None
+    retweet_count: Optional[int] = None
 
 
 class TweetsResponse(ResultResponse):
@@ -60,6 +86,90 @@ class TweetsResponse(ResultResponse):
     tweets: List[Tweet]
 
 
+class TweetsPageResponse(TweetsResponse):
+    next_cursor: Optional[int] = None
+
+
+class NormalizedTweet(BaseModel):
+    id: int
+    content: Optional[str] = None
+    attachments: Optional[List[str]] = None
+    author_id: Optional[int] = None
+    likes: Optional[List[int]] = None
+    like_count: Optional[int] = None
+    liked_by_me: Optional[bool] = None
+    views: Optional[int] = None
+    viewers: Optional[int] = None
+    parent_id: Optional[int] = None
+    retweet_of_id: Optional[int] = None
+    reply_count: Optional[int] = None
+    retweet_count: Optional[int] = None
+
+
+class NormalizedTweetsResponse(ResultResponse):
+    tweets: List[NormalizedTweet]
+    users: Dict[int, BaseUser]
+
+
+class NormalizedTweetsPageResponse(NormalizedTweetsResponse):
+    next_cursor: Optional[int] = None
+
+
+class LikersResponse(ResultResponse):
+    users: List[LikesUser]
+    next_cursor: Optional[int] = None
+
+
+class SearchTweet(Tweet):
+    rank: float
+    headline: str
+
+
+class SearchTweetsResponse(ResultResponse):
+    model_config = ConfigDict(from_attributes=True)
+
+    tweets: List[SearchTweet]
+
+
+class ThreadTweet(Tweet):
+    level: int
+
+
+class ThreadResponse(ResultResponse):
+    tweet: Tweet
+    ancestors: List[Tweet]
+    replies: List[ThreadTweet]
+    next_cursor: Optional[int] = None
+
+
+class TrendingHashtag(BaseModel):
+    tag: str
+    count: int
+
+
+class TrendingResponse(ResultResponse):
+    hashtags: List[TrendingHashtag]
+
+
+class Notification(BaseModel):
+    id: int
+    kind: str
+    tweet_id: Optional[int] = None
+    actor: BaseUser
+    others: int
+    read: bool
+
+
+class NotificationsResponse(ResultResponse):
+    notifications: List[Notification]
+    unread: int
+    next_cursor: Optional[int] = None
+
+
+class UnreadResponse(ResultResponse):
+    unread: int
+
+
 class FailResponse(BaseModel):
     result: bool
     error_type: str
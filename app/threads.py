@@ -0,0 +1,185 @@
+from collections import Counter, defaultdict, deque
+from functools import partial
+from typing import Any, Deque, Dict, Iterable, List, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.db_models import (
+    THREAD_ANCESTORS,
+    THREAD_DEPTH,
+    THREAD_MAX_TWEETS,
+    THREAD_WIDTH,
+    Tweets,
+)
+from app.db.shards import ShardRouter
+
+
+def build_thread(
+    tweet_id: int,
+    tweets: Iterable[Tuple[int, Any]],
+    depth: int = THREAD_DEPTH,
+    width: int = THREAD_WIDTH,
+    limit: int = THREAD_WIDTH,
+    max_tweets: int = THREAD_MAX_TWEETS,
+) -> List[Tuple[int, Any, int]]:
+    """
+    Arranges replies below tweet as a tree. Tweets are kept breadth first,
+    the oldest limit direct replies and width replies of every other
+    tweet, down to depth levels and up to max_tweets in total.
+    :param tweet_id: Id of the tweet at the top of the thread.
+    :type tweet_id: int
+    :param tweets: Shard index and reply, in any order, duplicates allowed.
+    :type tweets: Iterable[Tuple[int, Any]]
+    :param depth: Number of reply levels.
+    :type depth: int
+    :param width: Replies per reply.
+    :type width: int
+    :param limit: Direct replies of the tweet.
+    :type limit: int
+    :param max_tweets: Maximum number of replies.
+    :type max_tweets: int
+    :return: Shard index, reply and its level, 1 for direct replies, with
+        every reply followed by its own replies.
+    :rtype: List[Tuple[int, Any, int]]
+    """
+    children: Dict[int, Dict[int, Tuple[int, Any]]] = defaultdict(dict)
+    for shard, tweet in tweets:
+        children[tweet.parent_id][tweet.id] = (shard, tweet)
+    kept: Dict[int, List[int]] = defaultdict(list)
+    count = 0
+    queue: Deque[Tuple[int, int]] = deque([(tweet_id, 0)])
+    while queue and count < max_tweets:
+        parent_id, level = queue.popleft()
+        if level == depth:
+            continue
+        for reply_id in sorted(children[parent_id])[: limit if level == 0 else width]:
+            if count == max_tweets:
+                break
+            kept[parent_id].append(reply_id)
+            queue.append((reply_id, level + 1))
+            count += 1
+    thread: List[Tuple[int, Any, int]] = []
+    stack = [(reply_id, tweet_id, 1) for reply_id in reversed(kept[tweet_id])]
+    while stack:
+        reply_id, parent_id, level = stack.pop()
+        shard, tweet = children[parent_id][reply_id]
+        thread.append((shard, tweet, level))
+        stack.extend(
+            (child_id, reply_id, level + 1) for child_id in reversed(kept[reply_id])
+        )
+    return thread
+
+
+async def load_ancestors(
+    session: AsyncSession,
+    shards: ShardRouter,
+    tweet_id: int,
+    depth: int = THREAD_ANCESTORS,
+) -> List[Tuple[int, Any]]:
+    """
+    Loads tweet and the chain of tweets it replies to. Every shard follows
+    the chain with one recursive query; another round only starts where
+    the chain continues on a different shard.
+    :param session: Request session, bound to the home shard.
+    :type session: AsyncSession
+    :param shards: Shard router.
+    :type shards: ShardRouter
+    :param tweet_id: Tweet id.
+    :type tweet_id: int
+    :param depth: Number of ancestors.
+    :type depth: int
+    :return: Shard index and tweet, the tweet itself first, deleted
+        ancestors included.
+    :rtype: List[Tuple[int, Any]]
+    """
+    chain: List[Tuple[int, Any]] = []
+    next_id, left = tweet_id, depth
+    while next_id is not None and left >= 0:
+        pages = await shards.gather(
+            session, partial(Tweets.get_ancestors, id=next_id, depth=left)
+        )
+        found = sorted(
+            (
+                (level, shard, tweet)
+                for shard, page in enumerate(pages)
+                for tweet, level in page
+            ),
+            key=lambda row: row[0],
+        )
+        if not found:
+            break
+        chain.extend((shard, tweet) for _, shard, tweet in found)
+        if len(shards) == 1:
+            break
+        top_level, _, top = found[-1]
+        next_id, left = top.parent_id, left - top_level - 1
+    return chain
+
+
+async def load_replies(
+    session: AsyncSession,
+    shards: ShardRouter,
+    tweet_id: int,
+    depth: int = THREAD_DEPTH,
+    width: int = THREAD_WIDTH,
+    cursor: int | None = None,
+    limit: int = THREAD_WIDTH,
+    max_tweets: int = THREAD_MAX_TWEETS,
+) -> List[Tuple[int, Any, int]]:
+    """
+    Loads a page of direct replies of tweet with their replies, see
+    build_thread. Every shard walks its part of the tree with one
+    recursive query. With several shards, replies missing below a level
+    according to reply_count are fetched in one more round per level, so
+    the number of queries depends on depth, not on the size of the thread.
+    :param session: Request session, bound to the home shard.
+    :type session: AsyncSession
+    :param shards: Shard router.
+    :type shards: ShardRouter
+    :param tweet_id: Tweet id.
+    :type tweet_id: int
+    :param depth: Number of reply levels.
+    :type depth: int
+    :param width: Replies per reply.
+    :type width: int
+    :param cursor: Id of the last direct reply from previous page.
+    :type cursor: int | None
+    :param limit: Page size of direct replies.
+    :type limit: int
+    :param max_tweets: Maximum number of replies.
+    :type max_tweets: int
+    :return: Shard index, reply and its level in thread order.
+    :rtype: List[Tuple[int, Any, int]]
+    """
+    found: Dict[int, Tuple[int, Any]] = {}
+    levels: Dict[int, int] = {}
+
+    async def fetch(parent_ids: List[int], base: int, **kwargs: Any) -> None:
+        pages = await shards.gather(
+            session,
+            partial(
+                Tweets.get_replies,
+                parent_ids=parent_ids,
+                depth=depth - base,
+                width=width,
+                max_tweets=max_tweets,
+                **kwargs,
+            ),
+        )
+        for shard, page in enumerate(pages):
+            for tweet, level in page:
+                found[tweet.id] = (shard, tweet)
+                levels[tweet.id] = base + level
+
+    await fetch([tweet_id], 0, cursor=cursor, limit=limit)
+    if len(shards) > 1:
+        for base in range(1, depth):
+            counts = Counter(tweet.parent_id for _, tweet in found.values())
+            frontier = [
+                id
+                for id, (_, tweet) in found.items()
+                if levels[id] == base and counts[id] < min(width, tweet.reply_count)
+            ]
+            if frontier:
+                await fetch(frontier, base)
+    return build_thread(tweet_id, found.values(), depth, width, limit, max_tweets)
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import os
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.future import select
+
+from app.db.db_models import TrendBuckets
+
+TRENDING_WINDOW = int(os.getenv("TRENDING_WINDOW", 3600))
+TRENDING_BUCKET = int(os.getenv("TRENDING_BUCKET", 60))
+TRENDING_CHECKPOINT_INTERVAL = int(os.getenv("TRENDING_CHECKPOINT_INTERVAL", 30))
+TRENDING_TOP = 100
+
+logger = logging.getLogger(__name__)
+
+
+class TrendingCounter:
+    """
+    Sliding window hashtag counter.
+    Increments of this worker are kept in memory by time bucket and
+    periodically added to the trend_buckets table. Each checkpoint loads
+    back the window totals of all workers, so reads are served from memory.
+    """
+
+    def __init__(self, window: int = TRENDING_WINDOW, bucket: int = TRENDING_BUCKET):
+        self.window = window
+        self.bucket = bucket
+        self._pending: Dict[int, Counter] = defaultdict(Counter)
+        self._saved: Counter = Counter()
+
+    def _bucket(self, now: float) -> int:
+        return int(now // self.bucket * self.bucket)
+
+    def _window_start(self, now: float) -> int:
+        return self._bucket(now) - self.window + self.bucket
+
+    def add(self, tags: Iterable[str], now: float | None = None) -> None:
+        """
+        Counts hashtags of a new tweet.
+        :param tags: Normalized hashtags.
+        :type tags: Iterable[str]
+        :param now: Current timestamp.
+        :type now: float | None
+        """
+        now = time.time() if now is None else now
+        self._pending[self._bucket(now)].update(tags)
+
+    def top(self, limit: int, now: float | None = None) -> List[Tuple[str, int]]:
+        """
+        Returns most used hashtags of the window.
+        :param limit: Number of hashtags.
+        :type limit: int
+        :param now: Current timestamp.
+        :type now: float | None
+        :return: Hashtags with counts, most used first.
+        :rtype: List[Tuple[str, int]]
+        """
+        now = time.time() if now is None else now
+        start = self._window_start(now)
+        totals = Counter(self._saved)
+        for bucket, counts in self._pending.items():
+            if bucket >= start:
+                totals.update(counts)
+        return totals.most_common(limit)
+
+    async def checkpoint(self, session: AsyncSession, now: float | None = None) -> None:
+        """
+        Saves pending counts and reloads window totals of all workers.
+        :param session: Database session.
+        :type session: AsyncSession
+        :param now: Current timestamp.
+        :type now: float | None
+        """
+        now = time.time() if now is None else now
+        start = self._window_start(now)
+        pending, self._pending = self._pending, defaultdict(Counter)
+        rows = [
+            {"bucket": bucket, "tag": tag, "count": count}
+            for bucket, counts in pending.items()
+            if bucket >= start
+            for tag, count in counts.items()
+        ]
+        try:
+            if rows:
+                query = insert(TrendBuckets)
+                await session.execute(
+                    query.on_conflict_do_update(
+                        index_elements=[TrendBuckets.bucket, TrendBuckets.tag],
+                        set_={"count": TrendBuckets.count + query.excluded["count"]},
+                    ),
+                    rows,
+                )
+            await session.execute(
+                delete(TrendBuckets).filter(TrendBuckets.bucket < start)
+            )
+            total = func.sum(TrendBuckets.count)
+            res = await session.execute(
+                select(TrendBuckets.tag, total)
+                .filter(TrendBuckets.bucket >= start)
+                .group_by(TrendBuckets.tag)
+                .order_by(total.desc())
+                .limit(TRENDING_TOP)
+            )
+            saved = res.all()
+            await session.commit()
+        except Exception:
+            for bucket, counts in pending.items():
+                self._pending[bucket].update(counts)
+            raise
+        self._saved = Counter({tag: int(count) for tag, count in saved})
+
+    async def run(
+        self,
+        session_maker: async_sessionmaker,
+        interval: int = TRENDING_CHECKPOINT_INTERVAL,
+    ) -> None:
+        """
+        Checkpoints counts until cancelled.
+        :param session_maker: Asynchronous session maker.
+        :type session_maker: async_sessionmaker
+        :param interval: Seconds between checkpoints.
+        :type interval: int
+        """
+        while True:
+            try:
+                async with session_maker() as session:
+                    await self.checkpoint(session)
+            except (SQLAlchemyError, OSError):
+                logger.exception("Trending checkpoint failed.")
+            await asyncio.sleep(interval)
+
+
+trending = TrendingCounter()
@@ -78,6 +78,22 @@ class TwitterDidNotLikeException(TwitterException):
         self.error_message = "You did not liked this tweet yet."
 
 
+class TwitterAlreadyRetweetedException(TwitterException):
+    def __init__(self):
+        super().__init__()
+        self.status_code = status.HTTP_405_METHOD_NOT_ALLOWED
+        self.error_type = "Retweet error."
+        self.error_message = "You have already retweeted this tweet."
+
+
+class TwitterDidNotRetweetException(TwitterException):
+    def __init__(self):
+        super().__init__()
+        self.status_code = status.HTTP_405_METHOD_NOT_ALLOWED
+        self.error_type = "Retweet error."
+        self.error_message = "You did not retweet this tweet."
+
+
 class TwitterAlreadyFollowingException(TwitterException):
     def __init__(self):
         super().__init__()
@@ -92,3 +108,35 @@ class TwitterDoNotFollowingException(TwitterException):
         self.status_code = status.HTTP_405_METHOD_NOT_ALLOWED
         self.error_type = "Following error."
         self.error_message = "You are not following this user."
+
+
+class TwitterUnknownFieldException(TwitterException):
+    def __init__(self):
+        super().__init__()
+        self.status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+        self.error_type = "Unknown field."
+        self.error_message = "Requested fields are not available."
+
+
+class TwitterRateLimitException(TwitterException):
+    def __init__(self):
+        super().__init__()
+        self.status_code = status.HTTP_429_TOO_MANY_REQUESTS
+        self.error_type = "Rate limit exceeded."
+        self.error_message = "Too many requests, try again later."
+
+
+class TwitterOverloadedException(TwitterException):
+    def __init__(self):
+        super().__init__()
+        self.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        self.error_type = "Service overloaded."
+        self.error_message = "Server is busy, try again later."
+
+
+class TwitterNotReadyException(TwitterException):
+    def __init__(self):
+        super().__init__()
+        self.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        self.error_type = "Service not ready."
+        self.error_message = "Server is starting or lost the database."
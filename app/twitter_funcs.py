@@ -1,26 +1,130 @@
-from collections.abc import Callable
-from typing import Any
+import re
+from collections.abc import AsyncIterable, AsyncIterator, Callable
+from typing import AbstractSet, Any, Dict, List, Set, Tuple
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from twitter_exception import TwitterWrongApiKeyException
+from twitter_exception import TwitterUnknownFieldException, TwitterWrongApiKeyException
+
+HASHTAG_RE = re.compile(r"(?<![\w#])#(\w{1,100})")
+MENTION_RE = re.compile(r"(?<![\w@])@(\w{1,100})")
 
 
 async def check_api_key(
     api_key: str, get_user_method: Callable, session: AsyncSession
-) -> tuple[str, Any]:
+) -> Any:
     """
-
+    Returns the user with given api key.
     :param api_key: Api key header.
     :type api_key: str
     :param get_user_method: Method to get user with given api key.
     :type get_user_method: Callable
     :param session: Asynchronous session
     :type session: AsyncSession
-    :return: api key and user data
-    :rtype: tuple[str, Any]
+    :return: User with the api key.
+    :rtype: Any
     """
 
     user = await get_user_method(session=session, api_key=api_key)
     if not user:
         raise TwitterWrongApiKeyException
     return user
+
+
+def parse_fields(fields: str | None, allowed: AbstractSet[str]) -> AbstractSet[str]:
+    """
+    Parses comma separated sparse fieldset, id is always included.
+    :param fields: Fields query parameter, None means all fields.
+    :type fields: str | None
+    :param allowed: Fields the endpoint can return.
+    :type allowed: AbstractSet[str]
+    :return: Requested fields.
+    :rtype: AbstractSet[str]
+    """
+    if fields is None:
+        return allowed
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    if not requested <= allowed:
+        raise TwitterUnknownFieldException
+    return requested | {"id"}
+
+
+def extract_hashtags(text: str) -> Set[str]:
+    """
+    Returns normalized hashtags found in text.
+    :param text: Tweet text.
+    :type text: str
+    :return: Lowercase hashtags without leading '#'.
+    :rtype: Set[str]
+    """
+    return {tag.lower() for tag in HASHTAG_RE.findall(text)}
+
+
+def extract_mentions(text: str) -> Set[str]:
+    """
+    Returns normalized user handles mentioned in text.
+    A handle is the user name in lowercase without spaces.
+    :param text: Tweet text.
+    :type text: str
+    :return: Lowercase handles without leading '@'.
+    :rtype: Set[str]
+    """
+    return {handle.lower() for handle in MENTION_RE.findall(text)}
+
+
+def normalize_feed(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Replaces authors and likers of feed items with their ids and collects
+    every referenced user once, in a single pass over the items.
+    :param items: Feed items built by Tweets.feed_items.
+    :type items: List[Dict[str, Any]]
+    :return: Normalized tweets and users by id.
+    :rtype: Dict[str, Any]
+    """
+    users: Dict[int, Dict[str, Any]] = {}
+    tweets = []
+    for item in items:
+        tweet = dict(item)
+        author = tweet.pop("author", None)
+        if author is not None:
+            if author.id not in users:
+                users[author.id] = {"id": author.id, "name": author.name}
+            tweet["author_id"] = author.id
+        if "likes" in tweet:
+            for liker in tweet["likes"]:
+                users.setdefault(liker["id"], liker)
+            tweet["likes"] = [liker["id"] for liker in tweet["likes"]]
+        if "attachments" in tweet:
+            tweet["attachments"] = list(tweet["attachments"])
+        tweets.append(tweet)
+    return {"tweets": tweets, "users": users}
+
+
+async def read_lines(
+    chunks: AsyncIterable[bytes], max_length: int
+) -> AsyncIterator[Tuple[int, bytes | None]]:
+    """
+    Splits streamed body into lines without reading it whole. Lines longer
+    than max_length are skipped up to the next line break and yielded as
+    None, so the caller can report them and go on.
+    :param chunks: Body chunks.
+    :type chunks: AsyncIterable[bytes]
+    :param max_length: Maximum line length in bytes.
+    :type max_length: int
+    :return: Line numbers starting from 1 and lines without line breaks,
+        None for too long lines.
+    :rtype: AsyncIterator[Tuple[int, bytes | None]]
+    """
+    number = 0
+    buffer = b""
+    skipping = False
+    async for chunk in chunks:
+        *lines, buffer = (buffer + chunk).split(b"\n")
+        for line in lines:
+            number += 1
+            yield number, None if skipping or len(line) > max_length else line
+            skipping = False
+        if len(buffer) > max_length:
+            buffer = b""
+            skipping = True
+    if buffer or skipping:
+        yield number + 1, None if skipping else buffer
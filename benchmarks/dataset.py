@@ -0,0 +1,315 @@
+"""
+Synthetic dataset generator.
+
+Fills the database configured in envs/dev.env with users, tweets, media,
+hashtags, likes and follows. Activity follows a power-law: a few users
+write and get followed a lot, a few tweets collect most likes.
+
+    python benchmarks/dataset.py --users 100000 --tweets 1000000 \
+        --likes 5000000 --follows 2000000 --media 100000
+
+Rows are streamed to the database with COPY in batches of --batch-size.
+Tables must exist (run app/init_db.py first). Existing rows are kept.
+Ids have the format of app/db/ids.py and are spread over the last --days,
+so tweets fill partitions like real history.
+"""
+
+import argparse
+import asyncio
+import bisect
+import itertools
+import os
+import random
+import sys
+import time
+from typing import Any, Iterator, List, Sequence, Tuple, overload
+
+import asyncpg
+from dotenv import load_dotenv
+
+sys.path.append(".")
+from app.db.ids import MAX_WORKERS, TIMESTAMP_SHIFT, compose_id  # noqa: E402
+
+load_dotenv("envs/dev.env", override=True)
+# Highest worker id, the last one claimed by the app.
+DATASET_WORKER = MAX_WORKERS - 1
+# Partitioning of app/db/db_models.py.
+PARTITION_DAYS = int(os.getenv("PARTITION_DAYS", 7))
+PARTITION_SIZE = PARTITION_DAYS * 86_400_000 << TIMESTAMP_SHIFT
+
+WORDS = (
+    "cartman kenny kyle stan butters randy chef garrison towelie mackey "
+    "school snow bus cheesy poofs colorado mountain town cow day episode "
+    "season funny hello today tomorrow again really never always"
+).split()
+TAGS = [f"tag{number}" for number in range(1000)]
+TAGGED_SHARE = 0.3
+TAG_WEIGHTS = list(itertools.accumulate(rank**-1.0 for rank in range(1, len(TAGS) + 1)))
+
+Record = Tuple[Any, ...]
+
+
+class IdRange(Sequence[int]):
+    """
+    Increasing ids spread evenly over a time span.
+    """
+
+    def __init__(self, count: int, start_ms: int, end_ms: int):
+        self.count = count
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+
+    def __len__(self) -> int:
+        return self.count
+
+    @overload
+    def __getitem__(self, index: int) -> int: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> Sequence[int]: ...
+
+    def __getitem__(self, index: int | slice) -> int | Sequence[int]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        ms = self.start_ms + index * (self.end_ms - self.start_ms) // self.count
+        return compose_id(ms, DATASET_WORKER, index)
+
+
+def power_law_weights(size: int, skew: float) -> List[float]:
+    """
+    Returns cumulative power-law weights over randomly ranked items.
+    :param size: Number of items.
+    :type size: int
+    :param skew: Power-law exponent, 0 is uniform.
+    :type skew: float
+    :return: Cumulative weights.
+    :rtype: List[float]
+    """
+    ranks = list(range(1, size + 1))
+    random.shuffle(ranks)
+    return list(itertools.accumulate(rank**-skew for rank in ranks))
+
+
+def pick(cum_weights: Sequence[float]) -> int:
+    """
+    Returns index of item picked by cumulative weights.
+    """
+    return bisect.bisect(cum_weights, random.random() * cum_weights[-1])
+
+
+def shares(total: int, cum_weights: Sequence[float]) -> Iterator[Tuple[int, int]]:
+    """
+    Splits total between items proportionally to their weights.
+    :return: Item index and its share, empty shares are skipped.
+    :rtype: Iterator[Tuple[int, int]]
+    """
+    scale = total / cum_weights[-1]
+    previous = 0.0
+    for index, weight in enumerate(cum_weights):
+        expected = (weight - previous) * scale
+        previous = weight
+        share = int(expected) + (random.random() < expected % 1)
+        if share:
+            yield index, share
+
+
+def batched(records: Iterator[Record], size: int) -> Iterator[List[Record]]:
+    while batch := list(itertools.islice(records, size)):
+        yield batch
+
+
+def users(user_ids: Sequence[int]) -> Iterator[Record]:
+    for user_id in user_ids:
+        yield user_id, f"User {user_id}", f"bench{user_id}"
+
+
+def tweet_tag(tweet_id: int) -> str | None:
+    """
+    Returns hashtag of tweet derived from its id, so tweets and hashtags
+    tables can be streamed separately and still agree.
+    """
+    point = (tweet_id * 2654435761 % 2**32) / 2**32
+    if point >= TAGGED_SHARE:
+        return None
+    return TAGS[bisect.bisect(TAG_WEIGHTS, point / TAGGED_SHARE * TAG_WEIGHTS[-1])]
+
+
+def tweets(
+    tweet_ids: Sequence[int], user_ids: Sequence[int], authors: Sequence[float]
+) -> Iterator[Record]:
+    for tweet_id in tweet_ids:
+        words = random.choices(WORDS, k=random.randint(3, 20))
+        tag = tweet_tag(tweet_id)
+        if tag:
+            words.append(f"#{tag}")
+        yield tweet_id, " ".join(words), user_ids[pick(authors)]
+
+
+def hashtags(tweet_ids: Sequence[int]) -> Iterator[Record]:
+    for tweet_id in tweet_ids:
+        tag = tweet_tag(tweet_id)
+        if tag:
+            yield tag, tweet_id
+
+
+def media(media_ids: Sequence[int], tweet_ids: Sequence[int]) -> Iterator[Record]:
+    for media_id in media_ids:
+        tweet_id = random.choice(tweet_ids) if random.random() < 0.9 else None
+        yield media_id, f"{media_id}__bench.jpg", tweet_id
+
+
+def likes(
+    total: int,
+    tweet_ids: Sequence[int],
+    user_ids: Sequence[int],
+    popularity: Sequence[float],
+) -> Iterator[Record]:
+    for index, share in shares(total, popularity):
+        tweet_id = tweet_ids[index]
+        for user_id in random.sample(user_ids, min(share, len(user_ids))):
+            yield user_id, tweet_id
+
+
+def follows(
+    total: int, user_ids: Sequence[int], popularity: Sequence[float]
+) -> Iterator[Record]:
+    for index, share in shares(total, popularity):
+        following_id = user_ids[index]
+        for follower_id in random.sample(user_ids, min(share + 1, len(user_ids))):
+            if follower_id != following_id:
+                yield follower_id, following_id
+
+
+async def copy(
+    conn: asyncpg.Connection,
+    table: str,
+    columns: List[str],
+    records: Iterator[Record],
+    batch_size: int,
+) -> None:
+    """
+    Streams records into table with COPY, one transaction per batch.
+    """
+    start = time.perf_counter()
+    rows = 0
+    for batch in batched(records, batch_size):
+        async with conn.transaction():
+            await conn.copy_records_to_table(table, records=batch, columns=columns)
+        rows += len(batch)
+        print(f"\r{table}: {rows} rows", end="", flush=True)
+    print(f"\r{table}: {rows} rows in {time.perf_counter() - start:.1f}s")
+
+
+async def create_partitions(conn: asyncpg.Connection, tweet_ids: IdRange) -> None:
+    """
+    Creates tweets and likes partitions covering generated tweet ids, the
+    app only keeps the current ones.
+    """
+    if not tweet_ids:
+        return
+    for index in range(
+        tweet_ids[0] // PARTITION_SIZE, tweet_ids[-1] // PARTITION_SIZE + 1
+    ):
+        start, end = index * PARTITION_SIZE, (index + 1) * PARTITION_SIZE
+        for table in ("tweets", "likes"):
+            await conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table}_p{index} PARTITION OF {table} "
+                f"FOR VALUES FROM ({start}) TO ({end})"
+            )
+
+
+async def generate(args: argparse.Namespace) -> None:
+    random.seed(args.seed)
+    conn = await asyncpg.connect(
+        host=os.getenv("POSTGRES_HOST"),
+        user=os.getenv("POSTGRES_USER"),
+        password=os.getenv("POSTGRES_PASSWORD"),
+        database=os.getenv("POSTGRES_DB"),
+    )
+    try:
+        end_ms = int(time.time() * 1000)
+        start_ms = end_ms - args.days * 86_400_000
+        user_ids = IdRange(args.users, start_ms, end_ms)
+        tweet_ids = IdRange(args.tweets, start_ms, end_ms)
+        media_ids = IdRange(args.media, start_ms, end_ms)
+        await create_partitions(conn, tweet_ids)
+
+        await copy(
+            conn,
+            "users",
+            ["id", "name", "api_key"],
+            users(user_ids),
+            args.batch_size,
+        )
+        authors = power_law_weights(args.users, args.skew)
+        await copy(
+            conn,
+            "tweets",
+            ["id", "content", "author_id"],
+            tweets(tweet_ids, user_ids, authors),
+            args.batch_size,
+        )
+        await copy(
+            conn,
+            "hashtags",
+            ["tag", "tweet_id"],
+            hashtags(tweet_ids),
+            args.batch_size,
+        )
+        if args.tweets:
+            await copy(
+                conn,
+                "media",
+                ["id", "filename", "tweet_id"],
+                media(media_ids, tweet_ids),
+                args.batch_size,
+            )
+            popularity = power_law_weights(args.tweets, args.skew)
+            await copy(
+                conn,
+                "likes",
+                ["users", "tweets"],
+                likes(args.likes, tweet_ids, user_ids, popularity),
+                args.batch_size,
+            )
+            await conn.execute(
+                "UPDATE tweets SET like_count = counts.likes "
+                "FROM (SELECT tweets, count(*) AS likes FROM likes GROUP BY tweets)"
+                " AS counts WHERE tweets.id = counts.tweets"
+            )
+        celebrities = power_law_weights(args.users, args.skew)
+        await copy(
+            conn,
+            "follows",
+            ["followers_id", "following_id"],
+            follows(args.follows, user_ids, celebrities),
+            args.batch_size,
+        )
+        await conn.execute("ANALYZE")
+    finally:
+        await conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--tweets", type=int, default=100_000)
+    parser.add_argument("--likes", type=int, default=500_000)
+    parser.add_argument("--follows", type=int, default=200_000)
+    parser.add_argument("--media", type=int, default=10_000)
+    parser.add_argument("--skew", type=float, default=1.1)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.users < 2:
+        parser.error("--users must be at least 2")
+    asyncio.run(generate(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""
+Load test for a running Twitter_API instance.
+
+Run a scenario mix and save results:
+
+    python benchmarks/loadtest.py run --url http://localhost:8000 \
+        --users 50 --duration 60 --output before.json
+
+Compare two saved runs:
+
+    python benchmarks/loadtest.py compare before.json after.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+import httpx
+
+DEFAULT_API_KEYS = ["test", "test2", "test3", "test4"]
+SCENARIOS = {
+    "feed": 60,
+    "like": 15,
+    "follow": 10,
+    "tweet_with_media": 10,
+    "upload": 5,
+}
+
+
+def percentile(values: List[float], share: float) -> float:
+    """
+    Returns nearest-rank percentile of values.
+    :param values: Sorted values.
+    :type values: List[float]
+    :param share: Percentile as a fraction.
+    :type share: float
+    :return: Percentile value.
+    :rtype: float
+    """
+    if not values:
+        return 0.0
+    rank = max(math.ceil(share * len(values)) - 1, 0)
+    return values[rank]
+
+
+class Recorder:
+    """
+    Collects latencies and statuses per endpoint.
+    """
+
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+
+    async def request(
+        self, client: httpx.AsyncClient, endpoint: str, method: str, url: str, **kwargs
+    ) -> httpx.Response:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as error:
+            self.statuses[endpoint][type(error).__name__] += 1
+            raise
+        self.latencies[endpoint].append(time.perf_counter() - start)
+        self.statuses[endpoint][str(response.status_code)] += 1
+        return response
+
+    def report(self, duration: float) -> Dict[str, Any]:
+        endpoints = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            latencies.sort()
+            endpoints[endpoint] = {
+                "requests": len(latencies),
+                "throughput": len(latencies) / duration,
+                "p50_ms": percentile(latencies, 0.50) * 1000,
+                "p95_ms": percentile(latencies, 0.95) * 1000,
+                "p99_ms": percentile(latencies, 0.99) * 1000,
+                "statuses": dict(self.statuses[endpoint]),
+            }
+        total = sum(len(latencies) for latencies in self.latencies.values())
+        return {"throughput": total / duration, "endpoints": endpoints}
+
+
+class VirtualUser:
+    """
+    Client acting as one user of the scenario mix.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        recorder: Recorder,
+        api_key: str,
+        user_ids: List[int],
+        image: bytes,
+    ):
+        self.client = client
+        self.recorder = recorder
+        self.headers = {"api-key": api_key}
+        self.user_ids = user_ids
+        self.image = image
+        self.tweet_ids: List[int] = []
+
+    async def call(self, endpoint: str, method: str, url: str, **kwargs):
+        return await self.recorder.request(
+            self.client, endpoint, method, url, headers=self.headers, **kwargs
+        )
+
+    async def feed(self) -> None:
+        response = await self.call("GET /api/tweets", "GET", "/api/tweets")
+        if response.status_code == 200:
+            self.tweet_ids = [tweet["id"] for tweet in response.json()["tweets"][:50]]
+
+    async def like(self) -> None:
+        if not self.tweet_ids:
+            await self.feed()
+            return
+        tweet_id = random.choice(self.tweet_ids)
+        url = f"/api/tweets/{tweet_id}/likes"
+        response = await self.call("POST /api/tweets/{id}/likes", "POST", url)
+        if response.status_code == 405:
+            await self.call("DELETE /api/tweets/{id}/likes", "DELETE", url)
+
+    async def follow(self) -> None:
+        url = f"/api/users/{random.choice(self.user_ids)}/follow"
+        response = await self.call("POST /api/users/{id}/follow", "POST", url)
+        if response.status_code == 405:
+            await self.call("DELETE /api/users/{id}/follow", "DELETE", url)
+
+    async def upload(self) -> int | None:
+        response = await self.call(
+            "POST /api/medias",
+            "POST",
+            "/api/medias",
+            files={"file": ("bench.jpg", self.image, "image/jpeg")},
+        )
+        if response.status_code != 201:
+            return None
+        return response.json()["media_id"]
+
+    async def tweet_with_media(self) -> None:
+        media_id = await self.upload()
+        data = {
+            "tweet_data": f"Benchmark tweet {random.randrange(10**6)} #bench",
+            "tweet_media_ids": [media_id] if media_id else [],
+        }
+        await self.call("POST /api/tweets", "POST", "/api/tweets", json=data)
+
+    async def run(self, deadline: float) -> None:
+        names = list(SCENARIOS)
+        weights = list(SCENARIOS.values())
+        while time.perf_counter() < deadline:
+            scenario = random.choices(names, weights)[0]
+            try:
+                await getattr(self, scenario)()
+            except httpx.HTTPError:
+                await asyncio.sleep(0.1)
+
+
+async def load_user_ids(client: httpx.AsyncClient, api_keys: List[str]) -> List[int]:
+    user_ids = []
+    for api_key in api_keys:
+        response = await client.get("/api/users/me", headers={"api-key": api_key})
+        response.raise_for_status()
+        user_ids.append(response.json()["user"]["id"])
+    return user_ids
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    random.seed(args.seed)
+    with open(args.image, "rb") as image_file:
+        image = image_file.read()
+    limits = httpx.Limits(max_connections=args.users)
+    recorder = Recorder()
+    async with httpx.AsyncClient(
+        base_url=args.url, limits=limits, timeout=args.timeout
+    ) as client:
+        user_ids = await load_user_ids(client, args.api_keys)
+        users = [
+            VirtualUser(
+                client,
+                recorder,
+                args.api_keys[number % len(args.api_keys)],
+                user_ids,
+                image,
+            )
+            for number in range(args.users)
+        ]
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*(user.run(deadline) for user in users))
+        duration = time.perf_counter() - start
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "url": args.url,
+            "users": args.users,
+            "duration": args.duration,
+            "seed": args.seed,
+            "scenarios": SCENARIOS,
+        },
+        "host": platform.node(),
+        **recorder.report(duration),
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"{'endpoint':36} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for endpoint, stats in report["endpoints"].items():
+        print(
+            f"{endpoint:36} {stats['throughput']:9.1f} {stats['p50_ms']:9.1f} "
+            f"{stats['p95_ms']:9.1f} {stats['p99_ms']:9.1f}"
+        )
+    print(f"{'total':36} {report['throughput']:9.1f}")
+
+
+def compare(before: Dict[str, Any], after: Dict[str, Any]) -> None:
+    """
+    Prints relative change of throughput and latency between two runs.
+    """
+
+    def change(old: float, new: float) -> str:
+        return f"{(new - old) / old * 100:+8.1f}%" if old else "      n/a"
+
+    print(f"{'endpoint':36} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for endpoint in sorted(set(before["endpoints"]) | set(after["endpoints"])):
+        old = before["endpoints"].get(endpoint)
+        new = after["endpoints"].get(endpoint)
+        if not old or not new:
+            print(f"{endpoint:36} only in {'after' if new else 'before'}")
+            continue
+        print(
+            f"{endpoint:36} "
+            + " ".join(
+                change(old[key], new[key])
+                for key in ("throughput", "p50_ms", "p95_ms", "p99_ms")
+            )
+        )
+    print(f"{'total':36} {change(before['throughput'], after['throughput'])}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run scenario mix.")
+    run_parser.add_argument("--url", default="http://localhost:8000")
+    run_parser.add_argument("--users", type=int, default=20)
+    run_parser.add_argument("--duration", type=float, default=30)
+    run_parser.add_argument("--timeout", type=float, default=30)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--api-keys", nargs="+", default=DEFAULT_API_KEYS)
+    run_parser.add_argument("--image", default="tests/test_image.jpg")
+    run_parser.add_argument("--output", help="Save results as json.")
+
+    compare_parser = commands.add_parser("compare", help="Compare two runs.")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        with open(args.before) as before, open(args.after) as after:
+            compare(json.load(before), json.load(after))
+        return
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Precompresses the frontend build for nginx gzip_static.
+
+    python nginx/build_static.py static
+
+Writes a .gz sibling next to every text asset, and a .br sibling when the
+brotli package is installed. Source maps are skipped, they are not served
+in production.
+"""
+
+import argparse
+import gzip
+import os
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSED_SUFFIXES = {".js", ".css", ".html", ".svg", ".ico", ".json", ".txt"}
+
+
+def write_sibling(path: Path, suffix: str, data: bytes) -> int:
+    """
+    Writes compressed data next to path with the mtime of the original,
+    so nginx reports the same Last-Modified for both.
+    :return: Compressed size.
+    :rtype: int
+    """
+    target = path.with_name(path.name + suffix)
+    target.write_bytes(data)
+    stat = path.stat()
+    os.utime(target, (stat.st_atime, stat.st_mtime))
+    return len(data)
+
+
+def compress(root: Path) -> None:
+    total = compressed = 0
+    for path in sorted(root.rglob("*")):
+        if not path.is_file() or path.suffix not in COMPRESSED_SUFFIXES:
+            continue
+        data = path.read_bytes()
+        total += len(data)
+        compressed += write_sibling(
+            path, ".gz", gzip.compress(data, compresslevel=9, mtime=0)
+        )
+        if brotli is not None:
+            write_sibling(path, ".br", brotli.compress(data))
+    print(f"{root}: {total} bytes, {compressed} gzipped")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("root", nargs="?", default="static")
+    args = parser.parse_args()
+    compress(Path(args.root))
+
+
+if __name__ == "__main__":
+    main()
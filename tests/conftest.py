@@ -1,77 +1,261 @@
+import asyncio
 import os
-from typing import AsyncGenerator
+from functools import partial
+from typing import AsyncGenerator, Dict, List
 
 import pytest
 from dotenv import load_dotenv
 from httpx import ASGITransport, AsyncClient
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from metrics import instrument_engine
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.future import select
+from sqlalchemy.pool import NullPool
 
-from app.db.database import get_session
-from app.db.db_models import Base
+from app.db.database import get_session, get_session_maker
+from app.db.db_models import Base, Users
+from app.db.shards import ShardRouter, get_shards
 from app.init_db import init_db
+from app.jobs import jobs
 from app.main import app
 
-load_dotenv('envs/dev.env', override=True)
-DB_HOST = os.getenv('POSTGRES_HOST')
-DB_USER = os.getenv('POSTGRES_USER')
-DB_PASS = os.getenv('POSTGRES_PASSWORD')
-DB_NAME = os.getenv('POSTGRES_DB')
+load_dotenv("envs/dev.env", override=True)
+DB_HOST = os.getenv("POSTGRES_HOST")
+DB_USER = os.getenv("POSTGRES_USER")
+DB_PASS = os.getenv("POSTGRES_PASSWORD")
+DB_NAME = os.getenv("POSTGRES_DB")
 
-TEST_DATABASE_URL = (
-    f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}/{DB_NAME}"
+# Every pytest-xdist worker gets its own database.
+WORKER = os.getenv("PYTEST_XDIST_WORKER", "main")
+TEST_DB_NAME = f"{DB_NAME}_test_{WORKER}"
+SERVER_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}/postgres"
+TEST_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}/{TEST_DB_NAME}"
+# Second shard of the two shard tests, emptied after each of them.
+SHARD_DB_NAME = f"{TEST_DB_NAME}_shard1"
+SHARD_DATABASE_URL = (
+    f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}/{SHARD_DB_NAME}"
 )
 
-test_engine = create_async_engine(TEST_DATABASE_URL)
-test_async_session = async_sessionmaker(bind=test_engine, expire_on_commit=False)
-test_async_client = AsyncClient(
-    transport=ASGITransport(app=app),  # type: ignore[arg-type]
-    base_url="http://localhost/api"
-)
+# Connections are opened inside the event loop of each test, so they
+# must not be pooled across tests.
+test_engine = create_async_engine(TEST_DATABASE_URL, poolclass=NullPool)
+# Requests use test_engine, so their queries are counted on it.
+instrument_engine(test_engine)
+shard_engine = create_async_engine(SHARD_DATABASE_URL, poolclass=NullPool)
 
 
-async def override_get_session() -> AsyncGenerator:
+async def create_database() -> None:
     """
-    Test database session generator
-    :return: Asynchronous session
-    :rtype: AsyncSession
+    Creates worker databases with tables, test data goes to the first one.
     """
-    async with test_async_session() as session:
-        yield session
+    server_engine = create_async_engine(
+        SERVER_URL, poolclass=NullPool, isolation_level="AUTOCOMMIT"
+    )
+    async with server_engine.connect() as conn:
+        for name in (TEST_DB_NAME, SHARD_DB_NAME):
+            await conn.execute(text(f'DROP DATABASE IF EXISTS "{name}"'))
+            await conn.execute(text(f'CREATE DATABASE "{name}"'))
+    await server_engine.dispose()
+    for engine in (test_engine, shard_engine):
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSession(test_engine, expire_on_commit=False) as session:
+        await init_db(session=session)
 
 
-app.dependency_overrides[get_session] = override_get_session
+async def drop_database() -> None:
+    """
+    Drops worker databases.
+    """
+    await test_engine.dispose()
+    await shard_engine.dispose()
+    server_engine = create_async_engine(
+        SERVER_URL, poolclass=NullPool, isolation_level="AUTOCOMMIT"
+    )
+    async with server_engine.connect() as conn:
+        for name in (TEST_DB_NAME, SHARD_DB_NAME):
+            await conn.execute(text(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)'))
+    await server_engine.dispose()
 
 
 @pytest.fixture(autouse=True, scope="session")
-async def create_test_db():
+def create_test_db():
     """
-    Creates tables in test database and fills them with test data.
+    Creates worker database once per test session.
     """
-    async with test_engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    async with test_async_session() as session:
-        await init_db(session=session)
+    asyncio.run(create_database())
     yield
-    async with test_engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
-    await test_engine.dispose()
+    asyncio.run(drop_database())
 
 
-@pytest.fixture(scope="session")
-async def test_client():
+@pytest.fixture
+async def test_connection():
     """
-    Provides test client.
+    Provides connection with a transaction rolled back after the test.
     """
+    async with test_engine.connect() as connection:
+        transaction = await connection.begin()
+        yield connection
+        await transaction.rollback()
+
+
+def bound_session(connection) -> AsyncSession:
+    """
+    Returns session whose commits only release a savepoint of connection.
+    """
+    return AsyncSession(
+        bind=connection,
+        join_transaction_mode="create_savepoint",
+        expire_on_commit=False,
+    )
+
+
+@pytest.fixture
+async def test_client(test_connection):
+    """
+    Provides test client using the test transaction.
+    """
+
+    async def override_get_session() -> AsyncGenerator:
+        """
+        Test database session generator
+        :return: Asynchronous session
+        :rtype: AsyncSession
+        """
+        async with bound_session(test_connection) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_get_session
+    app.dependency_overrides[get_session_maker] = lambda: partial(
+        bound_session, test_connection
+    )
     async with AsyncClient(
         transport=ASGITransport(app=app), base_url="http://localhost/api"
     ) as test_client:
         yield test_client
+    app.dependency_overrides.pop(get_session, None)
+    app.dependency_overrides.pop(get_session_maker, None)
 
 
-@pytest.fixture(scope="session")
-async def test_session():
+@pytest.fixture
+async def test_session(test_connection):
     """
     Provides test session.
     """
-    async with test_async_session() as test_session:
+    async with bound_session(test_connection) as test_session:
         yield test_session
+
+
+@pytest.fixture
+async def two_shards(test_connection):
+    """
+    Provides router of the app over the test transaction and a second
+    shard database, which is emptied after the test.
+    """
+    router = ShardRouter(
+        [
+            partial(bound_session, test_connection),
+            async_sessionmaker(bind=shard_engine, expire_on_commit=False),
+        ]
+    )
+    app.dependency_overrides[get_shards] = lambda: router
+    yield router
+    app.dependency_overrides.pop(get_shards, None)
+    tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+    async with shard_engine.begin() as conn:
+        await conn.execute(text(f"TRUNCATE {tables} CASCADE"))
+
+
+@pytest.fixture
+async def shard_users(test_session, two_shards) -> List[Users]:
+    """
+    Adds users to the home shard until one lives on each shard of
+    two_shards and provides them in the order of shards.
+    """
+    users: Dict[int, Users] = {}
+    for number in range(100):
+        user = Users(name=f"Shard user {number}", api_key=f"shard{number}")
+        test_session.add(user)
+        await test_session.commit()
+        users.setdefault(two_shards.shard_of(user.id), user)
+        if len(users) == len(two_shards):
+            return [users[shard] for shard in range(len(two_shards))]
+    raise AssertionError("No user for every shard.")
+
+
+@pytest.fixture
+def media_path(tmp_path, monkeypatch):
+    """
+    Provides per-test media directory.
+    """
+    monkeypatch.setenv("MEDIA_PATH", f"{tmp_path}/")
+    return tmp_path
+
+
+async def first_user(session: AsyncSession) -> Users:
+    """
+    Returns the user most tests act as.
+    """
+    return (await session.execute(select(Users))).scalars().first()
+
+
+@pytest.fixture
+async def tweet_id(test_client, test_session) -> int:
+    """
+    Provides id of a new tweet of the first user.
+    """
+    user = await first_user(test_session)
+    response = await test_client.post(
+        "/tweets",
+        headers={"api-key": user.api_key},
+        json={"tweet_data": "Test tweet message", "tweet_media_ids": []},
+    )
+    assert response.status_code == 201
+    return response.json()["tweet_id"]
+
+
+@pytest.fixture
+async def liked_tweet_id(test_client, test_session, tweet_id) -> int:
+    """
+    Provides id of a tweet of the first user liked by its author.
+    """
+    user = await first_user(test_session)
+    response = await test_client.post(
+        f"/tweets/{tweet_id}/likes", headers={"api-key": user.api_key}
+    )
+    assert response.status_code == 201
+    return tweet_id
+
+
+@pytest.fixture
+async def tagged_tweet_id(test_client, test_session) -> int:
+    """
+    Provides id of an indexed tweet of the first user tagged #southpark
+    and #cows.
+    """
+    user = await first_user(test_session)
+    response = await test_client.post(
+        "/tweets",
+        headers={"api-key": user.api_key},
+        json={"tweet_data": "#SouthPark #Cows"},
+    )
+    assert response.status_code == 201
+    await jobs.drain(test_session)
+    return response.json()["tweet_id"]
+
+
+@pytest.fixture
+async def following(test_client, test_session) -> None:
+    """
+    Makes the first user follow the last one.
+    """
+    user = await first_user(test_session)
+    other_user = (
+        (await test_session.execute(select(Users).order_by(Users.id.desc())))
+        .scalars()
+        .first()
+    )
+    response = await test_client.post(
+        f"/users/{other_user.id}/follow", headers={"api-key": user.api_key}
+    )
+    assert response.status_code == 201
@@ -0,0 +1,64 @@
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.future import select
+
+from app.admission import AdaptiveLimit, AdmissionMiddleware, RateLimiter
+from app.db.db_models import Users
+from app.main import app
+
+
+def test_rate_limiter():
+    limiter = RateLimiter(rate=1, burst=2)
+    assert limiter.take("test", now=0) == 0
+    assert limiter.take("test", now=0) == 0
+    assert limiter.take("test", now=0) == 1
+    assert limiter.take("test2", now=0) == 0
+    assert limiter.take("test", now=1) == 0
+
+
+def test_rate_limiter_evicts_keys():
+    limiter = RateLimiter(rate=1, burst=1, max_keys=1)
+    assert limiter.take("test", now=0) == 0
+    assert limiter.take("test2", now=0) == 0
+    assert limiter.take("test", now=0) == 0
+
+
+def test_adaptive_limit():
+    limit = AdaptiveLimit(max_limit=2, target_latency=1)
+    assert limit.acquire()
+    assert limit.acquire()
+    assert not limit.acquire()
+    limit.release(latency=2)
+    limit.release(latency=2)
+    assert limit.limit < 2
+    assert limit.acquire()
+    assert not limit.acquire()
+    limit.release(latency=0)
+    assert limit.limit > 1
+
+
+async def test_admission_rejects(test_client, test_session):
+    # test_client routes the app to the test transaction.
+    user = (await test_session.execute(select(Users))).scalars().first()
+    middleware = AdmissionMiddleware(
+        app,
+        rate_limiter=RateLimiter(rate=0.5, burst=1),
+        limits={
+            "reads": AdaptiveLimit(max_limit=1, target_latency=1),
+            "writes": AdaptiveLimit(max_limit=0, target_latency=1, min_limit=0),
+            "uploads": AdaptiveLimit(max_limit=1, target_latency=1),
+        },
+    )
+    async with AsyncClient(
+        transport=ASGITransport(app=middleware), base_url="http://localhost/api"
+    ) as client:
+        response = await client.get("/users/me", headers={"api-key": user.api_key})
+        assert response.status_code == 200
+
+        response = await client.get("/users/me", headers={"api-key": user.api_key})
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "2"
+        assert not response.json()["result"]
+
+        response = await client.post("/tweets", headers={"api-key": "test2"})
+        assert response.status_code == 503
+        assert not response.json()["result"]
@@ -0,0 +1,26 @@
+from httpx import ASGITransport, AsyncClient
+from starlette.responses import JSONResponse
+
+from app.caching import CACHE_BYPASS_COOKIE, CacheBypassMiddleware
+
+
+async def status_app(scope, receive, send):
+    status_code = 404 if scope["path"].endswith("/46") else 200
+    response = JSONResponse({"result": status_code == 200}, status_code=status_code)
+    await response(scope, receive, send)
+
+
+async def test_cache_bypass_after_write():
+    middleware = CacheBypassMiddleware(status_app, seconds=5)
+    async with AsyncClient(
+        transport=ASGITransport(app=middleware), base_url="http://localhost/api"
+    ) as client:
+        response = await client.get("/tweets")
+        assert CACHE_BYPASS_COOKIE not in response.cookies
+
+        response = await client.post("/tweets")
+        assert response.cookies[CACHE_BYPASS_COOKIE] == "1"
+        assert "Max-Age=5" in response.headers["set-cookie"]
+
+        response = await client.delete("/tweets/46")
+        assert "set-cookie" not in response.headers
@@ -0,0 +1,100 @@
+import pytest
+from sqlalchemy.future import select
+
+from app.db.db_models import Hashtags, Mentions, Users
+from app.jobs import jobs
+
+
+@pytest.mark.asyncio
+async def test_add_tweet_with_tags_ok(test_client, test_session):
+    user = (await test_session.execute(select(Users))).scalars().first()
+    other_user = (
+        (await test_session.execute(select(Users).order_by(Users.id.desc())))
+        .scalars()
+        .first()
+    )
+    handle, other_user_id = other_user.name.replace(" ", ""), other_user.id
+    request_data = {"tweet_data": f"#SouthPark with @{handle} #southpark #Cows"}
+
+    response = await test_client.post(
+        "/tweets", headers={"api-key": f"{user.api_key}"}, json=request_data
+    )
+    assert response.status_code == 201
+    tweet_id = response.json()["tweet_id"]
+    assert await jobs.drain(test_session) >= 1
+
+    tags = (
+        (await test_session.execute(select(Hashtags.tag).filter_by(tweet_id=tweet_id)))
+        .scalars()
+        .all()
+    )
+    assert sorted(tags) == ["cows", "southpark"]
+    mentioned = (
+        (
+            await test_session.execute(
+                select(Mentions.user_id).filter_by(tweet_id=tweet_id)
+            )
+        )
+        .scalars()
+        .all()
+    )
+    assert mentioned == [other_user_id]
+
+
+@pytest.mark.asyncio
+async def test_hashtag_tweets_ok(test_client, test_session, tagged_tweet_id):
+    user = (await test_session.execute(select(Users))).scalars().first()
+
+    response = await test_client.get(
+        "/hashtags/SouthPark/tweets",
+        headers={"api-key": f"{user.api_key}"},
+        params={"limit": 1},
+    )
+    assert response.status_code == 200
+    assert response.json()["result"]
+    assert [tweet["id"] for tweet in response.json()["tweets"]] == [tagged_tweet_id]
+
+    response = await test_client.get(
+        "/hashtags/nosuchtag/tweets", headers={"api-key": f"{user.api_key}"}
+    )
+    assert response.status_code == 200
+    assert response.json()["tweets"] == []
+    assert response.json()["next_cursor"] is None
+
+
+@pytest.mark.asyncio
+async def test_hashtag_tweets_fail(test_client, test_session):
+    response = await test_client.get("/hashtags/southpark/tweets", headers={})
+    assert response.status_code == 422
+    assert not response.json()["result"]
+
+    response = await test_client.get(
+        "/hashtags/southpark/tweets", headers={"api-key": "46"}
+    )
+    assert response.status_code == 401
+    assert not response.json()["result"]
+
+
+@pytest.mark.asyncio
+async def test_trending_ok(test_client, test_session, tagged_tweet_id):
+    user = (await test_session.execute(select(Users))).scalars().first()
+
+    response = await test_client.get(
+        "/hashtags/trending", headers={"api-key": f"{user.api_key}"}
+    )
+    assert response.status_code == 200
+    assert response.json()["result"]
+    tags = {item["tag"]: item["count"] for item in response.json()["hashtags"]}
+    assert tags["southpark"] >= 1
+    assert tags["cows"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_trending_fail(test_client, test_session):
+    response = await test_client.get("/hashtags/trending", headers={})
+    assert response.status_code == 422
+    assert not response.json()["result"]
+
+    response = await test_client.get("/hashtags/trending", headers={"api-key": "46"})
+    assert response.status_code == 401
+    assert not response.json()["result"]
@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+from app.impressions import ImpressionCounter
+from app.routers.health import State
+
+
+@pytest.mark.asyncio
+async def test_healthz_ok(test_client):
+    response = await test_client.get("http://localhost/healthz")
+    assert response.status_code == 200
+    assert response.json()["result"]
+
+
+@pytest.mark.asyncio
+async def test_readyz_not_warmed(test_client, monkeypatch):
+    monkeypatch.setattr(State, "ready", False)
+
+    response = await test_client.get("http://localhost/readyz")
+    assert response.status_code == 503
+    assert not response.json()["result"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_flush_keeps_views():
+    counter = ImpressionCounter()
+    counter.add([1, 2], 7)
+    started = asyncio.Event()
+
+    class StuckSession:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            return None
+
+        async def execute(self, *args, **kwargs):
+            started.set()
+            await asyncio.Event().wait()
+
+    task = asyncio.create_task(counter.flush_shards([StuckSession]))
+    await started.wait()
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    assert counter._views == {1: 1, 2: 1}
+    assert counter._viewers == {1: {7}, 2: {7}}
@@ -0,0 +1,27 @@
+from app.hll import HyperLogLog
+
+
+def test_hyperloglog_count():
+    sketch = HyperLogLog(precision=10)
+    assert sketch.count() == 0
+    sketch.update(range(10))
+    sketch.update(range(10))
+    assert sketch.count() == 10
+    sketch.update(range(100_000))
+    assert abs(sketch.count() - 100_000) < 100_000 * 0.1
+
+
+def test_hyperloglog_merge():
+    first = HyperLogLog(precision=10)
+    first.update(range(5000))
+    second = HyperLogLog(precision=10, registers=first.to_bytes())
+    assert second.count() == first.count()
+    second = HyperLogLog(precision=10)
+    second.update(range(2500, 7500))
+    first.merge(second)
+    assert abs(first.count() - 7500) < 7500 * 0.1
+
+
+def test_hyperloglog_ignores_other_precision():
+    sketch = HyperLogLog(precision=10, registers=bytes(16))
+    assert len(sketch.to_bytes()) == 1024
@@ -0,0 +1,50 @@
+import time
+
+import pytest
+
+from app.db.ids import MAX_WORKERS, IdGenerator, compose_id, id_at, id_time
+
+
+def test_ids_increase():
+    generator = IdGenerator(worker_id=3)
+    ids = [generator.next_id() for _ in range(10_000)]
+    assert ids == sorted(set(ids))
+    assert max(ids) < 2**53
+
+
+def test_ids_of_workers_differ():
+    first, second = IdGenerator(worker_id=0), IdGenerator(worker_id=MAX_WORKERS - 1)
+    ids = [first.next_id() for _ in range(1000)]
+    assert not set(ids) & {second.next_id() for _ in range(1000)}
+
+
+def test_ids_carry_time():
+    now = time.time()
+    id = IdGenerator().next_id()
+    assert id >= id_at(now)
+    assert abs(id_time(id) - now) < 1
+
+
+def test_compose_id():
+    now_ms = int(time.time() * 1000)
+    id = compose_id(now_ms, MAX_WORKERS - 1, 1)
+    assert id_time(id) == now_ms / 1000
+    assert compose_id(now_ms, MAX_WORKERS - 1, 0) < id
+    assert id < compose_id(now_ms + 1, 0, 0)
+
+
+@pytest.mark.asyncio
+async def test_claim_distinct_workers(test_session):
+    engine = test_session.bind.engine
+    first, second = IdGenerator(), IdGenerator()
+    await first.claim(engine)
+    await second.claim(engine)
+    try:
+        assert first.worker_id != second.worker_id
+    finally:
+        await first.release()
+        await second.release()
+    third = IdGenerator()
+    await third.claim(engine)
+    await third.release()
+    assert third.worker_id == first.worker_id
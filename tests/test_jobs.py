@@ -0,0 +1,77 @@
+import pytest
+from sqlalchemy.future import select
+
+from app.db.db_models import Outbox, Tweets
+from app.jobs import JobRunner, count_tweet, current_job
+from app.reshard import mirror_users
+
+
+@pytest.mark.asyncio
+async def test_job_retried_then_dead(test_session):
+    runner = JobRunner(max_attempts=2, backoff=0)
+    calls = []
+
+    @runner.handler("fail")
+    async def fail(session, shard, payload):
+        calls.append(payload)
+        raise ValueError("broken")
+
+    Outbox.add(test_session, "fail", {"n": 1})
+    await test_session.commit()
+
+    assert await runner.run_one(test_session)
+    job = (await test_session.execute(select(Outbox))).scalars().one()
+    await test_session.refresh(job)
+    assert job.attempts == 1
+    assert "broken" in job.last_error
+    assert job.run_at is not None
+
+    assert await runner.drain(test_session) == 1
+    await test_session.refresh(job)
+    assert job.attempts == 2
+    assert job.run_at is None
+    assert calls == [{"n": 1}, {"n": 1}]
+    assert not await runner.run_one(test_session)
+
+
+@pytest.mark.asyncio
+async def test_job_done_deleted(test_session):
+    runner = JobRunner()
+    calls = []
+
+    @runner.handler("ok")
+    async def ok(session, shard, payload):
+        calls.append(payload)
+
+    Outbox.add(test_session, "ok", {"n": 2})
+    await test_session.commit()
+    assert await runner.drain(test_session) == 1
+    assert calls == [{"n": 2}]
+    assert (await test_session.execute(select(Outbox))).scalars().all() == []
+
+
+@pytest.mark.asyncio
+async def test_count_tweet_once_per_job(
+    test_session, two_shards, shard_users, monkeypatch
+):
+    monkeypatch.setattr("app.jobs.shards", two_shards)
+    author_id = shard_users[1].id
+    async with two_shards.session_makers[1]() as shard_session:
+        await mirror_users(test_session, shard_session)
+        tweet = Tweets(content="Counted", author_id=author_id)
+        shard_session.add(tweet)
+        await shard_session.commit()
+        tweet_id = tweet.id
+
+    # The job of a reply on the home shard, delivered twice.
+    payload = {"tweet_id": tweet_id, "counter": "reply_count", "delta": 1}
+    for _ in range(2):
+        token = current_job.set(1)
+        await count_tweet(test_session, 0, payload)
+        current_job.reset(token)
+
+    async with two_shards.session_makers[1]() as shard_session:
+        res = await shard_session.execute(
+            select(Tweets.reply_count).filter_by(id=tweet_id)
+        )
+        assert res.scalar() == 1
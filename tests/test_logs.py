@@ -0,0 +1,48 @@
+import io
+import json
+import logging
+
+from logging_setup import JsonFormatter, SamplingFilter, request_id, setup_logging
+
+
+def make_record(level=logging.INFO, **extra):
+    record = logging.LogRecord("test", level, "", 0, "Message %s.", ("sent",), None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter():
+    token = request_id.set("abc")
+    try:
+        line = JsonFormatter().format(make_record(route="me", sample=0.5))
+    finally:
+        request_id.reset(token)
+    entry = json.loads(line)
+    assert entry["message"] == "Message sent."
+    assert entry["level"] == "INFO"
+    assert entry["request_id"] == "abc"
+    assert entry["route"] == "me"
+    assert "sample" not in entry
+
+
+def test_sampling_filter():
+    sampling = SamplingFilter()
+    assert sampling.filter(make_record())
+    assert not sampling.filter(make_record(sample=0))
+    assert sampling.filter(make_record(sample=1))
+    assert sampling.filter(make_record(logging.WARNING, sample=0))
+
+
+def test_setup_logging():
+    stream = io.StringIO()
+    root = logging.getLogger()
+    handlers, level = root.handlers, root.level
+    listener = setup_logging(stream)
+    try:
+        logging.getLogger("test").warning("Queued.", extra={"latency": 0.1})
+    finally:
+        listener.stop()
+        root.handlers, root.level = handlers, level
+    entry = json.loads(stream.getvalue())
+    assert entry["message"] == "Queued."
+    assert entry["latency"] == 0.1
@@ -1,20 +1,14 @@
-import os
-import shutil
-
 import pytest
 from sqlalchemy import func
 from sqlalchemy.future import select
 
 from app.db.db_models import Media, Users
+from app.jobs import jobs
+from app.purger import TweetPurger
 
 
-@pytest.mark.asyncio(scope="session")
-async def test_add_media_ok(test_client, test_session):
-    # tmp_path = "./media"
-    tmp_path = os.getenv('MEDIA_PATH')
-    if not os.path.exists(tmp_path):
-        os.makedirs(tmp_path)
-
+@pytest.mark.asyncio
+async def test_add_media_ok(test_client, test_session, media_path):
     user = (await test_session.execute(select(Users))).scalars().first()
     images_number = (
         await test_session.execute(select(func.count()).select_from(Media))
@@ -31,11 +25,10 @@ async def test_add_media_ok(test_client, test_session):
     assert response.json()["result"]
     assert "media_id" in response.json()
     assert new_images_number - images_number == 1
-
-    shutil.rmtree(tmp_path)
+    assert len(list(media_path.iterdir())) == 1
 
 
-@pytest.mark.asyncio(scope="session")
+@pytest.mark.asyncio
 async def test_add_media_fail(test_client, test_session):
     user = (await test_session.execute(select(Users))).scalars().first()
     files = {"file": open("tests/test_image.jpg", "rb")}
@@ -53,3 +46,26 @@ async def test_add_media_fail(test_client, test_session):
     response = await test_client.post("/medias", files=files, headers={"api-key": "46"})
     assert response.status_code == 401
     assert not response.json()["result"]
+
+
+@pytest.mark.asyncio
+async def test_purged_media_removed_ok(test_client, test_session, media_path):
+    user = (await test_session.execute(select(Users))).scalars().first()
+    headers = {"api-key": f"{user.api_key}"}
+    files = {"file": open("tests/test_image.jpg", "rb")}
+    response = await test_client.post("/medias", files=files, headers=headers)
+    media_id = response.json()["media_id"]
+    response = await test_client.post(
+        "/tweets",
+        headers=headers,
+        json={"tweet_data": "With media", "tweet_media_ids": [media_id]},
+    )
+    tweet_id = response.json()["tweet_id"]
+    response = await test_client.delete(f"/tweets/{tweet_id}", headers=headers)
+    assert response.status_code == 200
+
+    assert await TweetPurger().purge(test_session) >= 1
+    # The file outlives its row until the outbox job runs.
+    assert len(list(media_path.iterdir())) == 1
+    await jobs.drain(test_session)
+    assert list(media_path.iterdir()) == []
@@ -0,0 +1,30 @@
+import pytest
+from sqlalchemy.future import select
+
+from app.db.db_models import Users
+
+
+@pytest.mark.asyncio
+async def test_metrics_ok(test_client, test_session):
+    user = (await test_session.execute(select(Users))).scalars().first()
+    await test_client.get("/users/me", headers={"api-key": f"{user.api_key}"})
+    await test_client.get("/users/me", headers={"api-key": "46"})
+
+    response = await test_client.get("http://localhost/metrics")
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert any(
+        line.startswith('http_request_duration_seconds_count{method="GET",route="me"}')
+        for line in lines
+    )
+    queries = next(
+        line
+        for line in lines
+        if line.startswith('http_request_db_queries_sum{method="GET",route="me"}')
+    )
+    assert float(queries.split()[-1]) > 0
+    assert any(
+        line.startswith('twitter_errors_total{exception="TwitterWrongApiKeyException"}')
+        for line in lines
+    )
+    assert any(line.startswith("db_pool_checked_out") for line in lines)
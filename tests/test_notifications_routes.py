@@ -0,0 +1,133 @@
+import pytest
+from sqlalchemy.future import select
+
+from app.db.db_models import Notifications, Users
+from app.jobs import current_job, jobs, notify
+from app.reshard import mirror_users
+
+
+@pytest.mark.asyncio
+async def test_notifications_ok(test_client, test_session):
+    users = (
+        (await test_session.execute(select(Users).order_by(Users.id))).scalars().all()
+    )
+    # Read before drain, which commits the session.
+    author_id, fan_id, other_id, last_id = [user.id for user in users]
+    author_key, fan_key, other_key, last_key = [user.api_key for user in users]
+    handle = users[1].name.replace(" ", "")
+    response = await test_client.post(
+        "/tweets",
+        headers={"api-key": author_key},
+        json={"tweet_data": f"Hello @{handle}"},
+    )
+    tweet_id = response.json()["tweet_id"]
+    for key in (fan_key, other_key):
+        response = await test_client.post(
+            f"/tweets/{tweet_id}/likes", headers={"api-key": key}
+        )
+        assert response.status_code == 201
+    response = await test_client.post(
+        f"/users/{author_id}/follow", headers={"api-key": fan_key}
+    )
+    assert response.status_code == 201
+    await jobs.drain(test_session)
+
+    response = await test_client.get("/notifications", headers={"api-key": author_key})
+    assert response.status_code == 200
+    notifications = response.json()["notifications"]
+    assert [item["kind"] for item in notifications] == ["follow", "like"]
+    follow, like = notifications
+    assert follow["actor"]["id"] == fan_id and follow["tweet_id"] is None
+    assert like["actor"]["id"] == other_id and like["others"] == 1
+    assert like["tweet_id"] == tweet_id
+    assert response.json()["unread"] == 2
+
+    response = await test_client.get(
+        "/notifications", headers={"api-key": author_key}, params={"limit": 1}
+    )
+    cursor = response.json()["next_cursor"]
+    assert cursor == follow["id"]
+    response = await test_client.get(
+        "/notifications",
+        headers={"api-key": author_key},
+        params={"limit": 1, "cursor": cursor},
+    )
+    assert [item["id"] for item in response.json()["notifications"]] == [like["id"]]
+
+    response = await test_client.get("/notifications", headers={"api-key": fan_key})
+    mention = response.json()["notifications"]
+    assert [(item["kind"], item["actor"]["id"]) for item in mention] == [
+        ("mention", author_id)
+    ]
+
+    response = await test_client.post(
+        "/notifications/read",
+        headers={"api-key": author_key},
+        params={"until": like["id"]},
+    )
+    assert response.json()["unread"] == 1
+    # A read notification no longer collects new likes.
+    await test_client.post(f"/tweets/{tweet_id}/likes", headers={"api-key": last_key})
+    await jobs.drain(test_session)
+    response = await test_client.get(
+        "/notifications/unread", headers={"api-key": author_key}
+    )
+    assert response.json()["unread"] == 2
+
+    response = await test_client.post(
+        "/notifications/read", headers={"api-key": author_key}
+    )
+    assert response.json()["unread"] == 0
+
+    # Following oneself notifies nobody.
+    response = await test_client.post(
+        f"/users/{last_id}/follow", headers={"api-key": last_key}
+    )
+    assert response.status_code == 201
+    await jobs.drain(test_session)
+    response = await test_client.get("/notifications", headers={"api-key": last_key})
+    assert response.json()["notifications"] == []
+
+
+@pytest.mark.asyncio
+async def test_notifications_fail(test_client):
+    response = await test_client.get("/notifications", headers={})
+    assert response.status_code == 422
+    assert not response.json()["result"]
+
+    response = await test_client.get("/notifications", headers={"api-key": "46"})
+    assert response.status_code == 401
+    assert not response.json()["result"]
+
+
+@pytest.mark.asyncio
+async def test_notify_once_per_job(test_session, two_shards, shard_users, monkeypatch):
+    monkeypatch.setattr("app.jobs.shards", two_shards)
+    liker, recipient = shard_users
+    liker_id, recipient_id = liker.id, recipient.id
+    other_id = (
+        (await test_session.execute(select(Users.id).order_by(Users.id)))
+        .scalars()
+        .first()
+    )
+    async with two_shards.session_makers[1]() as shard_session:
+        await mirror_users(test_session, shard_session)
+
+    # The retry of the first job comes after another actor's like.
+    for job_id, actor_id in ((1, liker_id), (2, other_id), (1, liker_id)):
+        token = current_job.set(job_id)
+        await notify(
+            test_session,
+            0,
+            {"user_id": recipient_id, "kind": "like", "actor_id": actor_id},
+        )
+        current_job.reset(token)
+
+    async with two_shards.session_makers[1]() as shard_session:
+        notification = (
+            await shard_session.execute(
+                select(Notifications).filter_by(user_id=recipient_id)
+            )
+        ).scalar_one()
+        assert (notification.actor_id, notification.actor_count) == (other_id, 2)
+        assert await Notifications.get_unread(shard_session, recipient_id) == 1
@@ -0,0 +1,134 @@
+import json
+from collections import Counter
+
+import pytest
+from sqlalchemy import func, text
+from sqlalchemy.future import select
+
+from app.db.db_models import Likes, Tweets, Users
+from app.db.shards import ShardRouter, jump_hash
+from app.reshard import MAX_PARAMETERS, mirror_users, move_tweets, reshard
+
+
+def test_jump_hash_balanced():
+    counts = Counter(jump_hash(key, 4) for key in range(10_000))
+    assert sorted(counts) == [0, 1, 2, 3]
+    assert min(counts.values()) > 2000
+
+
+def test_jump_hash_moves_keys_to_new_shard_only():
+    for key in range(10_000):
+        old, new = jump_hash(key, 4), jump_hash(key, 5)
+        assert new in (old, 4)
+
+
+def test_merge_pages():
+    pages = [[9, 6, 2], [8, 7, 1], []]
+    merged = ShardRouter.merge(pages, lambda row: row, 1, 3)
+    assert merged == [(1, 8), (1, 7), (0, 6)]
+
+
+@pytest.mark.asyncio
+async def test_two_shards_ok(test_client, test_session, two_shards, shard_users):
+    home_user, shard_user = shard_users
+    home_key, shard_key = home_user.api_key, shard_user.api_key
+    async with two_shards.session_makers[1]() as shard_session:
+        await mirror_users(test_session, shard_session)
+        mirrored = (await shard_session.execute(select(Users.id))).scalars().all()
+    home_ids = (await test_session.execute(select(Users.id))).scalars().all()
+    assert sorted(mirrored) == sorted(home_ids)
+
+    tweet_ids = []
+    for key in (home_key, shard_key, home_key, shard_key):
+        response = await test_client.post(
+            "/tweets",
+            headers={"api-key": key},
+            json={"tweet_data": "Sharded tweet", "tweet_media_ids": []},
+        )
+        assert response.status_code == 201
+        tweet_ids.append(response.json()["tweet_id"])
+    assert await two_shards.locate_tweet(test_session, tweet_ids[0]) == (
+        0,
+        home_user.id,
+    )
+    assert await two_shards.locate_tweet(test_session, tweet_ids[1]) == (
+        1,
+        shard_user.id,
+    )
+    assert await two_shards.locate_tweet(test_session, 46) is None
+
+    # The offset applies to the merged feed, not to each shard.
+    response = await test_client.get(
+        "/tweets",
+        headers={"api-key": home_key},
+        params={"offset": 1, "limit": 2, "history": True},
+    )
+    assert response.status_code == 200
+    newest = sorted(tweet_ids, reverse=True)
+    assert [tweet["id"] for tweet in response.json()["tweets"]] == newest[1:3]
+
+    response = await test_client.get("/users/me/export", headers={"api-key": shard_key})
+    assert response.status_code == 200
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(
+        record["id"] for record in records if record["type"] == "tweet"
+    ) == sorted(tweet_ids[1::2])
+
+
+@pytest.mark.asyncio
+async def test_reshard_ok(test_session, two_shards, shard_users):
+    home_user, shard_user = shard_users
+    # Written while there was one shard, so kept on the home one.
+    tweet = Tweets(content="Before resharding", author_id=shard_user.id)
+    test_session.add(tweet)
+    await test_session.commit()
+    tweet_id = tweet.id
+
+    await reshard(1, two_shards)
+    assert await two_shards.locate_tweet(test_session, tweet_id) == (
+        1,
+        shard_user.id,
+    )
+    home = await test_session.execute(select(Tweets.id).filter_by(id=tweet_id))
+    assert home.first() is None
+    async with two_shards.session_makers[1]() as shard_session:
+        res = await shard_session.execute(select(Users.id).filter_by(id=home_user.id))
+        assert res.scalar() == home_user.id
+
+
+@pytest.mark.asyncio
+async def test_move_tweet_with_many_likes(test_session, two_shards, shard_users):
+    shard_user = shard_users[1]
+    tweet = Tweets(content="Popular tweet", author_id=shard_user.id)
+    test_session.add(tweet)
+    await test_session.commit()
+    tweet_id = tweet.id
+    # More likes than one insert of both columns can bind.
+    count = MAX_PARAMETERS // 2 + 100
+    await test_session.execute(
+        text(
+            "INSERT INTO users (id, name, api_key) "
+            "SELECT n, 'Liker ' || n, 'liker' || n FROM generate_series(1, :count) n"
+        ),
+        {"count": count},
+    )
+    await test_session.execute(
+        text(
+            "INSERT INTO likes (users, tweets) "
+            "SELECT n, :tweet_id FROM generate_series(1, :count) n"
+        ),
+        {"tweet_id": tweet_id, "count": count},
+    )
+    await test_session.commit()
+
+    async with two_shards.session_makers[1]() as shard_session:
+        await mirror_users(test_session, shard_session)
+        assert await move_tweets(test_session, shard_session, shard_user.id) == 1
+        res = await shard_session.execute(
+            select(func.count()).select_from(Likes).filter_by(tweets=tweet_id)
+        )
+        assert res.scalar() == count
+    res = await test_session.execute(
+        select(func.count()).select_from(Likes).filter_by(tweets=tweet_id)
+    )
+    assert res.scalar() == 0
@@ -0,0 +1,125 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.future import select
+
+from app.db.db_models import Tweets, Users
+from app.reshard import mirror_users
+from app.threads import build_thread, load_ancestors, load_replies
+
+
+def tweet(id, parent_id):
+    return SimpleNamespace(id=id, parent_id=parent_id)
+
+
+def test_build_thread_order():
+    tweets = [tweet(5, 1), tweet(2, 1), tweet(3, 2), tweet(4, 3), tweet(6, 2)]
+    thread = build_thread(1, [(0, t) for t in tweets] + [(0, tweet(3, 2))])
+    assert [(t.id, level) for _, t, level in thread] == [
+        (2, 1),
+        (3, 2),
+        (4, 3),
+        (6, 2),
+        (5, 1),
+    ]
+
+
+def test_build_thread_limits():
+    tweets = [(0, tweet(id, 1)) for id in range(2, 6)]
+    tweets += [(1, tweet(id, 2)) for id in range(10, 14)]
+    thread = build_thread(1, tweets, depth=2, width=2, limit=3, max_tweets=4)
+    # Direct replies are kept first, breadth first.
+    assert [(t.id, level) for _, t, level in thread] == [
+        (2, 1),
+        (10, 2),
+        (3, 1),
+        (4, 1),
+    ]
+    thread = build_thread(1, tweets, depth=1)
+    assert [t.id for _, t, _ in thread] == [2, 3, 4, 5]
+
+
+async def add_chain(test_session, two_shards, shard_users, length):
+    """
+    Adds a chain of replies whose authors alternate between the shards,
+    returns tweet ids from the root down.
+    """
+    async with two_shards.session_makers[1]() as shard_session:
+        await mirror_users(test_session, shard_session)
+        sessions = [test_session, shard_session]
+        ids = []
+        for level in range(length):
+            shard = level % 2
+            tweet = Tweets(
+                content=f"Level {level}",
+                author_id=shard_users[shard].id,
+                parent_id=ids[-1] if ids else None,
+                reply_count=int(level < length - 1),
+            )
+            sessions[shard].add(tweet)
+            await sessions[shard].commit()
+            ids.append(tweet.id)
+    return ids
+
+
+@pytest.mark.asyncio
+async def test_thread_across_shards(test_session, two_shards, shard_users):
+    root, first, nested, deep = await add_chain(
+        test_session, two_shards, shard_users, 4
+    )
+
+    # Every round follows the chain as far as it stays on one shard.
+    chain = await load_ancestors(test_session, two_shards, deep)
+    assert [(shard, tweet.id) for shard, tweet in chain] == [
+        (1, deep),
+        (0, nested),
+        (1, first),
+        (0, root),
+    ]
+    chain = await load_ancestors(test_session, two_shards, deep, depth=1)
+    assert [tweet.id for _, tweet in chain] == [deep, nested]
+
+    # Replies below a level are fetched again from the other shards.
+    thread = await load_replies(test_session, two_shards, root)
+    assert [(shard, tweet.id, level) for shard, tweet, level in thread] == [
+        (1, first, 1),
+        (0, nested, 2),
+        (1, deep, 3),
+    ]
+    thread = await load_replies(test_session, two_shards, root, depth=2)
+    assert [tweet.id for _, tweet, _ in thread] == [first, nested]
+
+
+@pytest.mark.asyncio
+async def test_replies_bounded(test_session):
+    user = (await test_session.execute(select(Users))).scalars().first()
+    root = Tweets(content="Root", author_id=user.id)
+    test_session.add(root)
+    await test_session.commit()
+    # Three replies to every tweet, three levels deep, added breadth first.
+    levels = [[root.id]]
+    for level in range(1, 4):
+        replies = [
+            Tweets(content=f"Level {level}", author_id=user.id, parent_id=parent)
+            for parent in levels[-1]
+            for _ in range(3)
+        ]
+        test_session.add_all(replies)
+        await test_session.commit()
+        levels.append([reply.id for reply in replies])
+    expected = [(id, level) for level in range(1, 4) for id in sorted(levels[level])]
+
+    rows = await Tweets.get_replies(test_session, [root.id], depth=3, width=3)
+    assert [(tweet.id, level) for tweet, level in rows] == expected
+    for max_tweets in (3, 5, 20):
+        rows = await Tweets.get_replies(
+            test_session, [root.id], depth=3, width=3, max_tweets=max_tweets
+        )
+        assert [(t.id, level) for t, level in rows] == expected[:max_tweets]
+    rows = await Tweets.get_replies(
+        test_session, [root.id], depth=3, width=3, limit=2, max_tweets=4
+    )
+    assert [(t.id, level) for t, level in rows] == [
+        *expected[:2],
+        *[(id, 2) for id in sorted(levels[2])[:2]],
+    ]
@@ -1,11 +1,43 @@
+import json
+
 import pytest
+from sqlalchemy import text
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 
-from app.db.db_models import Tweets, Users
+from app.db.db_models import (
+    PARTITIONS_AHEAD,
+    Hashtags,
+    Media,
+    Tweets,
+    Users,
+    partition_bounds,
+    partition_index,
+)
+from app.impressions import impressions
+from app.jobs import jobs
+from app.partitions import PartitionManager
+from app.purger import TweetPurger
+
+
+async def get_user_tweets(test_session, user):
+    """
+    Returns live tweets of given user, newest first.
+    """
+    return (
+        (
+            await test_session.execute(
+                select(Tweets)
+                .filter(Tweets.author_id == user.id, Tweets.live())
+                .order_by(Tweets.id.desc())
+            )
+        )
+        .scalars()
+        .all()
+    )
 
 
-@pytest.mark.asyncio(scope="session")
+@pytest.mark.asyncio
 async def test_add_tweet_ok(test_client, test_session):
     user = (await test_session.execute(select(Users))).scalars().first()
     request_data = {"tweet_data": "Test tweet message", "tweet_media_ids": []}
@@ -30,7 +62,7 @@ async def test_add_tweet_ok(test_client, test_session):
     assert tweet.content == request_data["tweet_data"]
 
 
-@pytest.mark.asyncio(scope="session")
+@pytest.mark.asyncio
 async def test_add_tweet_fail(test_client, test_session):
     user = (await test_session.execute(select(Users))).scalars().first()
     request_data = {"tweet_data": "Test tweet message", "tweet_media_ids": []}
@@ -50,11 +82,10 @@ async def test_add_tweet_fail(test_client, test_session):
     assert not response.json()["result"]
 
 
-@pytest.mark.asyncio(scope="session")
-async def test_delete_tweet_ok(test_client, test_session):
+@pytest.mark.asyncio
+async def test_delete_tweet_ok(test_client, test_session, tweet_id):
     user = (await test_session.execute(select(Users))).scalars().first()
-    tweet_number = len(user.tweets)
-    tweet_id = user.tweets[0].id
+    tweet_number = len(await get_user_tweets(test_session, user))
 
     response = await test_client.delete(
         f"/tweets/{tweet_id}", headers={"api-key": f"{user.api_key}"}
@@ -62,21 +93,29 @@ async def test_delete_tweet_ok(test_client, test_session):
     assert response.status_code == 200
     assert response.json()["result"]
 
-    await test_session.refresh(user)
-    new_tweet_number = len(user.tweets)
+    new_tweet_number = len(await get_user_tweets(test_session, user))
     assert tweet_number - new_tweet_number == 1
 
+    response = await test_client.get("/tweets", headers={"api-key": f"{user.api_key}"})
+    assert tweet_id not in [tweet["id"] for tweet in response.json()["tweets"]]
+    response = await test_client.delete(
+        f"/tweets/{tweet_id}", headers={"api-key": f"{user.api_key}"}
+    )
+    assert response.status_code == 404
+
+    assert await TweetPurger().purge(test_session) >= 1
+    res = await test_session.execute(select(Tweets.id).filter(Tweets.id == tweet_id))
+    assert res.scalar_one_or_none() is None
 
-@pytest.mark.asyncio(scope="session")
-async def test_delete_tweet_fail(test_client, test_session):
-    await test_add_tweet_ok(test_client, test_session)
+
+@pytest.mark.asyncio
+async def test_delete_tweet_fail(test_client, test_session, tweet_id):
     user = (await test_session.execute(select(Users))).scalars().first()
     other_user = (
         (await test_session.execute(select(Users).order_by(Users.id.desc())))
         .scalars()
         .first()
     )
-    tweet_id = user.tweets[0].id
 
     response = await test_client.delete(f"/tweets/{tweet_id}", headers={})
     assert response.status_code == 422
@@ -107,10 +146,127 @@ async def test_delete_tweet_fail(test_client, test_session):
     assert not response.json()["result"]
 
 
-@pytest.mark.asyncio(scope="session")
-async def test_like_tweet_ok(test_client, test_session):
+@pytest.mark.asyncio
+async def test_import_tweets_ok(test_client, test_session):
+    user = (await test_session.execute(select(Users))).scalars().first()
+    lines = [
+        json.dumps({"tweet_data": "Imported #history tweet"}),
+        "",
+        "not json",
+        json.dumps({"tweet_media_ids": []}),
+        json.dumps({"tweet_data": "With media", "tweet_media_ids": [46000]}),
+        json.dumps({"tweet_data": "Second imported tweet"}),
+    ]
+    response = await test_client.post(
+        "/tweets/import",
+        headers={"api-key": f"{user.api_key}"},
+        content="\n".join(lines).encode(),
+    )
+    assert response.status_code == 200
+    assert response.json()["result"]
+    assert response.json()["imported"] == 2
+    assert response.json()["failed"] == 3
+    assert [error["line"] for error in response.json()["errors"]] == [3, 4, 5]
+
+    tweets = await get_user_tweets(test_session, user)
+    assert [tweet.content for tweet in tweets[:2]] == [
+        "Second imported tweet",
+        "Imported #history tweet",
+    ]
+    tags = (
+        (
+            await test_session.execute(
+                select(Hashtags.tag).filter_by(tweet_id=tweets[1].id)
+            )
+        )
+        .scalars()
+        .all()
+    )
+    assert tags == ["history"]
+
+
+@pytest.mark.asyncio
+async def test_import_attached_media(test_client, test_session, tweet_id):
+    user = (await test_session.execute(select(Users))).scalars().first()
+    attached = Media(filename="attached.png", tweet_id=tweet_id)
+    free = Media(filename="free.png")
+    test_session.add_all([attached, free])
+    await test_session.commit()
+    attached_id, free_id = attached.id, free.id
+    lines = [
+        json.dumps({"tweet_data": "Taken media", "tweet_media_ids": [attached_id]}),
+        json.dumps({"tweet_data": "Free media", "tweet_media_ids": [free_id]}),
+        json.dumps({"tweet_data": "Same media", "tweet_media_ids": [free_id]}),
+    ]
+    response = await test_client.post(
+        "/tweets/import",
+        headers={"api-key": f"{user.api_key}"},
+        content="\n".join(lines).encode(),
+    )
+    assert response.status_code == 200
+    assert response.json()["imported"] == 1
+    assert response.json()["errors"] == [
+        {"line": 1, "error": "Media already attached."},
+        {"line": 3, "error": "Media already attached."},
+    ]
+    res = await test_session.execute(
+        select(Media.id, Media.tweet_id).filter(Media.id.in_([attached_id, free_id]))
+    )
+    owners = dict(res.tuples().all())
+    assert owners[attached_id] == tweet_id
+    tweets = await get_user_tweets(test_session, user)
+    assert owners[free_id] == tweets[0].id
+    assert tweets[0].content == "Free media"
+
+
+@pytest.mark.asyncio
+async def test_import_long_line(test_client, test_session, monkeypatch):
+    monkeypatch.setattr("routers.tweets.IMPORT_BATCH_SIZE", 1)
+    monkeypatch.setattr("routers.tweets.IMPORT_MAX_LINE", 100)
+    user = (await test_session.execute(select(Users))).scalars().first()
+    long_tweet = json.dumps({"tweet_data": "Long " * 50}).encode()
+
+    async def body():
+        yield json.dumps({"tweet_data": "Committed tweet"}).encode() + b"\n"
+        # The long line spans chunks before its line break.
+        yield long_tweet[:150]
+        yield long_tweet[150:] + b"\n"
+        yield json.dumps({"tweet_data": "After long line"}).encode() + b"\n"
+        yield long_tweet
+
+    response = await test_client.post(
+        "/tweets/import", headers={"api-key": f"{user.api_key}"}, content=body()
+    )
+    assert response.status_code == 200
+    assert response.json()["imported"] == 2
+    assert response.json()["failed"] == 2
+    assert response.json()["errors"] == [
+        {"line": 2, "error": "Line too long."},
+        {"line": 4, "error": "Line too long."},
+    ]
+    tweets = await get_user_tweets(test_session, user)
+    assert [tweet.content for tweet in tweets[:2]] == [
+        "After long line",
+        "Committed tweet",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_import_tweets_fail(test_client, test_session):
+    response = await test_client.post("/tweets/import", content=b"")
+    assert response.status_code == 422
+    assert not response.json()["result"]
+
+    response = await test_client.post(
+        "/tweets/import", headers={"api-key": "46"}, content=b""
+    )
+    assert response.status_code == 401
+    assert not response.json()["result"]
+
+
+@pytest.mark.asyncio
+async def test_like_tweet_ok(test_client, test_session, tweet_id):
     user = (await test_session.execute(select(Users))).scalars().first()
-    tweet_id = user.tweets[0].id
     tweet = (
         (
             await test_session.execute(
@@ -131,13 +287,13 @@ async def test_like_tweet_ok(test_client, test_session):
     await test_session.refresh(tweet)
     assert response.status_code == 201
     assert response.json()["result"]
-    assert user in tweet.likes
+    assert user in await tweet.awaitable_attrs.likes
+    assert tweet.like_count == 1
 
 
-@pytest.mark.asyncio(scope="session")
-async def test_like_tweet_fail(test_client, test_session):
+@pytest.mark.asyncio
+async def test_like_tweet_fail(test_client, test_session, tweet_id):
     user = (await test_session.execute(select(Users))).scalars().first()
-    tweet_id = user.tweets[0].id
 
     response = await test_client.post(f"/tweets/{tweet_id}/likes", headers={})
     assert response.status_code == 422
@@ -155,6 +311,11 @@ async def test_like_tweet_fail(test_client, test_session):
     assert response.status_code == 404
     assert not response.json()["result"]
 
+    response = await test_client.post(
+        f"/tweets/{tweet_id}/likes", headers={"api-key": f"{user.api_key}"}
+    )
+    assert response.status_code == 201
+
     response = await test_client.post(
         f"/tweets/{tweet_id}/likes", headers={"api-key": f"{user.api_key}"}
     )
@@ -168,16 +329,15 @@ async def test_like_tweet_fail(test_client, test_session):
     assert not response.json()["result"]
 
 
-@pytest.mark.asyncio(scope="session")
-async def test_unlike_tweet_ok(test_client, test_session):
+@pytest.mark.asyncio
+async def test_unlike_tweet_ok(test_client, test_session, liked_tweet_id):
     user = (await test_session.execute(select(Users))).scalars().first()
-    tweet_id = user.tweets[0].id
     tweet = (
         (
             await test_session.execute(
                 select(Tweets)
                 .options(selectinload(Tweets.likes))
-                .filter(Tweets.id == tweet_id)
+                .filter(Tweets.id == liked_tweet_id)
             )
         )
         .unique()
@@ -187,18 +347,18 @@ async def test_unlike_tweet_ok(test_client, test_session):
     assert user in tweet.likes
 
     response = await test_client.delete(
-        f"/tweets/{tweet_id}/likes", headers={"api-key": f"{user.api_key}"}
+        f"/tweets/{liked_tweet_id}/likes", headers={"api-key": f"{user.api_key}"}
     )
     await test_session.refresh(tweet)
     assert response.status_code == 200
     assert response.json()["result"]
-    assert user not in tweet.likes
+    assert user not in await tweet.awaitable_attrs.likes
+    assert tweet.like_count == 0
 
 
-@pytest.mark.asyncio(scope="session")
-async def test_unlike_tweet_fail(test_client, test_session):
+@pytest.mark.asyncio
+async def test_unlike_tweet_fail(test_client, test_session, tweet_id):
     user = (await test_session.execute(select(Users))).scalars().first()
-    tweet_id = user.tweets[0].id
 
     response = await test_client.delete(f"/tweets/{tweet_id}/likes", headers={})
     assert response.status_code == 422
@@ -229,12 +389,390 @@ async def test_unlike_tweet_fail(test_client, test_session):
     assert not response.json()["result"]
 
 
-@pytest.mark.asyncio(scope="session")
-async def test_all_tweets_ok(test_client, test_session):
+@pytest.mark.asyncio
+async def test_all_tweets_ok(test_client, test_session, tweet_id):
     user = (await test_session.execute(select(Users))).scalars().first()
-    tweet_id = user.tweets[0].id
 
     response = await test_client.get("/tweets", headers={"api-key": f"{user.api_key}"})
     assert response.status_code == 200
     assert response.json()["result"]
     assert tweet_id == response.json()["tweets"][0]["id"]
+
+
+@pytest.mark.asyncio
+async def test_all_tweets_likes_ok(test_client, test_session, liked_tweet_id):
+    user = (await test_session.execute(select(Users))).scalars().first()
+
+    response = await test_client.get(
+        "/tweets",
+        headers={"api-key": f"{user.api_key}"},
+        params={"offset": 0, "limit": 1},
+    )
+    assert response.status_code == 200
+    tweets = response.json()["tweets"]
+    assert len(tweets) == 1
+    assert tweets[0]["id"] == liked_tweet_id
+    assert tweets[0]["like_count"] == 1
+    assert tweets[0]["liked_by_me"]
+    assert tweets[0]["likes"] == [{"user_id": user.id, "name": user.name}]
+
+
+@pytest.mark.asyncio
+async def test_all_tweets_normalized_ok(test_client, test_session, liked_tweet_id):
+    user = (await test_session.execute(select(Users))).scalars().first()
+
+    response = await test_client.get(
+        "/tweets", headers={"api-key": f"{user.api_key}"}, params={"normalized": True}
+    )
+    assert response.status_code == 200
+    assert response.json()["result"]
+    tweet = response.json()["tweets"][0]
+    users = response.json()["users"]
+    assert tweet["id"] == liked_tweet_id
+    assert tweet["author_id"] == user.id
+    assert tweet["likes"] == [user.id]
+    assert users[str(user.id)] == {"id": user.id, "name": user.name}
+    referenced = {tweet["author_id"] for tweet in response.json()["tweets"]}
+    assert {int(id) for id in users} >= referenced
+
+
+@pytest.mark.asyncio
+async def test_all_tweets_fields_ok(test_client, test_session, tweet_id):
+    user = (await test_session.execute(select(Users))).scalars().first()
+
+    response = await test_client.get(
+        "/tweets",
+        headers={"api-key": f"{user.api_key}"},
+        params={"fields": "content,author"},
+    )
+    assert response.status_code == 200
+    assert response.json()["result"]
+    for tweet in response.json()["tweets"]:
+        assert set(tweet) == {"id", "content", "author"}
+
+    response = await test_client.get(
+        "/tweets",
+        headers={"api-key": f"{user.api_key}"},
+        params={"fields": "password"},
+    )
+    assert response.status_code == 422
+    assert not response.json()["result"]
+
+
+@pytest.mark.asyncio
+async def test_all_tweets_views_ok(test_client, test_session, tweet_id):
+    users = (await test_session.execute(select(Users))).scalars().all()
+    tweet_id = (await get_user_tweets(test_session, users[0]))[0].id
+    params = {"limit": 1, "fields": "views,viewers"}
+
+    for user in (users[0], users[0], users[1]):
+        response = await test_client.get(
+            "/tweets", headers={"api-key": f"{user.api_key}"}, params=params
+        )
+        assert response.status_code == 200
+    await impressions.flush(test_session)
+
+    response = await test_client.get(
+        "/tweets", headers={"api-key": f"{users[0].api_key}"}, params=params
+    )
+    assert response.json()["tweets"] == [{"id": tweet_id, "views": 3, "viewers": 2}]
+
+
+@pytest.mark.asyncio
+async def test_tweet_likers_ok(test_client, test_session, liked_tweet_id):
+    user = (await test_session.execute(select(Users))).scalars().first()
+
+    response = await test_client.get(
+        f"/tweets/{liked_tweet_id}/likes",
+        headers={"api-key": f"{user.api_key}"},
+        params={"limit": 1},
+    )
+    assert response.status_code == 200
+    assert response.json()["result"]
+    assert response.json()["users"] == [{"user_id": user.id, "name": user.name}]
+    assert response.json()["next_cursor"] == user.id
+
+    response = await test_client.get(
+        f"/tweets/{liked_tweet_id}/likes",
+        headers={"api-key": f"{user.api_key}"},
+        params={"cursor": user.id},
+    )
+    assert response.status_code == 200
+    assert response.json()["users"] == []
+    assert response.json()["next_cursor"] is None
+
+
+@pytest.mark.asyncio
+async def test_tweet_likers_fail(test_client, test_session):
+    user = (await test_session.execute(select(Users))).scalars().first()
+
+    response = await test_client.get("/tweets/46/likes", headers={})
+    assert response.status_code == 422
+    assert not response.json()["result"]
+
+    response = await test_client.get("/tweets/46/likes", headers={"api-key": "46"})
+    assert response.status_code == 401
+    assert not response.json()["result"]
+
+    response = await test_client.get(
+        "/tweets/46/likes", headers={"api-key": f"{user.api_key}"}
+    )
+    assert response.status_code == 404
+    assert not response.json()["result"]
+
+    response = await test_client.get(
+        "/tweets/46/likes",
+        headers={"api-key": f"{user.api_key}"},
+        params={"limit": 0},
+    )
+    assert response.status_code == 422
+    assert not response.json()["result"]
+
+
+@pytest.mark.asyncio
+async def test_search_tweets_ok(test_client, test_session, tweet_id):
+    user = (await test_session.execute(select(Users))).scalars().first()
+
+    response = await test_client.get(
+        "/tweets/search",
+        headers={"api-key": f"{user.api_key}"},
+        params={"q": "messages"},
+    )
+    assert response.status_code == 200
+    assert response.json()["result"]
+    found = {tweet["id"]: tweet for tweet in response.json()["tweets"]}
+    assert tweet_id in found
+    assert "<b>message</b>" in found[tweet_id]["headline"]
+
+    response = await test_client.get(
+        "/tweets/search",
+        headers={"api-key": f"{user.api_key}"},
+        params={"q": "nonexistentword"},
+    )
+    assert response.status_code == 200
+    assert response.json()["tweets"] == []
+
+
+@pytest.mark.asyncio
+async def test_search_tweets_fail(test_client, test_session):
+    user = (await test_session.execute(select(Users))).scalars().first()
+
+    response = await test_client.get("/tweets/search", params={"q": "test"})
+    assert response.status_code == 422
+    assert not response.json()["result"]
+
+    response = await test_client.get(
+        "/tweets/search", headers={"api-key": "46"}, params={"q": "test"}
+    )
+    assert response.status_code == 401
+    assert not response.json()["result"]
+
+    response = await test_client.get(
+        "/tweets/search", headers={"api-key": f"{user.api_key}"}
+    )
+    assert response.status_code == 422
+    assert not response.json()["result"]
+
+
+@pytest.mark.asyncio
+async def test_partitions_ok(test_client, test_session, tweet_id):
+    user = (await test_session.execute(select(Users))).scalars().first()
+    current = partition_index((await get_user_tweets(test_session, user))[0].id)
+    manager = PartitionManager(hot=1)
+    await manager.maintain(test_session)
+    assert manager.since == partition_bounds(current)[0]
+    assert await manager._attached(test_session, "likes") == list(
+        range(current, current + PARTITIONS_AHEAD + 1)
+    )
+
+    await manager.archive(test_session, current + PARTITIONS_AHEAD)
+    assert await manager._attached(test_session, "tweets") == list(
+        range(current, current + PARTITIONS_AHEAD)
+    )
+    res = await test_session.execute(
+        text("SELECT to_regclass(:name)"),
+        {"name": f"archive.tweets_p{current + PARTITIONS_AHEAD}"},
+    )
+    assert res.scalar() is not None
+
+    response = await test_client.get(
+        "/tweets", headers={"api-key": f"{user.api_key}"}, params={"history": True}
+    )
+    assert response.status_code == 200
+    assert response.json()["tweets"]
+
+
+@pytest.mark.asyncio
+async def test_thread_ok(test_client, test_session):
+    # Read before drain, which commits the session.
+    author, fan, other, _ = [
+        user.api_key
+        for user in (
+            await test_session.execute(select(Users).order_by(Users.id))
+        ).scalars()
+    ]
+
+    async def reply(key, parent_id, text):
+        response = await test_client.post(
+            "/tweets",
+            headers={"api-key": key},
+            json={"tweet_data": text, "parent_id": parent_id},
+        )
+        assert response.status_code == 201
+        return response.json()["tweet_id"]
+
+    root = await reply(author, None, "Root")
+    first = await reply(fan, root, "First")
+    nested = await reply(author, first, "Nested")
+    deep = await reply(other, nested, "Deep")
+    second = await reply(other, root, "Second")
+    await jobs.drain(test_session)
+
+    response = await test_client.get(
+        f"/tweets/{root}/thread", headers={"api-key": author}
+    )
+    assert response.status_code == 200
+    thread = response.json()
+    assert thread["tweet"]["id"] == root and thread["tweet"]["reply_count"] == 2
+    assert thread["ancestors"] == []
+    assert [(item["id"], item["level"]) for item in thread["replies"]] == [
+        (first, 1),
+        (nested, 2),
+        (deep, 3),
+        (second, 1),
+    ]
+
+    response = await test_client.get(
+        f"/tweets/{root}/thread",
+        headers={"api-key": author},
+        params={"limit": 1, "depth": 2},
+    )
+    thread = response.json()
+    assert [item["id"] for item in thread["replies"]] == [first, nested]
+    assert thread["next_cursor"] == first
+    response = await test_client.get(
+        f"/tweets/{root}/thread",
+        headers={"api-key": author},
+        params={"limit": 1, "cursor": first},
+    )
+    assert [item["id"] for item in response.json()["replies"]] == [second]
+
+    response = await test_client.get(
+        f"/tweets/{deep}/thread", headers={"api-key": author}
+    )
+    thread = response.json()
+    assert [item["id"] for item in thread["ancestors"]] == [root, first, nested]
+    assert thread["replies"] == []
+
+    response = await test_client.delete(
+        f"/tweets/{nested}", headers={"api-key": author}
+    )
+    assert response.status_code == 200
+    await jobs.drain(test_session)
+    response = await test_client.get(
+        f"/tweets/{deep}/thread", headers={"api-key": author}
+    )
+    thread = response.json()
+    assert [item["id"] for item in thread["ancestors"]] == [root, first]
+    assert thread["ancestors"][1]["reply_count"] == 0
+
+
+@pytest.mark.asyncio
+async def test_thread_fail(test_client, test_session):
+    user = (await test_session.execute(select(Users))).scalars().first()
+    response = await test_client.get(
+        "/tweets/46046/thread", headers={"api-key": user.api_key}
+    )
+    assert response.status_code == 404
+    assert not response.json()["result"]
+
+    response = await test_client.post(
+        "/tweets",
+        headers={"api-key": user.api_key},
+        json={"tweet_data": "Reply", "parent_id": 46046},
+    )
+    assert response.status_code == 404
+    assert not response.json()["result"]
+
+
+@pytest.mark.asyncio
+async def test_retweet_ok(test_client, test_session):
+    users = (
+        (await test_session.execute(select(Users).order_by(Users.id))).scalars().all()
+    )
+    # Read before drain, which commits the session.
+    author, fan, other, _ = [user.api_key for user in users]
+    other_id = users[2].id
+    response = await test_client.post(
+        "/tweets", headers={"api-key": author}, json={"tweet_data": "Hi"}
+    )
+    tweet_id = response.json()["tweet_id"]
+
+    response = await test_client.post(
+        f"/tweets/{tweet_id}/retweets", headers={"api-key": fan}
+    )
+    assert response.status_code == 201
+    retweet_id = response.json()["tweet_id"]
+    # Retweeting a retweet retweets the original.
+    response = await test_client.post(
+        f"/tweets/{retweet_id}/retweets", headers={"api-key": other}
+    )
+    assert response.status_code == 201
+    await jobs.drain(test_session)
+
+    response = await test_client.get(
+        f"/tweets/{tweet_id}/thread", headers={"api-key": author}
+    )
+    assert response.json()["tweet"]["retweet_count"] == 2
+    res = await test_session.execute(
+        select(Tweets.retweet_of_id).filter(Tweets.author_id == other_id)
+    )
+    assert res.scalars().all() == [tweet_id]
+
+    # Undoing by the id of a retweet undoes the retweet of its original.
+    response = await test_client.delete(
+        f"/tweets/{retweet_id}/retweets", headers={"api-key": other}
+    )
+    assert response.status_code == 200
+    response = await test_client.delete(
+        f"/tweets/{tweet_id}/retweets", headers={"api-key": fan}
+    )
+    assert response.status_code == 200
+    await jobs.drain(test_session)
+    response = await test_client.get(
+        f"/tweets/{tweet_id}/thread", headers={"api-key": author}
+    )
+    assert response.json()["tweet"]["retweet_count"] == 0
+
+
+@pytest.mark.asyncio
+async def test_retweet_fail(test_client, test_session):
+    user, fan = (
+        (await test_session.execute(select(Users).order_by(Users.id))).scalars().all()
+    )[:2]
+    response = await test_client.post(
+        "/tweets", headers={"api-key": user.api_key}, json={"tweet_data": "Hi"}
+    )
+    tweet_id = response.json()["tweet_id"]
+
+    response = await test_client.post(
+        "/tweets/46046/retweets", headers={"api-key": fan.api_key}
+    )
+    assert response.status_code == 404
+    assert not response.json()["result"]
+
+    response = await test_client.delete(
+        f"/tweets/{tweet_id}/retweets", headers={"api-key": fan.api_key}
+    )
+    assert response.status_code == 405
+    assert not response.json()["result"]
+
+    response = await test_client.post(
+        f"/tweets/{tweet_id}/retweets", headers={"api-key": fan.api_key}
+    )
+    assert response.status_code == 201
+    response = await test_client.post(
+        f"/tweets/{tweet_id}/retweets", headers={"api-key": fan.api_key}
+    )
+    assert response.status_code == 405
+    assert not response.json()["result"]
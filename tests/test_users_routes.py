@@ -1,3 +1,5 @@
+import json
+
 import pytest
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
@@ -5,7 +7,7 @@ from sqlalchemy.orm import selectinload
 from app.db.db_models import Users
 
 
-@pytest.mark.asyncio(scope="session")
+@pytest.mark.asyncio
 async def test_users_me_ok(test_client, test_session):
     user = (await test_session.execute(select(Users))).scalars().first()
     response = await test_client.get(
@@ -18,7 +20,7 @@ async def test_users_me_ok(test_client, test_session):
     assert response.json()["user"]["id"] == user.id
 
 
-@pytest.mark.asyncio(scope="session")
+@pytest.mark.asyncio
 async def test_users_me_fail(test_client, test_session):
     response = await test_client.get("/users/me", headers={})
     assert response.status_code == 422
@@ -29,7 +31,7 @@ async def test_users_me_fail(test_client, test_session):
     assert not response.json()["result"]
 
 
-@pytest.mark.asyncio(scope="session")
+@pytest.mark.asyncio
 async def test_users_id_ok(test_client, test_session):
     user = (await test_session.execute(select(Users))).scalars().first()
     other_user = (
@@ -47,7 +49,43 @@ async def test_users_id_ok(test_client, test_session):
     assert response.json()["user"]["id"] == other_user.id
 
 
-@pytest.mark.asyncio(scope="session")
+@pytest.mark.asyncio
+async def test_users_fields_ok(test_client, test_session):
+    user = (await test_session.execute(select(Users))).scalars().first()
+    headers = {"api-key": f"{user.api_key}"}
+
+    response = await test_client.get(
+        "/users/me", headers=headers, params={"fields": "name"}
+    )
+    assert response.status_code == 200
+    assert response.json()["user"] == {"id": user.id, "name": user.name}
+
+    response = await test_client.get(
+        f"/users/{user.id}", headers=headers, params={"fields": "followers"}
+    )
+    assert response.status_code == 200
+    assert set(response.json()["user"]) == {"id", "followers"}
+
+
+@pytest.mark.asyncio
+async def test_users_fields_fail(test_client, test_session):
+    user = (await test_session.execute(select(Users))).scalars().first()
+    headers = {"api-key": f"{user.api_key}"}
+
+    response = await test_client.get(
+        "/users/me", headers=headers, params={"fields": "api_key"}
+    )
+    assert response.status_code == 422
+    assert not response.json()["result"]
+
+    response = await test_client.get(
+        f"/users/{user.id}", headers=headers, params={"fields": "tweets"}
+    )
+    assert response.status_code == 422
+    assert not response.json()["result"]
+
+
+@pytest.mark.asyncio
 async def test_users_id_fail(test_client, test_session):
     # user = (await test_session.execute(select(Users))).scalars().first()
     user = (
@@ -83,7 +121,87 @@ async def test_users_id_fail(test_client, test_session):
     assert not response.json()["result"]
 
 
-@pytest.mark.asyncio(scope="session")
+@pytest.mark.asyncio
+async def test_users_id_tweets_ok(test_client, test_session):
+    user = (await test_session.execute(select(Users))).scalars().first()
+    headers = {"api-key": f"{user.api_key}"}
+    tweet_ids = []
+    for number in range(2):
+        response = await test_client.post(
+            "/tweets", headers=headers, json={"tweet_data": f"Page tweet {number}"}
+        )
+        tweet_ids.append(response.json()["tweet_id"])
+
+    response = await test_client.get(
+        f"/users/{user.id}/tweets", headers=headers, params={"limit": 1}
+    )
+    assert response.status_code == 200
+    assert response.json()["result"]
+    assert [tweet["id"] for tweet in response.json()["tweets"]] == [tweet_ids[1]]
+    assert response.json()["next_cursor"] == tweet_ids[1]
+
+    response = await test_client.get(
+        f"/users/{user.id}/tweets",
+        headers=headers,
+        params={"limit": 1, "cursor": response.json()["next_cursor"]},
+    )
+    assert response.status_code == 200
+    assert [tweet["id"] for tweet in response.json()["tweets"]] == [tweet_ids[0]]
+    assert all(tweet["author"]["id"] == user.id for tweet in response.json()["tweets"])
+
+
+@pytest.mark.asyncio
+async def test_users_id_tweets_normalized_ok(test_client, test_session):
+    user = (await test_session.execute(select(Users))).scalars().first()
+    headers = {"api-key": f"{user.api_key}"}
+    for number in range(2):
+        await test_client.post(
+            "/tweets", headers=headers, json={"tweet_data": f"Page tweet {number}"}
+        )
+
+    response = await test_client.get(
+        f"/users/{user.id}/tweets", headers=headers, params={"normalized": True}
+    )
+    assert response.status_code == 200
+    assert response.json()["result"]
+    tweets = response.json()["tweets"]
+    assert len(tweets) == 2
+    assert all(tweet["author_id"] == user.id for tweet in tweets)
+    assert all("author" not in tweet for tweet in tweets)
+    users = response.json()["users"]
+    assert users == {str(user.id): {"id": user.id, "name": user.name}}
+
+
+@pytest.mark.asyncio
+async def test_users_id_tweets_fail(test_client, test_session):
+    user = (await test_session.execute(select(Users))).scalars().first()
+
+    response = await test_client.get(f"/users/{user.id}/tweets", headers={})
+    assert response.status_code == 422
+    assert not response.json()["result"]
+
+    response = await test_client.get(
+        f"/users/{user.id}/tweets", headers={"api-key": "not_existing"}
+    )
+    assert response.status_code == 401
+    assert not response.json()["result"]
+
+    response = await test_client.get(
+        "/users/46/tweets", headers={"api-key": f"{user.api_key}"}
+    )
+    assert response.status_code == 404
+    assert not response.json()["result"]
+
+    response = await test_client.get(
+        f"/users/{user.id}/tweets",
+        headers={"api-key": f"{user.api_key}"},
+        params={"limit": 0},
+    )
+    assert response.status_code == 422
+    assert not response.json()["result"]
+
+
+@pytest.mark.asyncio
 async def test_users_id_follow_ok(test_client, test_session):
     user = (
         (
@@ -124,7 +242,7 @@ async def test_users_id_follow_ok(test_client, test_session):
     assert other_user in user.following
 
 
-@pytest.mark.asyncio(scope="session")
+@pytest.mark.asyncio
 async def test_users_id_follow_fail(test_client, test_session):
     user = (
         (
@@ -165,6 +283,11 @@ async def test_users_id_follow_fail(test_client, test_session):
     assert response.status_code == 404
     assert not response.json()["result"]
 
+    response = await test_client.post(
+        f"/users/{other_user.id}/follow", headers={"api-key": f"{user.api_key}"}
+    )
+    assert response.status_code == 201
+
     response = await test_client.post(
         f"/users/{other_user.id}/follow", headers={"api-key": f"{user.api_key}"}
     )
@@ -178,8 +301,8 @@ async def test_users_id_follow_fail(test_client, test_session):
     assert not response.json()["result"]
 
 
-@pytest.mark.asyncio(scope="session")
-async def test_users_id_unfollow_ok(test_client, test_session):
+@pytest.mark.asyncio
+async def test_users_id_unfollow_ok(test_client, test_session, following):
     user = (
         (
             await test_session.execute(
@@ -219,7 +342,7 @@ async def test_users_id_unfollow_ok(test_client, test_session):
     assert other_user not in user.following
 
 
-@pytest.mark.asyncio(scope="session")
+@pytest.mark.asyncio
 async def test_users_id_unfollow_fail(test_client, test_session):
     user = (
         (
@@ -271,3 +394,34 @@ async def test_users_id_unfollow_fail(test_client, test_session):
     )
     assert response.status_code == 422
     assert not response.json()["result"]
+
+
+@pytest.mark.asyncio
+async def test_users_me_export_ok(test_client, test_session):
+    user = (await test_session.execute(select(Users))).scalars().first()
+    headers = {"api-key": f"{user.api_key}"}
+    response = await test_client.post(
+        "/tweets", headers=headers, json={"tweet_data": "Exported tweet"}
+    )
+    tweet_id = response.json()["tweet_id"]
+    await test_client.post(f"/tweets/{tweet_id}/likes", headers=headers)
+
+    response = await test_client.get("/users/me/export", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert records[0] == {"type": "user", "id": user.id, "name": user.name}
+    assert {"type": "like", "tweet_id": tweet_id} in records
+    tweets = [record for record in records if record["type"] == "tweet"]
+    assert {tweet["id"] for tweet in tweets} >= {tweet_id}
+
+
+@pytest.mark.asyncio
+async def test_users_me_export_fail(test_client, test_session):
+    response = await test_client.get("/users/me/export", headers={})
+    assert response.status_code == 422
+    assert not response.json()["result"]
+
+    response = await test_client.get("/users/me/export", headers={"api-key": "46"})
+    assert response.status_code == 401
+    assert not response.json()["result"]